@@ -1,6 +1,6 @@
 from logging.config import fileConfig
 from db.db_config import Base
-from models import courses, authors
+from models import courses, authors, scrape_jobs
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 
@@ -0,0 +1,79 @@
+"""catalog statistics materialized views
+
+Revision ID: 3f1c9a7d2b64
+Revises: 166a20678934
+Create Date: 2026-10-19 10:12:44.318205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c9a7d2b64'
+down_revision: Union[str, Sequence[str], None] = '166a20678934'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        CREATE MATERIALIZED VIEW catalog_difficulty_stats AS
+        SELECT d.id AS difficulty_id,
+               d.difficulty,
+               count(c.id) AS course_count,
+               round(avg(c.current_price), 2) AS avg_current_price,
+               round(avg(c.rating)::numeric, 2) AS avg_rating,
+               coalesce(sum(c.total_students), 0) AS total_students
+        FROM course_difficulties d
+        LEFT JOIN courses c ON c.difficulty_id = d.id
+        GROUP BY d.id, d.difficulty
+    """)
+    op.execute("CREATE UNIQUE INDEX ix_catalog_difficulty_stats_difficulty_id ON catalog_difficulty_stats (difficulty_id)")
+
+    op.execute("""
+        CREATE MATERIALIZED VIEW catalog_rating_distribution AS
+        SELECT floor(c.rating * 2) / 2 AS rating_bucket,
+               count(*) AS course_count
+        FROM courses c
+        WHERE c.rating IS NOT NULL
+        GROUP BY 1
+    """)
+    op.execute("CREATE UNIQUE INDEX ix_catalog_rating_distribution_bucket ON catalog_rating_distribution (rating_bucket)")
+
+    op.execute("""
+        CREATE MATERIALIZED VIEW catalog_author_stats AS
+        SELECT a.id AS author_id,
+               a.name,
+               count(DISTINCT ac.course_id) AS course_count,
+               coalesce(sum(c.total_students), 0) AS total_students
+        FROM authors a
+        JOIN authors_courses ac ON ac.author_id = a.id
+        JOIN courses c ON c.id = ac.course_id
+        GROUP BY a.id, a.name
+    """)
+    op.execute("CREATE UNIQUE INDEX ix_catalog_author_stats_author_id ON catalog_author_stats (author_id)")
+    op.execute("CREATE INDEX ix_catalog_author_stats_total_students ON catalog_author_stats (total_students DESC)")
+
+    ## the platform is the host of the url, "\:" escapes the colon from the bind parameter syntax
+    op.execute(r"""
+        CREATE MATERIALIZED VIEW catalog_platform_stats AS
+        SELECT coalesce(lower(substring(c.url FROM '^https?://(?\:www\.)?([^/:]+)')), 'unknown') AS platform,
+               count(*) AS course_count,
+               round(avg(c.rating)::numeric, 2) AS avg_rating,
+               round(avg(c.current_price), 2) AS avg_current_price
+        FROM courses c
+        GROUP BY 1
+    """)
+    op.execute("CREATE UNIQUE INDEX ix_catalog_platform_stats_platform ON catalog_platform_stats (platform)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS catalog_platform_stats")
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS catalog_author_stats")
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS catalog_rating_distribution")
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS catalog_difficulty_stats")
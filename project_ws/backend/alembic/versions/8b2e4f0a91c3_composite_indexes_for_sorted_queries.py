@@ -0,0 +1,40 @@
+"""composite indexes for sorted queries
+
+Revision ID: 8b2e4f0a91c3
+Revises: 3f1c9a7d2b64
+Create Date: 2026-10-19 11:02:17.540921
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2e4f0a91c3'
+down_revision: Union[str, Sequence[str], None] = '3f1c9a7d2b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_courses_rating_id', 'courses', ['rating', 'id'], unique=False)
+    op.create_index('ix_courses_total_students_id', 'courses', ['total_students', 'id'], unique=False)
+    op.create_index('ix_courses_current_price_id', 'courses', ['current_price', 'id'], unique=False)
+    op.create_index('ix_courses_duration_id', 'courses', ['duration', 'id'], unique=False)
+    op.create_index('ix_courses_created_at_id', 'courses', ['created_at', 'id'], unique=False)
+    op.create_index('ix_courses_difficulty_rating_id', 'courses', ['difficulty_id', 'rating', 'id'], unique=False)
+    op.create_index('ix_courses_difficulty_total_students_id', 'courses', ['difficulty_id', 'total_students', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_courses_difficulty_total_students_id', table_name='courses')
+    op.drop_index('ix_courses_difficulty_rating_id', table_name='courses')
+    op.drop_index('ix_courses_created_at_id', table_name='courses')
+    op.drop_index('ix_courses_duration_id', table_name='courses')
+    op.drop_index('ix_courses_current_price_id', table_name='courses')
+    op.drop_index('ix_courses_total_students_id', table_name='courses')
+    op.drop_index('ix_courses_rating_id', table_name='courses')
@@ -0,0 +1,30 @@
+"""enrichment attempts
+
+Revision ID: a4c9e2f7b318
+Revises: f2a8d5c1e730
+Create Date: 2026-10-19 21:05:52.640193
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4c9e2f7b318'
+down_revision: Union[str, Sequence[str], None] = 'f2a8d5c1e730'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('courses', sa.Column('enrich_attempted_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('courses', sa.Column('enrich_failures', sa.Integer(), server_default=sa.text('0'), nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('courses', 'enrich_failures')
+    op.drop_column('courses', 'enrich_attempted_at')
@@ -0,0 +1,47 @@
+"""crawl jobs
+
+Revision ID: a9d2e7c4b815
+Revises: f6a1c3e8d294
+Create Date: 2026-10-19 16:40:03.517220
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d2e7c4b815'
+down_revision: Union[str, Sequence[str], None] = 'f6a1c3e8d294'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'crawl_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(), server_default='queued', nullable=False),
+        sa.Column('concurrency', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('courses_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_crawl_jobs_id'), 'crawl_jobs', ['id'], unique=False)
+    op.add_column('scrape_jobs', sa.Column('category', sa.String(), nullable=True))
+    op.add_column('scrape_jobs', sa.Column('crawl_job_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('scrape_jobs_crawl_job_id_fkey', 'scrape_jobs', 'crawl_jobs', ['crawl_job_id'], ['id'], ondelete='SET NULL')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('scrape_jobs_crawl_job_id_fkey', 'scrape_jobs', type_='foreignkey')
+    op.drop_column('scrape_jobs', 'crawl_job_id')
+    op.drop_column('scrape_jobs', 'category')
+    op.drop_index(op.f('ix_crawl_jobs_id'), table_name='crawl_jobs')
+    op.drop_table('crawl_jobs')
@@ -0,0 +1,28 @@
+"""crawl job heartbeat
+
+Revision ID: b6e3f9a2d471
+Revises: a4c9e2f7b318
+Create Date: 2026-10-19 21:34:18.902746
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6e3f9a2d471'
+down_revision: Union[str, Sequence[str], None] = 'a4c9e2f7b318'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('crawl_jobs', sa.Column('heartbeat_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('crawl_jobs', 'heartbeat_at')
@@ -0,0 +1,30 @@
+"""ingestion lookup indexes
+
+Revision ID: b81f4d2c6e07
+Revises: a9d2e7c4b815
+Create Date: 2026-10-19 17:20:41.208113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b81f4d2c6e07'
+down_revision: Union[str, Sequence[str], None] = 'a9d2e7c4b815'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_authors_name', 'authors', ['name'], unique=False)
+    op.create_index('ix_authors_courses_course_author', 'authors_courses', ['course_id', 'author_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_authors_courses_course_author', table_name='authors_courses')
+    op.drop_index('ix_authors_name', table_name='authors')
@@ -0,0 +1,60 @@
+"""scrape job checkpoints
+
+Revision ID: c47d1e9b3a20
+Revises: 8b2e4f0a91c3
+Create Date: 2026-10-19 12:31:05.118274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c47d1e9b3a20'
+down_revision: Union[str, Sequence[str], None] = '8b2e4f0a91c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'scrape_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('platform', sa.String(), nullable=False),
+        sa.Column('start_page', sa.Integer(), nullable=False),
+        sa.Column('end_page', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(), server_default='running', nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_scrape_jobs_id'), 'scrape_jobs', ['id'], unique=False)
+    op.create_index('ix_scrape_jobs_platform_range_status', 'scrape_jobs', ['platform', 'start_page', 'end_page', 'status'], unique=False)
+
+    op.create_table(
+        'scrape_job_pages',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('job_id', sa.Integer(), nullable=False),
+        sa.Column('page', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(), server_default='pending', nullable=False),
+        sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('courses_count', sa.Integer(), nullable=True),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['job_id'], ['scrape_jobs.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('job_id', 'page', name='uq_scrape_job_pages_job_page')
+    )
+    op.create_index(op.f('ix_scrape_job_pages_id'), 'scrape_job_pages', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_scrape_job_pages_id'), table_name='scrape_job_pages')
+    op.drop_table('scrape_job_pages')
+    op.drop_index('ix_scrape_jobs_platform_range_status', table_name='scrape_jobs')
+    op.drop_index(op.f('ix_scrape_jobs_id'), table_name='scrape_jobs')
+    op.drop_table('scrape_jobs')
@@ -0,0 +1,126 @@
+"""course change feed
+
+Revision ID: c5e2a8f1d934
+Revises: b81f4d2c6e07
+Create Date: 2026-10-19 18:02:15.734906
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e2a8f1d934'
+down_revision: Union[str, Sequence[str], None] = 'b81f4d2c6e07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('courses', sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True))
+    op.create_table(
+        'course_changes',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('txid', sa.BigInteger(), nullable=False),
+        sa.Column('course_id', sa.Integer(), nullable=False),
+        sa.Column('operation', sa.String(), nullable=False),
+        sa.Column('url', sa.String(), nullable=True),
+        sa.Column('changed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.CheckConstraint("operation IN ('insert', 'update', 'delete')", name='course_changes_operation_check'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_course_changes_txid_id', 'course_changes', ['txid', 'id'], unique=False)
+    op.create_index('ix_course_changes_course_id', 'course_changes', ['course_id', 'txid', 'id'], unique=False)
+
+    ## updated_at only moves when the content changes: a recrawl that finds the same
+    ## course (last_seen_at) or an enrichment without news (enriched_at) is not a change
+    op.execute("""
+        CREATE FUNCTION courses_touch_updated_at() RETURNS trigger AS $$
+        BEGIN
+            IF (NEW.name, NEW.url, NEW.duration, NEW.total_lectures, NEW.rating, NEW.total_students,
+                NEW.current_price, NEW.original_price, NEW.difficulty_id, NEW.description, NEW.last_updated_at)
+               IS DISTINCT FROM
+               (OLD.name, OLD.url, OLD.duration, OLD.total_lectures, OLD.rating, OLD.total_students,
+                OLD.current_price, OLD.original_price, OLD.difficulty_id, OLD.description, OLD.last_updated_at) THEN
+                NEW.updated_at := now();
+            ELSE
+                NEW.updated_at := OLD.updated_at;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER courses_touch_updated_at BEFORE UPDATE ON courses
+        FOR EACH ROW EXECUTE FUNCTION courses_touch_updated_at()
+    """)
+
+    op.execute("""
+        CREATE FUNCTION log_course_change() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                INSERT INTO course_changes (txid, course_id, operation, url)
+                VALUES (pg_current_xact_id()::text::bigint, OLD.id, 'delete', OLD.url);
+                RETURN OLD;
+            END IF;
+            INSERT INTO course_changes (txid, course_id, operation)
+            VALUES (pg_current_xact_id()::text::bigint, NEW.id, lower(TG_OP));
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER log_course_insert_delete AFTER INSERT OR DELETE ON courses
+        FOR EACH ROW EXECUTE FUNCTION log_course_change()
+    """)
+    op.execute("""
+        CREATE TRIGGER log_course_update AFTER UPDATE ON courses
+        FOR EACH ROW WHEN (NEW.updated_at IS DISTINCT FROM OLD.updated_at) EXECUTE FUNCTION log_course_change()
+    """)
+
+    ## the authors are part of a course in the feed
+    op.execute("""
+        CREATE FUNCTION log_course_link_change() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                INSERT INTO course_changes (txid, course_id, operation)
+                SELECT pg_current_xact_id()::text::bigint, OLD.course_id, 'update'
+                WHERE OLD.course_id IS NOT NULL;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'INSERT') THEN
+                INSERT INTO course_changes (txid, course_id, operation)
+                SELECT pg_current_xact_id()::text::bigint, NEW.course_id, 'update'
+                WHERE NEW.course_id IS NOT NULL;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER log_course_link_change AFTER INSERT OR UPDATE OR DELETE ON authors_courses
+        FOR EACH ROW EXECUTE FUNCTION log_course_link_change()
+    """)
+
+    ## the courses that exist now are the first changes of the feed, so a consumer starts from an empty cursor
+    op.execute("""
+        INSERT INTO course_changes (txid, course_id, operation)
+        SELECT pg_current_xact_id()::text::bigint, id, 'insert' FROM courses ORDER BY id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER log_course_link_change ON authors_courses")
+    op.execute("DROP FUNCTION log_course_link_change()")
+    op.execute("DROP TRIGGER log_course_update ON courses")
+    op.execute("DROP TRIGGER log_course_insert_delete ON courses")
+    op.execute("DROP FUNCTION log_course_change()")
+    op.execute("DROP TRIGGER courses_touch_updated_at ON courses")
+    op.execute("DROP FUNCTION courses_touch_updated_at()")
+    op.drop_index('ix_course_changes_course_id', table_name='course_changes')
+    op.drop_index('ix_course_changes_txid_id', table_name='course_changes')
+    op.drop_table('course_changes')
+    op.drop_column('courses', 'updated_at')
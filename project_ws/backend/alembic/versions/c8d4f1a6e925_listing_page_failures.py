@@ -0,0 +1,30 @@
+"""listing page failures
+
+Revision ID: c8d4f1a6e925
+Revises: b6e3f9a2d471
+Create Date: 2026-10-19 22:08:53.417209
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8d4f1a6e925'
+down_revision: Union[str, Sequence[str], None] = 'b6e3f9a2d471'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('listing_pages', sa.Column('crawl_failures', sa.Integer(), server_default=sa.text('0'), nullable=False))
+    op.add_column('listing_pages', sa.Column('last_failed_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('listing_pages', 'last_failed_at')
+    op.drop_column('listing_pages', 'crawl_failures')
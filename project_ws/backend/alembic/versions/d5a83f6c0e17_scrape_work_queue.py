@@ -0,0 +1,53 @@
+"""scrape work queue
+
+Revision ID: d5a83f6c0e17
+Revises: c47d1e9b3a20
+Create Date: 2026-10-19 12:48:40.602391
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a83f6c0e17'
+down_revision: Union[str, Sequence[str], None] = 'c47d1e9b3a20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'scrape_queue',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('platform', sa.String(), nullable=False),
+        sa.Column('page', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(), server_default='queued', nullable=False),
+        sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('available_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('leased_by', sa.String(), nullable=True),
+        sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('enqueued_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('courses_count', sa.Integer(), nullable=True),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('platform', 'page', name='uq_scrape_queue_platform_page')
+    )
+    op.create_index(op.f('ix_scrape_queue_id'), 'scrape_queue', ['id'], unique=False)
+    op.create_index('ix_scrape_queue_queued', 'scrape_queue', ['available_at', 'id'], unique=False,
+                    postgresql_where=sa.text("status = 'queued'"))
+    op.create_index('ix_scrape_queue_claimed_lease', 'scrape_queue', ['lease_expires_at'], unique=False,
+                    postgresql_where=sa.text("status = 'claimed'"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_scrape_queue_claimed_lease', table_name='scrape_queue')
+    op.drop_index('ix_scrape_queue_queued', table_name='scrape_queue')
+    op.drop_index(op.f('ix_scrape_queue_id'), table_name='scrape_queue')
+    op.drop_table('scrape_queue')
@@ -0,0 +1,28 @@
+"""author links author index
+
+Revision ID: d93b7e4a0c12
+Revises: c5e2a8f1d934
+Create Date: 2026-10-19 18:47:09.381524
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd93b7e4a0c12'
+down_revision: Union[str, Sequence[str], None] = 'c5e2a8f1d934'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_authors_courses_author_id', 'authors_courses', ['author_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_authors_courses_author_id', table_name='authors_courses')
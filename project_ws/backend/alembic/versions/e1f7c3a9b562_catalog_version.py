@@ -0,0 +1,69 @@
+"""catalog version
+
+Revision ID: e1f7c3a9b562
+Revises: d93b7e4a0c12
+Create Date: 2026-10-19 20:12:41.508317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1f7c3a9b562'
+down_revision: Union[str, Sequence[str], None] = 'd93b7e4a0c12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CATALOG_TABLES = ("courses", "authors", "authors_courses", "course_difficulties")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'catalog_version',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.CheckConstraint('id = 1', name='catalog_version_single_row'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    ## starts from a timestamp, so a version (and the ETags built from it) is never reused
+    op.execute("INSERT INTO catalog_version (id, version) VALUES (1, (extract(epoch FROM now()) * 1000)::bigint)")
+
+    ## The triggers are deferred to the commit, so the row of catalog_version is only locked while
+    ## the writing transaction commits, and the version is bumped once per transaction
+    op.execute("""
+        CREATE FUNCTION bump_catalog_version() RETURNS trigger AS $$
+        BEGIN
+            IF current_setting('catalog.version_bumped', true) IS DISTINCT FROM pg_current_xact_id()::text THEN
+                UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+                PERFORM set_config('catalog.version_bumped', pg_current_xact_id()::text, true);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for table in CATALOG_TABLES:
+        ## a recrawl or an enrichment that changes nothing does not move updated_at (nor the version)
+        when = "WHEN (OLD.updated_at IS DISTINCT FROM NEW.updated_at)" if table == "courses" else ""
+        op.execute(f"""
+            CREATE CONSTRAINT TRIGGER bump_catalog_version_insert_delete AFTER INSERT OR DELETE ON {table}
+            DEFERRABLE INITIALLY DEFERRED
+            FOR EACH ROW EXECUTE FUNCTION bump_catalog_version()
+        """)
+        op.execute(f"""
+            CREATE CONSTRAINT TRIGGER bump_catalog_version_update AFTER UPDATE ON {table}
+            DEFERRABLE INITIALLY DEFERRED
+            FOR EACH ROW {when} EXECUTE FUNCTION bump_catalog_version()
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in CATALOG_TABLES:
+        op.execute(f"DROP TRIGGER bump_catalog_version_update ON {table}")
+        op.execute(f"DROP TRIGGER bump_catalog_version_insert_delete ON {table}")
+    op.execute("DROP FUNCTION bump_catalog_version()")
+    op.drop_table('catalog_version')
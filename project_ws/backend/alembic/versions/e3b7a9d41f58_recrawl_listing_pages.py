@@ -0,0 +1,54 @@
+"""recrawl listing pages and course last seen
+
+Revision ID: e3b7a9d41f58
+Revises: d5a83f6c0e17
+Create Date: 2026-10-19 14:05:12.318406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3b7a9d41f58'
+down_revision: Union[str, Sequence[str], None] = 'd5a83f6c0e17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'listing_pages',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('platform', sa.String(), nullable=False),
+        sa.Column('page', sa.Integer(), nullable=False),
+        sa.Column('last_crawled_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_changed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('next_crawl_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('interval_seconds', sa.Float(), nullable=False),
+        sa.Column('crawl_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('change_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('change_rate', sa.Float(), server_default='0', nullable=False),
+        sa.Column('courses_count', sa.Integer(), nullable=True),
+        sa.Column('content_hash', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('platform', 'page', name='uq_listing_pages_platform_page')
+    )
+    op.create_index(op.f('ix_listing_pages_id'), 'listing_pages', ['id'], unique=False)
+    op.create_index('ix_listing_pages_next_crawl_at', 'listing_pages', ['next_crawl_at'], unique=False)
+    ## existing courses count as seen when they were inserted
+    op.add_column('courses', sa.Column('last_seen_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True))
+    op.execute("UPDATE courses SET last_seen_at = created_at")
+    op.create_index('ix_courses_url', 'courses', ['url'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_courses_url', table_name='courses')
+    op.drop_column('courses', 'last_seen_at')
+    op.drop_index('ix_listing_pages_next_crawl_at', table_name='listing_pages')
+    op.drop_index(op.f('ix_listing_pages_id'), table_name='listing_pages')
+    op.drop_table('listing_pages')
@@ -0,0 +1,52 @@
+"""unique course url
+
+Revision ID: f2a8d5c1e730
+Revises: e1f7c3a9b562
+Create Date: 2026-10-19 20:41:07.226184
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a8d5c1e730'
+down_revision: Union[str, Sequence[str], None] = 'e1f7c3a9b562'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+## Every course with a url already in the table (lowest id first) and the course it is merged into
+DUPLICATE_COURSES = """
+    SELECT id, keep_id FROM (
+        SELECT id, min(id) OVER (PARTITION BY url) AS keep_id FROM courses WHERE url IS NOT NULL
+    ) ranked
+    WHERE id <> keep_id
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    ## the duplicates are merged into the course with the lowest id (the one the ingestion
+    ## updated so far): their author links move to it, then they are deleted
+    op.execute(f"""
+        INSERT INTO authors_courses (author_id, course_id)
+        SELECT DISTINCT ac.author_id, d.keep_id
+        FROM authors_courses ac
+        JOIN ({DUPLICATE_COURSES}) d ON d.id = ac.course_id
+        WHERE ac.author_id IS NOT NULL
+          AND NOT EXISTS (
+              SELECT 1 FROM authors_courses k WHERE k.course_id = d.keep_id AND k.author_id = ac.author_id
+          )
+    """)
+    op.execute(f"DELETE FROM courses WHERE id IN (SELECT id FROM ({DUPLICATE_COURSES}) d)")
+
+    op.drop_index('ix_courses_url', table_name='courses')
+    op.create_index('ix_courses_url', 'courses', ['url'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_courses_url', table_name='courses')
+    op.create_index('ix_courses_url', 'courses', ['url'], unique=False)
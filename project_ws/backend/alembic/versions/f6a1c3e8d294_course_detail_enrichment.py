@@ -0,0 +1,34 @@
+"""course detail enrichment
+
+Revision ID: f6a1c3e8d294
+Revises: e3b7a9d41f58
+Create Date: 2026-10-19 15:22:47.904113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6a1c3e8d294'
+down_revision: Union[str, Sequence[str], None] = 'e3b7a9d41f58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('courses', sa.Column('description', sa.Text(), nullable=True))
+    op.add_column('courses', sa.Column('last_updated_at', sa.Date(), nullable=True))
+    op.add_column('courses', sa.Column('enriched_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index('ix_courses_enriched_at_id', 'courses', ['enriched_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_courses_enriched_at_id', table_name='courses')
+    op.drop_column('courses', 'enriched_at')
+    op.drop_column('courses', 'last_updated_at')
+    op.drop_column('courses', 'description')
@@ -0,0 +1,215 @@
+import argparse
+import json
+import platform
+import random
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from sqlalchemy import text
+from db.db_config import SessionLocal
+
+## Latency and throughput of the read endpoints (per filter combination) and of the
+## ingestion path of insert_courses, against the database configured in the .env file
+## (fill it first with benchmarks.catalog_generator). The results are written as JSON,
+## one file per run, to compare runs over time.
+##
+##   python -m benchmarks.api_benchmark --requests 200 --concurrency 4 --output results.json
+##   python -m benchmarks.api_benchmark --base-url http://localhost:8000 --cache cold
+
+## (name, method, path, query parameters or JSON body)
+SCENARIOS = [
+    ("all_courses", "GET", "/get_data/get_all_courses_from_db", None),
+    ("filter_keyword", "GET", "/get_data/get_filtered_courses", {"keyword": "course 1"}),
+    ("filter_price_range", "GET", "/get_data/get_filtered_courses", {"min_price": 10, "max_price": 20}),
+    ("filter_rating", "GET", "/get_data/get_filtered_courses", {"rating": 4.8}),
+    ("filter_difficulty", "GET", "/get_data/get_filtered_courses", {"difficulty": "expert"}),
+    ("filter_author", "GET", "/get_data/get_filtered_courses", {"author_name": "author 1"}),
+    ("filter_combined", "GET", "/get_data/get_filtered_courses",
+     {"keyword": "course", "min_price": 5, "max_price": 50, "rating": 4, "difficulty": "beginner"}),
+    ("top_rated_100", "GET", "/get_data/get_filtered_courses", {"sort_by": "rating", "order": "desc", "limit": 100}),
+    ("cheapest_beginner_50", "GET", "/get_data/get_filtered_courses",
+     {"difficulty": "beginner", "sort_by": "current_price", "order": "asc", "limit": 50}),
+    ("facets", "GET", "/get_data/get_course_facets", {"rating": 4}),
+    ("stats", "GET", "/get_data/stats", None),
+    ("difficulties", "GET", "/get_data/get_all_difficulty_types", None),
+    ("authors", "GET", "/get_data/get_all_authors", None),
+]
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(q * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+def summarize(name: str, latencies: list[float], errors: int, elapsed: float) -> dict:
+    """
+    :param latencies: The latency of every successful operation in seconds
+    :return: Count, errors, mean/p50/p95/p99 in ms and the throughput per second
+    :rtype: dict
+    """
+
+    latencies = sorted(latencies)
+    to_ms = lambda value: round(value * 1000, 2) if value is not None else None
+    return {
+        "scenario": name,
+        "count": len(latencies),
+        "errors": errors,
+        "mean_ms": to_ms(sum(latencies) / len(latencies)) if latencies else None,
+        "p50_ms": to_ms(percentile(latencies, 0.50)),
+        "p95_ms": to_ms(percentile(latencies, 0.95)),
+        "p99_ms": to_ms(percentile(latencies, 0.99)),
+        "throughput_per_second": round((len(latencies) + errors) / elapsed, 2) if elapsed else None,
+    }
+
+def make_client(base_url: str = None):
+    """
+    :return: An HTTP client for the running API at `base_url`, or one
+        that calls the application in this process if it is None
+    """
+
+    if base_url:
+        import httpx
+        return httpx.Client(base_url=base_url, timeout=120)
+
+    from fastapi.testclient import TestClient
+    from main import app
+    return TestClient(app)
+
+def run_scenario(client, name: str, method: str, path: str, params, requests: int,
+                 concurrency: int, warmup: int, cold: bool) -> dict:
+    def call():
+        if cold:
+            ## a new data version makes every cached response and snapshot stale
+            from utils.response_cache import response_cache
+            response_cache.bump_data_version()
+        start = time.perf_counter()
+        if method == "GET":
+            response = client.get(path, params=params)
+        else:
+            response = client.request(method, path, json=params)
+        ## a 404 is a valid answer of the filter endpoints (nothing matches)
+        return time.perf_counter() - start, response.status_code < 400 or response.status_code == 404
+
+    for _ in range(warmup):
+        call()
+
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for latency, ok in executor.map(lambda _: call(), range(requests)):
+            if ok:
+                latencies.append(latency)
+            else:
+                errors += 1
+    return summarize(name, latencies, errors, time.perf_counter() - start)
+
+def run_ingestion(courses: int, seed: int = 42) -> dict:
+    """
+    Inserts synthetic scraped courses with the same helpers and the same
+    commit per course as insert_courses (without the scraping), then
+    deletes them again.
+
+    :return: The latency of a course insert and the courses per second
+    :rtype: dict
+    """
+
+    from schemas.web_retrieval_schema import CourseInput
+    from db.course_ingestion import get_or_create_difficulty, get_or_create_author, link_author_to_course, create_course
+    from .catalog_generator import SYNTHETIC_HOST
+
+    rng = random.Random(seed)
+    run = f"ingest-{seed}-{int(time.time())}"
+    inputs = [
+        CourseInput(
+            title=f"Synthetic ingested course {run}-{i}",
+            target_url=f"https://{SYNTHETIC_HOST}/course/{run}-{i}",
+            author=[f"Synthetic Author {rng.randint(0, 999)}" for _ in range(rng.choice((1, 1, 2)))],
+            rating=str(round(rng.uniform(3, 5), 1)),
+            total_students=f"{rng.randint(1, 90000):,}",
+            current_price=f"€{rng.choice(['9.99', '12.99', '19.99'])}",
+            original_price="€84.99",
+            hours_required=str(round(rng.uniform(0.5, 40), 1)),
+            lectures_count=str(rng.randint(5, 300)),
+            difficulty=rng.choice(["Beginner", "Intermediate", "All Levels"]),
+        )
+        for i in range(courses)
+    ]
+
+    db = SessionLocal()
+    latencies = []
+    start = time.perf_counter()
+    try:
+        for course in inputs:
+            course_start = time.perf_counter()
+            difficulty = get_or_create_difficulty(db, course.difficulty)
+            created_course = create_course(db, course, difficulty.id)
+            for author in get_or_create_author(db, course.author):
+                link_author_to_course(db, author.id, created_course.id)
+            db.commit()
+            latencies.append(time.perf_counter() - course_start)
+        elapsed = time.perf_counter() - start
+    finally:
+        db.rollback()
+        db.execute(text("DELETE FROM courses WHERE url LIKE :prefix"), {"prefix": f"https://{SYNTHETIC_HOST}/course/{run}-%"})
+        db.commit()
+        db.close()
+
+    return summarize("ingest_courses", latencies, courses - len(latencies), elapsed)
+
+def run_metadata(args) -> dict:
+    db = SessionLocal()
+    try:
+        catalog_size = db.execute(text("SELECT count(*) FROM courses")).scalar()
+    finally:
+        db.close()
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "target": args.base_url or "in-process",
+        "catalog_courses": catalog_size,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "cache": args.cache,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency and throughput benchmark of the API endpoints and the ingestion.")
+    parser.add_argument("--base-url", help="A running API, e.g. http://localhost:8000 (in-process if not set)")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--warmup", type=int, default=5, help="Requests per scenario before measuring")
+    parser.add_argument("--cache", choices=["warm", "cold"], default="warm",
+                        help="cold invalidates the response cache before every request (in-process only)")
+    parser.add_argument("--scenarios", help="Comma separated scenario names (all by default)")
+    parser.add_argument("--ingest", type=int, default=200, help="Courses inserted by the ingestion benchmark (0 skips it)")
+    parser.add_argument("--output", help="Writes the results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.cache == "cold" and args.base_url:
+        parser.error("--cache cold only works in-process")
+
+    selected = set(args.scenarios.split(",")) if args.scenarios else None
+    client = make_client(args.base_url)
+    results = []
+    for name, method, path, params in SCENARIOS:
+        if selected is None or name in selected:
+            results.append(run_scenario(client, name, method, path, params, args.requests,
+                                        args.concurrency, args.warmup, args.cache == "cold"))
+            print(results[-1])
+    if args.ingest and (selected is None or "ingest_courses" in selected):
+        results.append(run_ingestion(args.ingest))
+        print(results[-1])
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"meta": run_metadata(args), "results": results}, f, indent=2)
@@ -0,0 +1,211 @@
+import argparse
+import io
+import itertools
+import math
+import random
+import time
+from sqlalchemy import text
+from db.db_config import engine
+from db.catalog_stats import refresh_catalog_stats
+from utils.logger import logger_setup
+import logging
+
+## Generates a synthetic catalog (courses, authors, difficulties and their links) for the
+## benchmarks, with distributions close to the scraped data and within the constraints of
+## the courses table. Synthetic courses are recognized by their host, so they can be purged.
+##
+##   python -m benchmarks.catalog_generator --rows 100k
+##   python -m benchmarks.catalog_generator --purge
+
+SYNTHETIC_HOST = "synthetic.example.com"
+
+DEFAULT_DIFFICULTY_WEIGHTS = "Beginner=40,Intermediate=35,Expert=15,All Levels=10"
+
+## Rows are sent with COPY in chunks of this size
+CHUNK_SIZE = 50_000
+
+def parse_rows(value: str) -> int:
+    """
+    :param value: A number of rows, with an optional k or m suffix (10k, 100k, 1m)
+    :return: The number of rows
+    :rtype: int
+    """
+
+    value = value.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(value[-1:], 1)
+    return int(float(value.rstrip("km")) * multiplier)
+
+def parse_weights(value: str) -> dict[str, float]:
+    weights = {}
+    for item in value.split(","):
+        name, weight = item.rsplit("=", 1)
+        weights[name.strip()] = float(weight)
+    return weights
+
+def _copy(cursor, table: str, columns: tuple, rows):
+    """
+    Sends the rows to the table with COPY (tab separated, \\N for NULL).
+    """
+
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join("\\N" if value is None else str(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+
+def _difficulty_ids(cursor, names) -> dict[str, int]:
+    ids = {}
+    for name in names:
+        cursor.execute("SELECT id FROM course_difficulties WHERE difficulty = %s ORDER BY id LIMIT 1", (name,))
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute("INSERT INTO course_difficulties (difficulty) VALUES (%s) RETURNING id", (name,))
+            row = cursor.fetchone()
+        ids[name] = row[0]
+    return ids
+
+def _author_ids(cursor, count: int) -> list[int]:
+    """
+    :return: The ids of `count` synthetic authors, created if they do not exist yet
+    """
+
+    cursor.execute("SELECT id, name FROM authors WHERE name LIKE %s", ("Synthetic Author %",))
+    existing = {name: author_id for author_id, name in cursor.fetchall()}
+    names = [f"Synthetic Author {i}" for i in range(count)]
+    missing = [name for name in names if name not in existing]
+    if missing:
+        _copy(cursor, "authors", ("name",), ((name,) for name in missing))
+        cursor.execute("SELECT id, name FROM authors WHERE name LIKE %s", ("Synthetic Author %",))
+        existing = {name: author_id for author_id, name in cursor.fetchall()}
+    return [existing[name] for name in names]
+
+def _course_row(rng: random.Random, course_id: int, run: str, index: int, difficulty_id: int) -> tuple:
+    ## Pluralsight-like courses have no price
+    if rng.random() < 0.2:
+        current_price = original_price = None
+    elif rng.random() < 0.06:
+        current_price = original_price = 0
+    else:
+        current_price = rng.choice([9.99, 12.99, 14.99, 19.99, 24.99, 49.99, 84.99, 119.99, 199.99])
+        original_price = max(current_price, rng.choice([19.99, 49.99, 84.99, 119.99, 199.99]))
+    rating = round(min(5.0, max(1.0, rng.gauss(4.3, 0.35))), 1)
+    return (
+        course_id,
+        f"Synthetic course {run}-{index}",
+        f"https://{SYNTHETIC_HOST}/course/{run}-{index}",
+        round(max(0.1, rng.lognormvariate(1.5, 0.8)), 1),
+        max(1, int(rng.lognormvariate(3.5, 0.7))),
+        rating,
+        max(1, int(rng.lognormvariate(7, 2))),
+        current_price,
+        original_price,
+        difficulty_id,
+    )
+
+def generate_catalog(rows: int, difficulty_weights: dict[str, float], authors: int = 0, seed: int = 42) -> dict:
+    """
+    Inserts `rows` synthetic courses, each with 1 to 3 authors.
+    A few authors have many courses (Zipf-like), like on the real platforms.
+
+    :param rows: The number of courses
+    :type rows: int
+    :param difficulty_weights: The share of each difficulty (relative weights)
+    :type difficulty_weights: dict[str, float]
+    :param authors: The size of the author pool, rows / 8 if 0
+    :type authors: int
+    :param seed: The seed of the random generator
+    :type seed: int
+    :return: The number of inserted rows per table and the duration
+    :rtype: dict
+    """
+
+    rng = random.Random(seed)
+    run = f"{seed}-{int(time.time())}"
+    authors = authors or max(100, rows // 8)
+    start = time.perf_counter()
+
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        difficulty_ids = _difficulty_ids(cursor, difficulty_weights)
+        difficulty_population = [difficulty_ids[name] for name in difficulty_weights]
+        difficulty_cum_weights = list(itertools.accumulate(difficulty_weights.values()))
+
+        author_ids = _author_ids(cursor, authors)
+        author_cum_weights = list(itertools.accumulate(1 / math.pow(rank + 1, 1.1) for rank in range(authors)))
+        connection.commit()
+
+        links = 0
+        for chunk_start in range(0, rows, CHUNK_SIZE):
+            size = min(CHUNK_SIZE, rows - chunk_start)
+            ## ids are reserved from the sequence, so the links can be written without RETURNING
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence('courses', 'id')) FROM generate_series(1, %s)", (size,)
+            )
+            course_ids = [row[0] for row in cursor.fetchall()]
+            difficulties = rng.choices(difficulty_population, cum_weights=difficulty_cum_weights, k=size)
+
+            courses = [
+                _course_row(rng, course_id, run, chunk_start + i, difficulty_id)
+                for i, (course_id, difficulty_id) in enumerate(zip(course_ids, difficulties))
+            ]
+            course_links = [
+                (author_id, course_id)
+                for course_id in course_ids
+                for author_id in set(rng.choices(author_ids, cum_weights=author_cum_weights, k=rng.choice((1, 1, 1, 2, 3))))
+            ]
+
+            _copy(cursor, "courses", ("id", "name", "url", "duration", "total_lectures", "rating",
+                                      "total_students", "current_price", "original_price", "difficulty_id"), courses)
+            _copy(cursor, "authors_courses", ("author_id", "course_id"), course_links)
+            connection.commit()
+            links += len(course_links)
+            logging.info(f"Synthetic catalog: {chunk_start + size}/{rows} courses")
+
+        cursor.execute("ANALYZE courses; ANALYZE authors; ANALYZE authors_courses; ANALYZE course_difficulties")
+        connection.commit()
+    finally:
+        connection.close()
+
+    refresh_catalog_stats()
+    return {
+        "courses": rows,
+        "authors": authors,
+        "links": links,
+        "difficulties": len(difficulty_weights),
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+def purge_catalog() -> int:
+    """
+    Deletes the synthetic courses (their links cascade) and the synthetic authors.
+
+    :return: The number of deleted courses
+    :rtype: int
+    """
+
+    with engine.begin() as connection:
+        deleted = connection.execute(
+            text("DELETE FROM courses WHERE url LIKE :prefix"), {"prefix": f"https://{SYNTHETIC_HOST}/%"}
+        ).rowcount
+        connection.execute(text(
+            "DELETE FROM authors a WHERE a.name LIKE 'Synthetic Author %' "
+            "AND NOT EXISTS (SELECT 1 FROM authors_courses ac WHERE ac.author_id = a.id)"
+        ))
+    refresh_catalog_stats()
+    return deleted
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generates a synthetic course catalog for the benchmarks.")
+    parser.add_argument("--rows", type=parse_rows, default=parse_rows("10k"), help="Number of courses, e.g. 10k, 100k, 1m")
+    parser.add_argument("--authors", type=int, default=0, help="Size of the author pool (rows / 8 by default)")
+    parser.add_argument("--difficulty-weights", type=parse_weights, default=parse_weights(DEFAULT_DIFFICULTY_WEIGHTS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--purge", action="store_true", help="Deletes the synthetic catalog instead")
+    args = parser.parse_args()
+
+    if args.purge:
+        print(f"Deleted {purge_catalog()} synthetic courses")
+    else:
+        print(generate_catalog(args.rows, args.difficulty_weights, args.authors, args.seed))
@@ -0,0 +1,141 @@
+import argparse
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+## Listing pages with the same structure (classes, attributes, nesting) as the pages
+## of udemy.com and pluralsight.com that the scrapers read, so every XPath of the
+## scrapers matches. The content is generated from the page number, the same page
+## always has the same courses.
+
+DIFFICULTIES = ["Beginner", "Intermediate", "Expert", "All Levels"]
+
+def udemy_card(rng: random.Random, page: int, index: int) -> str:
+    authors = ", ".join(f"Author {rng.randint(1, 500)}" for _ in range(rng.randint(1, 3)))
+    price = rng.choice([9.99, 12.99, 19.99, 49.99, 84.99])
+    return f"""
+<div class="course-list_card__fixture">
+  <h3><a href="https://www.udemy.com/course/fixture-{page}-{index}/">Fixture Udemy course {page}-{index}</a></h3>
+  <div class="course-card-instructors_instructor-list__helor">{authors}</div>
+  <div><span class="ud-heading-sm star-rating_rating-number">{rng.randint(30, 50) / 10}</span>
+  <span aria-label="{rng.randint(10, 90000)} reviews">({rng.randint(10, 90000)})</span></div>
+  <div class="course-meta-info">
+    <div>{rng.randint(1, 80) / 2} total hours</div>
+    <div>{rng.randint(5, 400)} lectures</div>
+    <div>{rng.choice(DIFFICULTIES)}</div>
+  </div>
+  <div data-purpose="course-price-text"><div>Current price</div><div>{price}</div></div>
+  <div data-purpose="course-old-price-text"><div>Original Price</div><div>{price * 4:.2f}</div></div>
+</div>"""
+
+def pluralsight_card(rng: random.Random, page: int, index: int) -> str:
+    rating = rng.randint(6, 10) / 2
+    stars = '<i class="fa fa-star"></i>' * int(rating) + ('<i class="fa fa-star-half-o"></i>' if rating % 1 else "")
+    return f"""
+<li class="browse-search-results-item">
+  <a href="https://www.pluralsight.com/courses/fixture-{page}-{index}">
+    <div class="course-details__title">Fixture Pluralsight course {page}-{index}</div>
+    <div class="course-details__author">by Author {rng.randint(1, 500)}</div>
+    <span id="courseLevel">{rng.choice(DIFFICULTIES[:3])}</span>
+    <span class="duration course-details__level">{rng.randint(0, 9)}h {rng.randint(1, 59)}m</span>
+    <div class="course-details__rating">{stars}<span>({rng.randint(10, 5000)})</span></div>
+  </a>
+</li>"""
+
+def udemy_page(page: int, total_pages: int, cards_per_page: int) -> str:
+    rng = random.Random(page)
+    cards = "".join(udemy_card(rng, page, i) for i in range(cards_per_page))
+    pagination = "".join(f'<a data-page="{p}">{p}</a>' for p in range(1, total_pages + 1))
+    return f"<html><body><div>{cards}</div><nav>{pagination}</nav></body></html>"
+
+def pluralsight_page(page: int, total_pages: int, cards_per_page: int) -> str:
+    rng = random.Random(page)
+    cards = "".join(pluralsight_card(rng, page, i) for i in range(cards_per_page))
+    pagination = "".join(f'<span class="change--position1">{p}</span>' for p in range(1, total_pages + 1))
+    return f"<html><body><ul>{cards}</ul><div>{pagination}</div></body></html>"
+
+class FixtureSite:
+    """
+    A local HTTP server with the fixture listing pages:
+    `/udemy/?p=<page>` and `/pluralsight/browse?page=<page>`.
+
+    :param total_pages: The number of pages shown in the pagination
+    :type total_pages: int
+    :param cards_per_page: The number of course cards on every page
+    :type cards_per_page: int
+    :param latency: Delay added to every response in seconds, to simulate the network
+    :type latency: float
+    """
+
+    def __init__(self, total_pages: int = 50, cards_per_page: int = 16, latency: float = 0.0,
+                 host: str = "127.0.0.1", port: int = 0):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                query = parse_qs(parsed.query)
+                if parsed.path.startswith("/udemy"):
+                    body = udemy_page(int(query.get("p", ["1"])[0]), site.total_pages, site.cards_per_page)
+                elif parsed.path.startswith("/pluralsight"):
+                    body = pluralsight_page(int(query.get("page", ["1"])[0]), site.total_pages, site.cards_per_page)
+                else:
+                    self.send_error(404)
+                    return
+                if site.latency:
+                    time.sleep(site.latency)
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.total_pages = total_pages
+        self.cards_per_page = cards_per_page
+        self.latency = latency
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def udemy_url(self) -> str:
+        return self.base_url + "/udemy/?p={}&sort=most-reviewed"
+
+    @property
+    def pluralsight_url(self) -> str:
+        return self.base_url + "/pluralsight/browse?page={}"
+
+    def start(self) -> "FixtureSite":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serves the fixture listing pages of the scraping benchmark.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--pages", type=int, default=50, help="Number of pages in the pagination")
+    parser.add_argument("--cards-per-page", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.0, help="Delay of every response in seconds")
+    args = parser.parse_args()
+
+    site = FixtureSite(args.pages, args.cards_per_page, args.latency, port=args.port)
+    print(f"BASE_URL_UDEMY={site.udemy_url}")
+    print(f"BASE_URL_PLURALSIGHT={site.pluralsight_url}")
+    try:
+        site.server.serve_forever()
+    except KeyboardInterrupt:
+        site.stop()
@@ -0,0 +1,178 @@
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .fixture_site import FixtureSite
+
+## Offline end-to-end benchmark of the scrapers: real browsers, real scraper code,
+## but the listing pages come from the local fixture site instead of udemy.com
+## and pluralsight.com, so runs are comparable with each other.
+##
+##   python -m benchmarks.scrape_benchmark --platform udemy --pages 10 --concurrency 2 --output result.json
+##   python -m benchmarks.scrape_benchmark --pages 10 --baseline result.json --max-regression 0.2
+
+def split_pages(pages: int, concurrency: int) -> list[tuple[int, int]]:
+    """
+    Splits the pages 1..pages into at most `concurrency` consecutive ranges.
+
+    :return: (start_page, end_page) of every range, both inclusive
+    :rtype: list[tuple[int, int]]
+    """
+
+    concurrency = max(1, min(concurrency, pages))
+    size, extra = divmod(pages, concurrency)
+    ranges = []
+    start = 1
+    for i in range(concurrency):
+        end = start + size - 1 + (1 if i < extra else 0)
+        ranges.append((start, end))
+        start = end + 1
+    return ranges
+
+def _quantile(buckets: tuple, counts: list, q: float) -> float:
+    """
+    Upper bound of the histogram bucket that contains the quantile `q`.
+    """
+
+    target = q * counts[-1]
+    for bound, count in zip(buckets, counts):
+        if count >= target:
+            return bound
+    return buckets[-1]
+
+def stage_latencies(histogram) -> dict:
+    """
+    Aggregates the stage histogram over platforms and pages.
+
+    :return: count, mean, p50 and p95 (bucket upper bounds) in seconds per stage
+    :rtype: dict
+    """
+
+    stage_index = histogram.labelnames.index("stage")
+    per_stage = {}
+    for key, (counts, total) in histogram.values().items():
+        merged = per_stage.setdefault(key[stage_index], [[0] * len(counts), 0.0])
+        merged[0] = [a + b for a, b in zip(merged[0], counts)]
+        merged[1] += total
+
+    latencies = {}
+    for stage, (counts, total) in sorted(per_stage.items()):
+        latencies[stage] = {
+            "count": counts[-1],
+            "mean": round(total / counts[-1], 4) if counts[-1] else None,
+            "p50": _quantile(histogram.buckets, counts, 0.50),
+            "p95": _quantile(histogram.buckets, counts, 0.95),
+        }
+    return latencies
+
+def peak_rss_mb() -> dict:
+    """
+    :return: The peak resident set size of this process and of the
+        largest terminated child process (browsers, drivers) in MB
+    :rtype: dict
+    """
+
+    ## ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit, 1),
+        "largest_child": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit, 1),
+    }
+
+def run_benchmark(platform: str, pages: int, concurrency: int, cards_per_page: int, latency: float,
+                  polite: bool = False) -> dict:
+    """
+    Scrapes `pages` pages of the fixture site with `retrive_mulitiple_courses`,
+    `concurrency` page ranges at a time. With `polite` the politeness
+    scheduler paces the fixture site like a real host.
+
+    :return: The results of the run
+    :rtype: dict
+    """
+
+    site = FixtureSite(total_pages=pages, cards_per_page=cards_per_page, latency=latency).start()
+    os.environ["BASE_URL_UDEMY"] = site.udemy_url
+    os.environ["BASE_URL_PLURALSIGHT"] = site.pluralsight_url
+    if not polite:
+        ## the fixture site is not paced, unless set otherwise in the environment
+        os.environ.setdefault("SCRAPE_RATE_LIMITS", "127.0.0.1=1000")
+        os.environ.setdefault("SCRAPE_MAX_RATE", "1000")
+        os.environ.setdefault("SCRAPE_BURST", str(concurrency * 2))
+        os.environ.setdefault("SCRAPE_JITTER", "0")
+
+    ## Imported once the base urls point to the fixture site
+    from utils.metrics import SCRAPE_STAGE_SECONDS, EXTRACTION_FAILURES
+    from utils.web_scraper_scripts.multiple_pages_scraper import retrive_mulitiple_courses
+
+    ranges = split_pages(pages, concurrency)
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            results = list(executor.map(lambda r: retrive_mulitiple_courses(platform, r[0], r[1]), ranges))
+    finally:
+        site.stop()
+    elapsed = time.perf_counter() - start
+
+    courses = sum(len(result) for result in results)
+    return {
+        "platform": platform,
+        "pages": pages,
+        "concurrency": len(ranges),
+        "cards_per_page": cards_per_page,
+        "latency": latency,
+        "elapsed_seconds": round(elapsed, 3),
+        "pages_per_second": round(pages / elapsed, 4),
+        "courses": courses,
+        "courses_expected": pages * cards_per_page,
+        "extraction_failures": sum(EXTRACTION_FAILURES.values().values()),
+        "stages": stage_latencies(SCRAPE_STAGE_SECONDS),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def print_report(result: dict):
+    print(f"{result['platform']}: {result['pages']} pages, concurrency {result['concurrency']}")
+    print(f"  {result['elapsed_seconds']} s, {result['pages_per_second']} pages/s, "
+          f"{result['courses']}/{result['courses_expected']} courses, {result['extraction_failures']} extraction failures")
+    print(f"  peak RSS: {result['peak_rss_mb']['self']} MB (benchmark), "
+          f"{result['peak_rss_mb']['largest_child']} MB (largest child)")
+    print(f"  {'stage':<24}{'count':>8}{'mean s':>10}{'p50 s':>10}{'p95 s':>10}")
+    for stage, latency in result["stages"].items():
+        print(f"  {stage:<24}{latency['count']:>8}{latency['mean']:>10}{latency['p50']:>10}{latency['p95']:>10}")
+
+def check_regression(result: dict, baseline_path: str, max_regression: float) -> bool:
+    """
+    Compares the throughput with a previous result.
+
+    :return: False if the pages per second dropped by more than `max_regression` (a fraction)
+    :rtype: bool
+    """
+
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    change = result["pages_per_second"] / baseline["pages_per_second"] - 1
+    print(f"  throughput vs baseline: {change:+.1%} (allowed: -{max_regression:.0%})")
+    return change >= -max_regression
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the scrapers against a local fixture site.")
+    parser.add_argument("--platform", choices=["udemy", "pluralsight"], default="udemy")
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=1, help="Number of page ranges scraped in parallel")
+    parser.add_argument("--cards-per-page", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.0, help="Delay of every fixture response in seconds")
+    parser.add_argument("--polite", action="store_true", help="Paces the fixture site like a real host")
+    parser.add_argument("--output", help="Writes the result as JSON to this file")
+    parser.add_argument("--baseline", help="A previous JSON result to compare the throughput with")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed throughput drop (fraction)")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.platform, args.pages, args.concurrency, args.cards_per_page, args.latency, args.polite)
+    print_report(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.baseline and not check_regression(result, args.baseline, args.max_regression):
+        sys.exit(1)
@@ -0,0 +1,66 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+## Cold-start time and resident memory of the API process per app profile: every
+## sample is a new Python process that imports the application, like a new replica.
+##
+##   python -m benchmarks.startup_benchmark --runs 5 --output startup.json
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+print(json.dumps({
+    "import_seconds": elapsed,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit,
+    "modules": len(sys.modules),
+    "scraping_stack_loaded": "undetected_chromedriver" in sys.modules or "selenium" in sys.modules,
+    "routes": len(main.app.routes),
+}))
+"""
+
+def measure(profile: str, runs: int) -> dict:
+    """
+    :return: The median import time, peak RSS and module count of `runs` new processes
+    :rtype: dict
+    """
+
+    samples = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, "-c", PROBE],
+            env={**os.environ, "APP_PROFILE": profile},
+            capture_output=True, text=True, check=True,
+        )
+        samples.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    return {
+        "profile": profile,
+        "runs": runs,
+        "import_ms_median": round(statistics.median(s["import_seconds"] for s in samples) * 1000, 1),
+        "import_ms_min": round(min(s["import_seconds"] for s in samples) * 1000, 1),
+        "peak_rss_mb_median": round(statistics.median(s["peak_rss_mb"] for s in samples), 1),
+        "modules": samples[-1]["modules"],
+        "scraping_stack_loaded": samples[-1]["scraping_stack_loaded"],
+        "routes": samples[-1]["routes"],
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measures the cold-start time and memory of the API per app profile.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--profiles", default="full,readonly", help="Comma separated APP_PROFILE values")
+    parser.add_argument("--output", help="Writes the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = [measure(profile, args.runs) for profile in args.profiles.split(",")]
+    for result in results:
+        print(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,205 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.orm import Session
+from models.courses import Courses
+from schemas.course_filters import CourseFilters
+from .db_config import SessionLocal
+from .catalog_events import catalog_changed
+from utils.metrics import Counter
+from utils.logger import logger_setup
+import logging
+
+## Bulk deletes and garbage collection of the catalog. A bulk delete removes the courses of a
+## filter with one statement (the links go with the ON DELETE CASCADE of authors_courses and the
+## change feed logs a tombstone per course). What the courses leave behind (authors without
+## courses, links without an author or a course, unused difficulties) is removed afterwards in
+## the background, in small batches, each in its own short transaction.
+
+## Rows removed per transaction by the garbage collection, and the pause between two batches
+GC_BATCH_SIZE = int(os.getenv("GC_BATCH_SIZE", "1000"))
+GC_BATCH_PAUSE = float(os.getenv("GC_BATCH_PAUSE", "0.05"))
+
+## A batch waiting longer than this for a lock gives up (the next collection picks its rows again)
+GC_LOCK_TIMEOUT = os.getenv("GC_LOCK_TIMEOUT", "2s")
+
+GC_DELETED = Counter(
+    "catalog_gc_deleted_total",
+    "Rows removed by the garbage collection of the catalog.",
+    ("kind",)
+)
+
+DELETE_DANGLING_LINKS = text("""
+    DELETE FROM authors_courses
+    WHERE id IN (
+        SELECT id FROM authors_courses
+        WHERE author_id IS NULL OR course_id IS NULL
+        LIMIT :limit
+    )
+""")
+
+## The candidates are locked first (SKIP LOCKED: an author being linked right now is skipped,
+## and nobody can link a locked one), then deleted by a second statement whose snapshot sees
+## every link committed before the lock, so a new link is never set to NULL by the delete.
+LOCK_ORPHAN_AUTHORS = text("""
+    SELECT a.id FROM authors a
+    WHERE a.id > :after
+      AND NOT EXISTS (SELECT 1 FROM authors_courses ac WHERE ac.author_id = a.id)
+    ORDER BY a.id
+    LIMIT :limit
+    FOR UPDATE SKIP LOCKED
+""")
+
+DELETE_ORPHAN_AUTHORS = text("""
+    DELETE FROM authors a
+    WHERE a.id = ANY(:ids)
+      AND NOT EXISTS (SELECT 1 FROM authors_courses ac WHERE ac.author_id = a.id)
+""")
+
+LOCK_UNUSED_DIFFICULTIES = text("""
+    SELECT d.id FROM course_difficulties d
+    WHERE d.id > :after
+      AND NOT EXISTS (SELECT 1 FROM courses c WHERE c.difficulty_id = d.id)
+    ORDER BY d.id
+    LIMIT :limit
+    FOR UPDATE SKIP LOCKED
+""")
+
+DELETE_UNUSED_DIFFICULTIES = text("""
+    DELETE FROM course_difficulties d
+    WHERE d.id = ANY(:ids)
+      AND NOT EXISTS (SELECT 1 FROM courses c WHERE c.difficulty_id = d.id)
+""")
+
+def delete_courses(db: Session, filters: CourseFilters, dry_run: bool = False) -> dict:
+    """
+    Deletes every course matching the filters with a single DELETE, or only
+    counts them. The garbage collection is scheduled after a delete.
+
+    :param filters: The course filters, at least one must be set
+    :type filters: CourseFilters
+    :param dry_run: Only counts the matching courses
+    :type dry_run: bool
+    :raises ValueError: If no filter is set
+    :return: The number of matching and of deleted courses
+    :rtype: dict
+    """
+
+    if filters.is_empty():
+        raise ValueError("At least one filter is required to delete courses.")
+
+    query = filters.apply(db.query(Courses.id))
+    if query.whereclause is None:
+        ## never a DELETE of the whole catalog, whatever the filters let through
+        raise ValueError("At least one filter is required to delete courses.")
+    ids = query.subquery()
+    if dry_run:
+        matched = db.execute(select(func.count()).select_from(ids)).scalar()
+        return {"Matched": matched, "Deleted": 0, "Dry_run": True}
+
+    try:
+        deleted = db.execute(
+            delete(Courses).where(Courses.id.in_(select(ids.c.id))).execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    logging.info(f"Deleted {deleted} courses matching {filters.as_dict()}")
+    if deleted:
+        catalog_changed()
+        schedule_garbage_collection()
+    return {"Matched": deleted, "Deleted": deleted, "Dry_run": False}
+
+def _delete_in_batches(kind: str, run_batch) -> int:
+    """
+    Runs `run_batch(db, after)` in a new transaction until it returns less
+    than GC_BATCH_SIZE rows, pausing GC_BATCH_PAUSE seconds between batches.
+
+    :param run_batch: Removes a batch and returns (removed rows, rows examined, last id examined)
+    :return: The number of removed rows
+    :rtype: int
+    """
+
+    removed, after = 0, 0
+    db = SessionLocal()
+    try:
+        while True:
+            try:
+                db.execute(text(f"SET LOCAL lock_timeout = '{GC_LOCK_TIMEOUT}'"))
+                batch_removed, examined, after = run_batch(db, after)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logging.warning(f"Garbage collection of {kind} stopped: {e}")
+                break
+            removed += batch_removed
+            GC_DELETED.inc(batch_removed, kind=kind)
+            if examined < GC_BATCH_SIZE:
+                break
+            time.sleep(GC_BATCH_PAUSE)
+    finally:
+        db.close()
+    return removed
+
+def _dangling_links_batch(db: Session, after: int) -> tuple[int, int, int]:
+    removed = db.execute(DELETE_DANGLING_LINKS, {"limit": GC_BATCH_SIZE}).rowcount
+    return removed, removed, after
+
+def _locked_batch(lock_query, delete_query):
+    def run_batch(db: Session, after: int) -> tuple[int, int, int]:
+        ids = list(db.execute(lock_query, {"after": after, "limit": GC_BATCH_SIZE}).scalars())
+        if not ids:
+            return 0, 0, after
+        removed = db.execute(delete_query, {"ids": ids}).rowcount
+        return removed, len(ids), ids[-1]
+    return run_batch
+
+def collect_garbage() -> dict:
+    """
+    Removes the links without an author or a course, then the authors
+    without any course and the difficulties without any course, in batches
+    of GC_BATCH_SIZE rows.
+
+    :return: The number of removed rows of each kind
+    :rtype: dict
+    """
+
+    removed = {
+        "links": _delete_in_batches("links", _dangling_links_batch),
+        "authors": _delete_in_batches("authors", _locked_batch(LOCK_ORPHAN_AUTHORS, DELETE_ORPHAN_AUTHORS)),
+        "difficulties": _delete_in_batches("difficulties", _locked_batch(LOCK_UNUSED_DIFFICULTIES, DELETE_UNUSED_DIFFICULTIES)),
+    }
+    logging.info(f"Garbage collection removed {removed}")
+    if any(removed.values()):
+        catalog_changed()
+    return removed
+
+## A single thread, so collections never run in parallel with each other
+_gc_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="catalog-gc")
+_gc_pending = threading.Event()
+_gc_lock = threading.Lock()
+
+def _run_scheduled_collection():
+    ## cleared before the collection, so a delete during the collection schedules another one
+    _gc_pending.clear()
+    try:
+        collect_garbage()
+    except Exception as e:
+        logging.error(f"Garbage collection failed: {e}")
+
+def schedule_garbage_collection():
+    """
+    Schedules a garbage collection in the background.
+    Several deletes in a row lead to a single pending collection.
+    """
+
+    ## the check and the set are one step, so two writers never both submit
+    with _gc_lock:
+        if _gc_pending.is_set():
+            return
+        _gc_pending.set()
+    _gc_executor.submit(_run_scheduled_collection)
@@ -0,0 +1,29 @@
+from .catalog_stats import schedule_stats_refresh
+from .course_changes import schedule_changes_compaction
+from .reference_snapshot import reference_snapshot
+from utils.response_cache import response_cache
+
+def refresh_derived_data():
+    """
+    Schedules a refresh of the statistics views, rebuilds the reference
+    snapshot and compacts the change log (at most every
+    CHANGES_COMPACT_INTERVAL) in the background. The API calls it when it
+    reads a new data version, so the writes of the scrape workers (which
+    only commit, the triggers bump the version) are followed too.
+    """
+
+    schedule_stats_refresh()
+    reference_snapshot.schedule_rebuild()
+    schedule_changes_compaction()
+
+def catalog_changed():
+    """
+    Must be called by the API after every committed write to the catalog
+    (courses, authors, difficulties or their links).
+
+    Invalidates the cached responses and ETags and schedules the
+    `refresh_derived_data` work.
+    """
+
+    response_cache.data_changed()
+    refresh_derived_data()
@@ -0,0 +1,269 @@
+import os
+from enum import Enum
+from typing import Iterator
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from .db_config import engine
+from utils.metrics import Counter
+from utils.logger import logger_setup
+import logging
+
+## Columnar export of the catalog (GET /get_data/export/{table} and export_catalog.py): the rows
+## are read with a server-side cursor, EXPORT_BATCH_ROWS at a time, and every batch is written
+## as an Arrow record batch (a Parquet row group), so the memory does not grow with the catalog.
+## Requires pyarrow (in requirements.txt). It is only imported by the export, so the API still
+## starts (and only the export fails) on an image built without it.
+
+## Rows fetched from the cursor and written at once
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "20000"))
+
+## Compression of the Parquet files (zstd, snappy, gzip or none)
+EXPORT_PARQUET_COMPRESSION = os.getenv("EXPORT_PARQUET_COMPRESSION", "zstd")
+
+EXPORT_ROWS = Counter(
+    "catalog_export_rows_total",
+    "Rows written by the catalog export.",
+    ("table", "format")
+)
+
+class ExportTable(str, Enum):
+    """
+    The tables of the catalog that can be exported.
+    """
+
+    courses = "courses"
+    authors = "authors"
+    authors_courses = "authors_courses"
+
+class ExportFormat(str, Enum):
+    """
+    parquet: a Parquet file with a row group per batch.
+    arrow: an Arrow IPC file (Feather v2), readable with `pyarrow.ipc.open_file` or `pandas.read_feather`.
+    """
+
+    parquet = "parquet"
+    arrow = "arrow"
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.parquet: "application/vnd.apache.parquet",
+    ExportFormat.arrow: "application/vnd.apache.arrow.file",
+}
+
+## The difficulty is joined as text, the rest is exported as stored
+EXPORT_QUERIES = {
+    ExportTable.courses: text("""
+        SELECT c.id, c.name, c.url, c.created_at, c.duration, c.total_lectures, c.rating,
+               c.total_students, c.current_price, c.original_price, c.difficulty_id,
+               d.difficulty, c.last_seen_at, c.description, c.last_updated_at, c.enriched_at,
+               c.updated_at
+        FROM courses c
+        LEFT JOIN course_difficulties d ON d.id = c.difficulty_id
+        ORDER BY c.id
+    """),
+    ExportTable.authors: text("SELECT id, name FROM authors ORDER BY id"),
+    ExportTable.authors_courses: text("SELECT id, author_id, course_id FROM authors_courses ORDER BY id"),
+}
+
+class PyarrowMissing(RuntimeError):
+    pass
+
+def import_pyarrow():
+    """
+    :raises PyarrowMissing: If pyarrow is not installed
+    :return: The pyarrow module
+    """
+
+    try:
+        import pyarrow  ## only needed for the export
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise PyarrowMissing("The catalog export requires pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+def export_schema(table: ExportTable):
+    """
+    The Arrow schema of a table, with the types of the columns in PostgreSQL:
+    the prices stay decimals (numeric(10,2)), the timestamps are in UTC and
+    `last_updated_at` is a date.
+
+    :rtype: pyarrow.Schema
+    """
+
+    pa = import_pyarrow()
+    utc = pa.timestamp("us", tz="UTC")
+    price = pa.decimal128(10, 2)
+    schemas = {
+        ExportTable.courses: [
+            pa.field("id", pa.int32(), nullable=False),
+            ("name", pa.string()),
+            ("url", pa.string()),
+            ("created_at", utc),
+            ("duration", pa.float64()),
+            ("total_lectures", pa.int32()),
+            ("rating", pa.float64()),
+            ("total_students", pa.int32()),
+            ("current_price", price),
+            ("original_price", price),
+            ("difficulty_id", pa.int32()),
+            ("difficulty", pa.string()),
+            ("last_seen_at", utc),
+            ("description", pa.string()),
+            ("last_updated_at", pa.date32()),
+            ("enriched_at", utc),
+            ("updated_at", utc),
+        ],
+        ExportTable.authors: [
+            pa.field("id", pa.int32(), nullable=False),
+            ("name", pa.string()),
+        ],
+        ExportTable.authors_courses: [
+            pa.field("id", pa.int32(), nullable=False),
+            ("author_id", pa.int32()),
+            ("course_id", pa.int32()),
+        ],
+    }
+    return pa.schema(schemas[table])
+
+def iter_record_batches(connection: Connection, table: ExportTable, batch_rows: int = EXPORT_BATCH_ROWS) -> Iterator:
+    """
+    Reads a table with a server-side cursor and yields it as record batches
+    of at most `batch_rows` rows, so only one batch is in memory at a time.
+
+    :param connection: The connection (and transaction) the table is read in
+    :type connection: Connection
+    :return: The record batches of the table, ordered by id
+    :rtype: Iterator[pyarrow.RecordBatch]
+    """
+
+    pa = import_pyarrow()
+    schema = export_schema(table)
+    result = connection.execution_options(stream_results=True, yield_per=batch_rows).execute(EXPORT_QUERIES[table])
+    try:
+        for rows in result.partitions(batch_rows):
+            columns = zip(*rows)
+            yield pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            )
+    finally:
+        result.close()
+
+def open_writer(sink, table: ExportTable, export_format: ExportFormat):
+    """
+    :param sink: A path or a writable file object
+    :return: A writer of the table with `write_batch` and `close`
+    """
+
+    pa = import_pyarrow()
+    schema = export_schema(table)
+    if export_format == ExportFormat.parquet:
+        compression = None if EXPORT_PARQUET_COMPRESSION == "none" else EXPORT_PARQUET_COMPRESSION
+        return pa.parquet.ParquetWriter(sink, schema, compression=compression)
+    return pa.ipc.new_file(sink, schema)
+
+def write_table(connection: Connection, table: ExportTable, export_format: ExportFormat, sink,
+                batch_rows: int = EXPORT_BATCH_ROWS) -> int:
+    """
+    Writes a table to a sink, batch by batch.
+
+    :param sink: A path or a writable file object
+    :return: The number of rows written
+    :rtype: int
+    """
+
+    writer = open_writer(sink, table, export_format)
+    rows = 0
+    try:
+        for batch in iter_record_batches(connection, table, batch_rows):
+            writer.write_batch(batch)
+            rows += batch.num_rows
+            EXPORT_ROWS.inc(batch.num_rows, table=table.value, format=export_format.value)
+    finally:
+        writer.close()
+    return rows
+
+class _ChunkSink:
+    """
+    A write-only file object that keeps what was written until it is drained,
+    so the export can be streamed without a temporary file.
+    """
+
+    closed = False
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def stream_table(table: ExportTable, export_format: ExportFormat, batch_rows: int = EXPORT_BATCH_ROWS) -> Iterator[bytes]:
+    """
+    The bytes of the exported table, yielded after every batch, for a streaming
+    response. The table is read in one read-only transaction with its own connection.
+
+    :return: The parts of the file
+    :rtype: Iterator[bytes]
+    """
+
+    pa = import_pyarrow()
+    sink = _ChunkSink()
+    with engine.connect() as connection:
+        connection.exec_driver_sql("SET TRANSACTION READ ONLY")
+        writer = open_writer(pa.PythonFile(sink, mode="w"), table, export_format)
+        rows = 0
+        try:
+            for batch in iter_record_batches(connection, table, batch_rows):
+                writer.write_batch(batch)
+                rows += batch.num_rows
+                EXPORT_ROWS.inc(batch.num_rows, table=table.value, format=export_format.value)
+                yield sink.drain()
+        finally:
+            writer.close()
+        ## the footer of the file
+        yield sink.drain()
+        logging.info(f"Exported {rows} rows of {table.value} as {export_format.value}")
+
+def export_catalog(output_dir: str, export_format: ExportFormat, tables: list[ExportTable] = None,
+                   batch_rows: int = EXPORT_BATCH_ROWS) -> dict:
+    """
+    Writes the tables to `output_dir` (one file per table, e.g. courses.parquet).
+    All the tables are read in one repeatable read transaction, so the links
+    match the exported courses and authors.
+
+    :param tables: The tables to export, all by default
+    :return: The path and the number of rows of every exported table
+    :rtype: dict
+    """
+
+    tables = tables or list(ExportTable)
+    os.makedirs(output_dir, exist_ok=True)
+    exported = {}
+    with engine.connect() as connection:
+        connection.exec_driver_sql("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        for table in tables:
+            path = os.path.join(output_dir, f"{table.value}.{export_format.value}")
+            rows = write_table(connection, table, export_format, path, batch_rows)
+            exported[table.value] = {"path": path, "rows": rows}
+            logging.info(f"Exported {rows} rows of {table.value} to {path}")
+    return exported
@@ -0,0 +1,94 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from .db_config import SessionLocal
+from utils.logger import logger_setup
+import logging
+
+## Materialized views created by the migration 3f1c9a7d2b64
+CATALOG_STATS_VIEWS = (
+    "catalog_difficulty_stats",
+    "catalog_rating_distribution",
+    "catalog_author_stats",
+    "catalog_platform_stats",
+)
+
+## A single thread, so refreshes never run in parallel with each other
+_refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="catalog-stats-refresh")
+_refresh_pending = threading.Event()
+_refresh_lock = threading.Lock()
+
+def refresh_catalog_stats():
+    """
+    Refreshes all catalog statistics views. CONCURRENTLY keeps
+    the views readable while they are rebuilt.
+    """
+
+    db = SessionLocal()
+    try:
+        for view in CATALOG_STATS_VIEWS:
+            db.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view}"))
+        db.commit()
+        logging.info("Catalog statistics refreshed")
+    except Exception as e:
+        db.rollback()
+        logging.error(f"Catalog statistics refresh failed: {e}")
+    finally:
+        db.close()
+
+def _run_scheduled_refresh():
+    ## cleared before the refresh, so a write during the refresh schedules another one
+    _refresh_pending.clear()
+    refresh_catalog_stats()
+
+def schedule_stats_refresh():
+    """
+    Schedules a refresh of the statistics views in the background.
+    Several writes in a row lead to a single pending refresh.
+    """
+
+    ## the check and the set are one step, so two writers never both submit
+    with _refresh_lock:
+        if _refresh_pending.is_set():
+            return
+        _refresh_pending.set()
+    _refresh_executor.submit(_run_scheduled_refresh)
+
+def get_catalog_stats(db: Session, top_authors: int) -> dict:
+    """
+    Reads the aggregates from the materialized views.
+
+    :param db: The database session
+    :type db: Session
+    :param top_authors: How many authors (by total students) to return
+    :type top_authors: int
+    :return: A dict in the shape of `CatalogStatsOut`
+    :rtype: dict
+    """
+
+    difficulties = db.execute(text(
+        "SELECT difficulty_id, difficulty, course_count, avg_current_price, avg_rating, total_students "
+        "FROM catalog_difficulty_stats ORDER BY difficulty_id"
+    )).mappings().all()
+
+    ratings = db.execute(text(
+        "SELECT rating_bucket, course_count FROM catalog_rating_distribution ORDER BY rating_bucket"
+    )).mappings().all()
+
+    authors = db.execute(text(
+        "SELECT author_id, name, course_count, total_students FROM catalog_author_stats "
+        "ORDER BY total_students DESC, author_id LIMIT :limit"
+    ), {"limit": top_authors}).mappings().all()
+
+    platforms = db.execute(text(
+        "SELECT platform, course_count, avg_rating, avg_current_price "
+        "FROM catalog_platform_stats ORDER BY course_count DESC"
+    )).mappings().all()
+
+    return {
+        "difficulties": [dict(row) for row in difficulties],
+        "rating_distribution": [dict(row) for row in ratings],
+        "top_authors": [dict(row) for row in authors],
+        "platforms": [dict(row) for row in platforms],
+    }
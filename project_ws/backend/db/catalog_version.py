@@ -0,0 +1,39 @@
+from sqlalchemy import text
+from .db_config import engine
+
+## The data version of the catalog, kept in the catalog_version table. Every transaction that
+## writes to the catalog bumps it when it commits (triggers), whatever process runs it: the API,
+## the scrape workers, the enrichment or a manual SQL statement. The response cache reads it
+## (see `ResponseCache.use_version_store`), so the cached responses and the ETags of every API
+## process follow the writes of every other process.
+
+SELECT_VERSION = text("SELECT version FROM catalog_version WHERE id = 1")
+BUMP_VERSION = text("UPDATE catalog_version SET version = version + 1 WHERE id = 1 RETURNING version")
+
+class CatalogVersionStore:
+    """
+    Reads and bumps the data version of the catalog, each with its own connection.
+    """
+
+    def read(self) -> int:
+        """
+        :return: The current data version of the catalog
+        :rtype: int
+        """
+
+        with engine.connect() as connection:
+            return connection.execute(SELECT_VERSION).scalar_one()
+
+    def bump(self) -> int:
+        """
+        Bumps the version without writing to the catalog
+        (the writes bump it themselves).
+
+        :return: The new data version
+        :rtype: int
+        """
+
+        with engine.begin() as connection:
+            return connection.execute(BUMP_VERSION).scalar_one()
+
+catalog_version_store = CatalogVersionStore()
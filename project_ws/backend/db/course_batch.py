@@ -0,0 +1,69 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+## Maximum number of ids accepted by a single batch lookup
+MAX_BATCH_IDS = 5000
+
+COURSES_BY_IDS = text("""
+    SELECT c.id, c.name, c.url, c.duration, c.total_lectures, c.rating, c.total_students,
+           c.current_price::float8 AS current_price, c.original_price::float8 AS original_price,
+           c.description, c.last_updated_at, c.updated_at,
+           d.id AS difficulty_id, d.difficulty
+    FROM courses c
+    LEFT JOIN course_difficulties d ON d.id = c.difficulty_id
+    WHERE c.id = ANY(:ids)
+""")
+
+AUTHORS_BY_COURSE_IDS = text("""
+    SELECT ac.course_id, a.id, a.name
+    FROM authors_courses ac
+    JOIN authors a ON a.id = ac.author_id
+    WHERE ac.course_id = ANY(:ids)
+    ORDER BY ac.course_id, a.id
+""")
+
+def fetch_courses_by_ids(db: Session, ids: list[int]) -> tuple[list[dict], list[int]]:
+    """
+    Resolves a list of course ids with one query for the courses
+    and one for their authors, whatever the number of ids.
+
+    :param db: The database session
+    :type db: Session
+    :param ids: The requested course ids (duplicates are ignored)
+    :type ids: list[int]
+    :return: The courses in the shape of `CourseOut`, in the requested
+        order, and the requested ids that do not exist
+    :rtype: tuple[list[dict], list[int]]
+    """
+
+    ids = list(dict.fromkeys(ids))  ## removes duplicates, keeps the order
+
+    courses = {}
+    for row in db.execute(COURSES_BY_IDS, {"ids": ids}).mappings():
+        courses[row["id"]] = {
+            "id": row["id"],
+            "name": row["name"],
+            "url": row["url"],
+            "duration": row["duration"],
+            "total_lectures": row["total_lectures"],
+            "rating": row["rating"],
+            "total_students": row["total_students"],
+            "current_price": row["current_price"],
+            "original_price": row["original_price"],
+            "description": row["description"],
+            "last_updated_at": row["last_updated_at"].isoformat() if row["last_updated_at"] else None,
+            "updated_at": row["updated_at"].isoformat() if row["updated_at"] else None,
+            "difficulty": (
+                {"id": row["difficulty_id"], "difficulty": row["difficulty"]}
+                if row["difficulty_id"] is not None else None
+            ),
+            "authors": [],
+        }
+
+    if courses:
+        for row in db.execute(AUTHORS_BY_COURSE_IDS, {"ids": list(courses)}).mappings():
+            courses[row["course_id"]]["authors"].append({"id": row["id"], "name": row["name"]})
+
+    found = [courses[course_id] for course_id in ids if course_id in courses]
+    missing = [course_id for course_id in ids if course_id not in courses]
+    return found, missing
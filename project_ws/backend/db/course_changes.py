@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from .db_config import SessionLocal
+from .course_batch import fetch_courses_by_ids
+from utils.logger import logger_setup
+import logging
+
+## Change feed of the courses (GET /get_data/changes). Triggers log every insert, update and
+## delete of a course, and every change of its author links, in the course_changes table with
+## the id of the writing transaction (see the course_change_feed migration). The feed reads the
+## log in (txid, id) order from a cursor and stops before the oldest transaction still running
+## (pg_snapshot_xmin), so a transaction that commits later can never land behind a cursor that
+## was already returned. A sync reads the changes since its cursor only, never the catalog.
+
+## Log entries read per request by default, and at most
+CHANGES_PAGE_SIZE = int(os.getenv("CHANGES_PAGE_SIZE", "1000"))
+CHANGES_MAX_PAGE_SIZE = int(os.getenv("CHANGES_MAX_PAGE_SIZE", "10000"))
+
+## Seconds between two compactions of the log (only the last change of every course is needed)
+CHANGES_COMPACT_INTERVAL = float(os.getenv("CHANGES_COMPACT_INTERVAL", "3600"))
+
+SELECT_CHANGES = text("""
+    SELECT id, txid, course_id, operation, url, changed_at
+    FROM course_changes
+    WHERE (txid, id) > (:txid, :id)
+      AND txid < pg_snapshot_xmin(pg_current_snapshot())::text::bigint
+    ORDER BY txid, id
+    LIMIT :limit
+""")
+
+## A consumer at any cursor still finds, after it, the last change of every course changed after
+## it, so the older changes of a course can be removed. Only finished transactions are compacted.
+COMPACT_CHANGES = text("""
+    DELETE FROM course_changes
+    WHERE id IN (
+        SELECT id FROM (
+            SELECT id, row_number() OVER (PARTITION BY course_id ORDER BY txid DESC, id DESC) AS position
+            FROM course_changes
+            WHERE txid < pg_snapshot_xmin(pg_current_snapshot())::text::bigint
+        ) ranked
+        WHERE position > 1
+    )
+""")
+
+def encode_cursor(txid: int, change_id: int) -> str:
+    """
+    :return: The cursor after the change (txid, id)
+    :rtype: str
+    """
+
+    return f"{txid}-{change_id}"
+
+def decode_cursor(cursor: str | None) -> tuple[int, int]:
+    """
+    :param cursor: A cursor returned by the feed, None (or empty) for the start of the feed
+    :raises ValueError: If the cursor is malformed
+    :return: The txid and the id of the last change read
+    :rtype: tuple[int, int]
+    """
+
+    if not cursor:
+        return 0, 0
+    txid, _, change_id = cursor.partition("-")
+    if not txid.isdigit() or not change_id.isdigit():
+        raise ValueError(f"Invalid cursor '{cursor}'")
+    return int(txid), int(change_id)
+
+def get_changes(db: Session, cursor: str | None, limit: int = CHANGES_PAGE_SIZE) -> dict:
+    """
+    Reads up to `limit` log entries after the cursor and returns one change
+    per course, in the order of its last entry, with the current state of
+    the course (or a tombstone if it no longer exists).
+
+    The state is read now, so it may already include a later change; that
+    change comes again in a later page. Applying the changes as upserts and
+    deletes by course id converges to the catalog.
+
+    :param cursor: The cursor of the previous page, None for the start of the feed
+    :type cursor: str | None
+    :param limit: The maximum number of log entries to read
+    :type limit: int
+    :raises ValueError: If the cursor is malformed
+    :return: The changes, the cursor of the next page and whether more changes are ready
+    :rtype: dict
+    """
+
+    txid, change_id = decode_cursor(cursor)
+    rows = db.execute(SELECT_CHANGES, {"txid": txid, "id": change_id, "limit": limit}).mappings().all()
+    if not rows:
+        return {"changes": [], "cursor": encode_cursor(txid, change_id), "has_more": False}
+
+    ## one change per course, at the position of its last entry
+    last_entries, inserted = {}, set()
+    for row in rows:
+        last_entries.pop(row["course_id"], None)
+        last_entries[row["course_id"]] = row
+        if row["operation"] == "insert":
+            inserted.add(row["course_id"])
+
+    courses, _ = fetch_courses_by_ids(db, list(last_entries))
+    courses = {course["id"]: course for course in courses}
+
+    changes = []
+    for course_id, row in last_entries.items():
+        course = courses.get(course_id)
+        if course is None:
+            operation = "delete"
+        else:
+            operation = "insert" if course_id in inserted else "update"
+        changes.append({
+            "operation": operation,
+            "course_id": course_id,
+            "url": course["url"] if course else row["url"],
+            "changed_at": row["changed_at"],
+            "course": course,
+        })
+
+    last = rows[-1]
+    return {"changes": changes, "cursor": encode_cursor(last["txid"], last["id"]), "has_more": len(rows) == limit}
+
+def compact_course_changes() -> int:
+    """
+    Removes the log entries of every course but its last one (in finished
+    transactions), so the log grows with the number of courses, not of writes.
+
+    :return: The number of removed entries
+    :rtype: int
+    """
+
+    db = SessionLocal()
+    try:
+        removed = db.execute(COMPACT_CHANGES).rowcount
+        db.commit()
+        logging.info(f"Course change log compacted: {removed} entries removed")
+        return removed
+    except Exception as e:
+        db.rollback()
+        logging.error(f"Course change log compaction failed: {e}")
+        return 0
+    finally:
+        db.close()
+
+## A single thread, so compactions never run in parallel with each other
+_compact_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="course-changes-compact")
+_compact_lock = threading.Lock()
+_last_compaction = None
+
+def schedule_changes_compaction():
+    """
+    Compacts the log in the background, at most every CHANGES_COMPACT_INTERVAL seconds.
+    """
+
+    global _last_compaction
+    with _compact_lock:
+        now = time.monotonic()
+        if _last_compaction is not None and now - _last_compaction < CHANGES_COMPACT_INTERVAL:
+            return
+        _last_compaction = now
+    _compact_executor.submit(compact_course_changes)
@@ -0,0 +1,167 @@
+import os
+import re
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from .catalog_events import catalog_changed
+from utils.logger import logger_setup
+import logging
+
+## Enrichment of the courses with their detail page (description, last update and the
+## fields the listing cards do not have), see enrich_courses.py and POST /save_data/enrich_courses.
+
+## Detail pages loaded at once, each in its own pooled browser
+ENRICH_CONCURRENCY = int(os.getenv("ENRICH_CONCURRENCY", "4"))
+
+## A course enriched less than ENRICH_MAX_AGE seconds ago is skipped
+ENRICH_MAX_AGE = float(os.getenv("ENRICH_MAX_AGE", str(7 * 24 * 3600)))
+
+## A course whose detail page failed is retried after ENRICH_RETRY_DELAY seconds, doubled
+## after every failure in a row, and at most after ENRICH_MAX_AGE
+ENRICH_RETRY_DELAY = float(os.getenv("ENRICH_RETRY_DELAY", "3600"))
+
+## Enriched courses committed at once
+ENRICH_COMMIT_BATCH = int(os.getenv("ENRICH_COMMIT_BATCH", "50"))
+
+## Never enriched first, then the oldest enrichment (index ix_courses_enriched_at_id), without
+## the courses whose last failure is more recent than their retry delay
+SELECT_COURSES_TO_ENRICH = text("""
+    SELECT id, url
+    FROM courses
+    WHERE (enriched_at IS NULL OR enriched_at < now() - make_interval(secs => :max_age))
+      AND (enrich_failures = 0 OR enrich_attempted_at < now() - make_interval(
+               secs => least(:retry_delay * power(2, enrich_failures - 1), :max_age)))
+      AND (CAST(:host_pattern AS text) IS NULL OR url ~* :host_pattern)
+    ORDER BY enriched_at NULLS FIRST, id
+    LIMIT :limit
+""")
+
+## The description and the last update come from the detail page; the fields of the
+## listing cards are only filled when the card did not have them
+APPLY_COURSE_DETAILS = text("""
+    UPDATE courses
+    SET description = coalesce(:description, description),
+        last_updated_at = coalesce(:last_updated_at, last_updated_at),
+        total_lectures = coalesce(total_lectures, :total_lectures),
+        total_students = coalesce(total_students, :total_students),
+        current_price = coalesce(current_price, :current_price),
+        original_price = coalesce(original_price, :original_price),
+        enriched_at = now(),
+        enrich_attempted_at = now(),
+        enrich_failures = 0
+    WHERE id = :id
+""")
+
+RECORD_ENRICH_FAILURE = text("""
+    UPDATE courses
+    SET enrich_attempted_at = now(), enrich_failures = enrich_failures + 1
+    WHERE id = :id
+""")
+
+def select_courses_to_enrich(db: Session, limit: int, hosts: tuple = None, max_age: float = ENRICH_MAX_AGE,
+                             retry_delay: float = ENRICH_RETRY_DELAY) -> list[dict]:
+    """
+    :param limit: The maximum number of courses
+    :type limit: int
+    :param hosts: Only the courses on these domains (e.g. the hosts of a platform adapter), all if None
+    :type hosts: tuple
+    :param max_age: Courses enriched less than `max_age` seconds ago are skipped
+    :type max_age: float
+    :param retry_delay: Delay before a failed course is retried, doubled after every failure in a row
+    :type retry_delay: float
+    :return: id and url of the courses to enrich, never enriched first
+    :rtype: list[dict]
+    """
+
+    host_pattern = None
+    if hosts:
+        host_pattern = rf"^https?://([^/]+\.)?({'|'.join(re.escape(host) for host in hosts)})(:\d+)?/"
+    params = {"limit": limit, "max_age": max_age, "retry_delay": retry_delay, "host_pattern": host_pattern}
+    return [dict(row) for row in db.execute(SELECT_COURSES_TO_ENRICH, params).mappings()]
+
+def apply_course_details(db: Session, course_id: int, details: dict):
+    """
+    Stores the fields of a detail page and marks the course enriched.
+    Not committed: the caller commits the courses in batches.
+
+    :param course_id: The id of the course
+    :type course_id: int
+    :param details: The fields returned by `extract_course_details`
+    :type details: dict
+    """
+
+    def parse_price(price_str: str) -> float:
+        if price_str is None:
+            return None
+        return float(str(price_str).replace("€", "").replace(",", "").strip())
+
+    db.execute(APPLY_COURSE_DETAILS, {
+        "id": course_id,
+        "description": details.get("description"),
+        "last_updated_at": details.get("last_updated_at"),
+        "total_lectures": details.get("total_lectures"),
+        "total_students": details.get("total_students"),
+        "current_price": parse_price(details.get("current_price")),
+        "original_price": parse_price(details.get("original_price")),
+    })
+
+def enrich_courses(db: Session, limit: int, concurrency: int = ENRICH_CONCURRENCY, platform: str = None,
+                   max_age: float = ENRICH_MAX_AGE, scrape=None) -> dict:
+    """
+    Scrapes the detail pages of up to `limit` courses that are not enriched (or not
+    recently), `concurrency` pages at once, and commits them in batches. Only the
+    courses of platforms with a detail page scraper are picked. A failed course
+    keeps its fields, its failure is recorded and it is retried after a backoff
+    (ENRICH_RETRY_DELAY), so it does not take the place of the others every run.
+
+    :param concurrency: Detail pages loaded at once
+    :param platform: Only the courses of this registered platform, all if None
+    :type concurrency: int
+    :param scrape: The function scraping the detail pages, `scrape_courses_details` by default
+    :return: The number of enriched courses and the ids of the failed ones
+    :rtype: dict
+    """
+
+    ## imported here so the API starts without the scraping stack (see main.py)
+    from utils.web_scraper_scripts.platforms import get_platform, platform_names
+    if scrape is None:
+        from utils.web_scraper_scripts.detail_pages_scraper import scrape_courses_details
+        scrape = scrape_courses_details
+
+    adapters = [get_platform(name) for name in ([platform] if platform else platform_names())]
+    hosts = tuple(host for adapter in adapters if adapter.extract_details is not None for host in adapter.hosts)
+    if not hosts:
+        logging.warning(f"No detail page scraper for {platform or 'any platform'}, nothing to enrich")
+        return {"Enriched": 0, "Failed": [], "Selected": 0}
+    courses = select_courses_to_enrich(db, limit, hosts, max_age)
+    logging.info(f"Enriching {len(courses)} courses, {concurrency} detail pages at once")
+
+    enriched, committed, pending, failed = 0, 0, 0, []
+    try:
+        for course, details, error in scrape(courses, concurrency):
+            if error is None:
+                try:
+                    ## a savepoint per course: a bad value does not roll back the rest of the batch
+                    with db.begin_nested():
+                        apply_course_details(db, course["id"], details)
+                except Exception as e:
+                    logging.error(f"Details of course {course['id']} could not be stored: {e}")
+                    error = e
+            if error is not None:
+                failed.append(course["id"])
+                db.execute(RECORD_ENRICH_FAILURE, {"id": course["id"]})
+            else:
+                enriched += 1
+            pending += 1
+            if pending >= ENRICH_COMMIT_BATCH:
+                db.commit()
+                committed, pending = enriched, 0
+        db.commit()
+    except Exception:
+        db.rollback()
+        enriched = committed
+        raise
+    finally:
+        if enriched:
+            catalog_changed()
+
+    return {"Enriched": enriched, "Failed": failed, "Selected": len(courses)}
@@ -0,0 +1,104 @@
+from sqlalchemy import case, func, select, tuple_
+from sqlalchemy.orm import Session
+from models.authors import Authors, Authors_Courses
+from models.courses import Courses, Course_difficulties
+
+## Upper bounds (excluded) of the price buckets, the last bucket is open
+PRICE_BUCKET_BOUNDS = (20, 50, 100, 200)
+
+def price_bucket():
+    """
+    Label of the price bucket of a course, e.g. "20-50".
+    Courses without a price (Pluralsight) fall in "unknown".
+    """
+
+    whens = [(Courses.current_price.is_(None), "unknown"), (Courses.current_price == 0, "free")]
+    lower = 0
+    for upper in PRICE_BUCKET_BOUNDS:
+        whens.append((Courses.current_price < upper, f"{lower}-{upper}"))
+        lower = upper
+    return case(*whens, else_=f"{lower}+")
+
+def rating_bucket():
+    """
+    Lower bound of the rating bucket of a course (buckets of width 0.5),
+    the same buckets as the `catalog_rating_distribution` view.
+    """
+
+    return func.floor(Courses.rating * 2) / 2
+
+def count_course_facets(db: Session, course_ids, top_authors: int) -> dict:
+    """
+    Counts the filtered courses per difficulty, price bucket, rating bucket
+    and author in a single query, using GROUPING SETS.
+
+    :param db: The database session
+    :type db: Session
+    :param course_ids: A select of the ids of the filtered courses
+    :type course_ids: Select
+    :param top_authors: How many authors (by number of courses) to return
+    :type top_authors: int
+    :return: A dict in the shape of `CourseFacetsOut`
+    :rtype: dict
+    """
+
+    price = price_bucket().label("price_bucket")
+    rating = rating_bucket().label("rating_bucket")
+
+    ## Courses are joined with their authors, so courses are counted as distinct ids
+    statement = (
+        select(
+            Course_difficulties.difficulty,
+            price,
+            rating,
+            Authors.id.label("author_id"),
+            Authors.name.label("author_name"),
+            func.grouping(Course_difficulties.difficulty).label("by_difficulty"),
+            func.grouping(price).label("by_price"),
+            func.grouping(rating).label("by_rating"),
+            func.grouping(Authors.id, Authors.name).label("by_author"),
+            func.count(Courses.id.distinct()).label("count")
+        )
+        .select_from(Courses)
+        .outerjoin(Course_difficulties, Course_difficulties.id == Courses.difficulty_id)
+        .outerjoin(Authors_Courses, Authors_Courses.course_id == Courses.id)
+        .outerjoin(Authors, Authors.id == Authors_Courses.author_id)
+        .where(Courses.id.in_(course_ids.correlate(None)))
+        .group_by(func.grouping_sets(
+            tuple_(Course_difficulties.difficulty),
+            tuple_(price),
+            tuple_(rating),
+            tuple_(Authors.id, Authors.name),
+            tuple_()
+        ))
+    )
+
+    facets = {
+        "total": 0,
+        "difficulties": [],
+        "price_buckets": [],
+        "rating_buckets": [],
+        "top_authors": [],
+    }
+    for row in db.execute(statement):
+        ## grouping() is 0 for the columns of the grouping set a row belongs to
+        if row.by_difficulty == 0:
+            facets["difficulties"].append({"value": row.difficulty, "count": row.count})
+        elif row.by_price == 0:
+            facets["price_buckets"].append({"value": row.price_bucket, "count": row.count})
+        elif row.by_rating == 0:
+            if row.rating_bucket is not None:
+                facets["rating_buckets"].append({"value": float(row.rating_bucket), "count": row.count})
+        elif row.by_author == 0:
+            if row.author_id is not None:
+                facets["top_authors"].append({"id": row.author_id, "name": row.author_name, "count": row.count})
+        else:
+            facets["total"] = row.count
+
+    facets["difficulties"].sort(key=lambda facet: -facet["count"])
+    facets["price_buckets"].sort(key=lambda facet: -facet["count"])
+    facets["rating_buckets"].sort(key=lambda facet: facet["value"])
+    facets["top_authors"].sort(key=lambda facet: (-facet["count"], facet["id"]))
+    facets["top_authors"] = facets["top_authors"][:top_authors]
+
+    return facets
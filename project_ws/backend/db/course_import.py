@@ -0,0 +1,351 @@
+import codecs
+import json
+import os
+import re
+from typing import AsyncIterator
+from pydantic import ValidationError
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from models.authors import Authors, Authors_Courses
+from schemas.web_retrieval_schema import CourseInput
+from .catalog_events import catalog_changed
+from .course_ingestion import insert_course, course_values, get_or_create_difficulty, upsert_courses_statement
+from utils.metrics import Counter
+from utils.logger import logger_setup
+import logging
+
+## Import of courses scraped elsewhere (POST /save_data/import_courses): the body is read as it
+## arrives, as NDJSON (one CourseInput per line) or JSON (a CoursesInput object or an array of
+## CourseInput), and the records are validated and written in batches of IMPORT_BATCH_SIZE,
+## so only one batch is in memory. A bad record is reported with its index and skipped.
+
+## Records validated and committed at once
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+
+## A single record larger than this (in characters) is rejected instead of being buffered
+IMPORT_MAX_RECORD_SIZE = int(os.getenv("IMPORT_MAX_RECORD_SIZE", str(1024 * 1024)))
+
+## Errors listed in the response (the others are only counted)
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines")
+
+IMPORTED_RECORDS = Counter(
+    "course_import_records_total",
+    "Records of the course imports, by result (imported or failed).",
+    ("result",)
+)
+
+## The lowest id wins when a name is in the table more than once, like in course_ingestion.
+## The authors are locked FOR KEY SHARE like in course_ingestion (no aggregate with a lock).
+SELECT_AUTHOR_IDS = text("SELECT name, id FROM authors WHERE name = ANY(:names) ORDER BY id DESC FOR KEY SHARE")
+SELECT_LINKS = text("SELECT course_id, author_id FROM authors_courses WHERE course_id = ANY(:course_ids)")
+
+_WHITESPACE = re.compile(r"\s*")
+_COURSES_KEY = re.compile(r'\s*"courses"\s*:\s*\[')
+
+class ImportFormatError(ValueError):
+    """
+    The JSON body cannot be parsed further: the import stops there
+    (the batches written before are kept).
+    """
+
+    pass
+
+def _record_or_error(value) -> tuple[dict | None, str | None]:
+    if isinstance(value, dict):
+        return value, None
+    return None, f"Expected a course object, got {type(value).__name__}"
+
+def _may_continue(value, buffer: str, end: int) -> bool:
+    """
+    A value decoded up to the end of the buffer, or a number followed by what
+    may be the rest of it (e.g. "2." or "2e" cut by the end of a chunk), may be
+    longer in the next chunk: "[123" is not the number 123 when "456]" follows.
+    """
+
+    if end == len(buffer):
+        return True
+    return isinstance(value, (int, float)) and buffer[end] in ".eE+-"
+
+async def iter_ndjson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    """
+    Splits an NDJSON body into records as it arrives. Blank lines are ignored.
+
+    :param chunks: The body, e.g. `request.stream()`
+    :return: (index, record, None) for every parsed line, (index, None, error) for a line that is not a JSON object
+    :rtype: AsyncIterator[tuple[int, dict | None, str | None]]
+    """
+
+    text_decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buffer = ""
+    index = 0
+    skipping = False  ## the rest of a line that was too large
+
+    def parse(line: str):
+        try:
+            return _record_or_error(json.loads(line))
+        except json.JSONDecodeError as e:
+            return None, f"Invalid JSON: {e}"
+
+    async for chunk in chunks:
+        lines = (buffer + text_decoder.decode(chunk)).split("\n")
+        buffer = lines.pop()
+        for line in lines:
+            if skipping:
+                skipping = False
+                continue
+            if not line.strip():
+                continue
+            record, error = parse(line)
+            yield index, record, error
+            index += 1
+        if len(buffer) > IMPORT_MAX_RECORD_SIZE:
+            if not skipping:
+                yield index, None, f"Record larger than {IMPORT_MAX_RECORD_SIZE} characters"
+                index += 1
+            skipping = True
+            buffer = ""
+
+    buffer += text_decoder.decode(b"", final=True)
+    if buffer.strip() and not skipping:
+        record, error = parse(buffer)
+        yield index, record, error
+
+async def iter_json_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    """
+    Parses a JSON body incrementally: an array of courses or a `CoursesInput`
+    object ({"courses": [...]}). Every element of the array is decoded as soon
+    as it is complete.
+
+    :param chunks: The body, e.g. `request.stream()`
+    :raises ImportFormatError: If the body is not such a JSON document
+    :return: (index, record, None) for every object of the array, (index, None, error) for another value
+    :rtype: AsyncIterator[tuple[int, dict | None, str | None]]
+    """
+
+    text_decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    json_decoder = json.JSONDecoder()
+    buffer = ""
+    index = 0
+    wrapped = False
+    ## start -> (key) -> first -> value / separator -> (close) -> end
+    state = "start"
+
+    async def chunks_then_end():
+        async for chunk in chunks:
+            yield chunk, False
+        yield b"", True
+
+    async for chunk, final in chunks_then_end():
+        buffer += text_decoder.decode(chunk, final=final)
+        position = 0
+        while True:
+            position = _WHITESPACE.match(buffer, position).end()
+            if position == len(buffer):
+                break
+            char = buffer[position]
+
+            if state == "start":
+                if char == "[":
+                    state = "first"
+                elif char == "{":
+                    state, wrapped = "key", True
+                else:
+                    raise ImportFormatError("Expected an array of courses or an object with a courses array")
+                position += 1
+            elif state == "key":
+                match = _COURSES_KEY.match(buffer, position)
+                if match:
+                    state, position = "first", match.end()
+                elif len(buffer) - position < 64 and "[" not in buffer[position:]:
+                    break  ## the key is not complete yet
+                else:
+                    raise ImportFormatError('Expected the "courses" array as the only key of the object')
+            elif state in ("first", "value"):
+                if state == "first" and char == "]":
+                    state, position = ("close" if wrapped else "end"), position + 1
+                    continue
+                try:
+                    value, end = json_decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if len(buffer) - position > IMPORT_MAX_RECORD_SIZE:
+                        raise ImportFormatError(f"Record {index} is invalid or larger than {IMPORT_MAX_RECORD_SIZE} characters")
+                    break  ## the record is not complete yet
+                if not final and _may_continue(value, buffer, end):
+                    if len(buffer) - position > IMPORT_MAX_RECORD_SIZE:
+                        raise ImportFormatError(f"Record {index} is invalid or larger than {IMPORT_MAX_RECORD_SIZE} characters")
+                    break  ## decoded again with the next chunk
+                position = end
+                record, error = _record_or_error(value)
+                yield index, record, error
+                index += 1
+                state = "separator"
+            elif state == "separator":
+                if char == ",":
+                    state = "value"
+                elif char == "]":
+                    state = "close" if wrapped else "end"
+                else:
+                    raise ImportFormatError(f"Expected ',' or ']' after record {index - 1}")
+                position += 1
+            elif state == "close":
+                if char != "}":
+                    raise ImportFormatError('Expected the "courses" array as the only key of the object')
+                state, position = "end", position + 1
+            else:
+                raise ImportFormatError("Unexpected data after the courses")
+        buffer = buffer[position:]
+
+    if state != "end" or buffer.strip():
+        raise ImportFormatError(f"The body ended before the end of the courses (after {index} records)")
+
+def upsert_courses_batch(db: Session, courses: list[tuple[CourseInput, dict]]):
+    """
+    Writes a batch of courses with a few set-based statements instead of a
+    few queries per course: the difficulties and authors of the batch are
+    resolved (and created) at once, the courses are written with the
+    INSERT ... ON CONFLICT (url) of `upsert_course` in one statement, and the
+    missing author links are added. A url repeated in the batch keeps its
+    last values. Not committed.
+
+    :param courses: The validated courses and their column values (`course_values`)
+    :type courses: list[tuple[CourseInput, dict]]
+    """
+
+    ## an empty executemany would run INSERT ... DEFAULT VALUES: a course with only NULLs
+    if not courses:
+        return
+
+    difficulty_ids = {name: get_or_create_difficulty(db, name).id for name in {course.difficulty for course, _ in courses}}
+
+    author_names = {author.strip() for course, _ in courses for author in course.author}
+    ## descending ids: the lowest id of a name is the last one put in the dict
+    author_ids = dict(db.execute(SELECT_AUTHOR_IDS, {"names": list(author_names)}).all())
+    missing_authors = [{"name": name} for name in author_names if name not in author_ids]
+    if missing_authors:
+        author_ids.update(db.execute(insert(Authors).returning(Authors.name, Authors.id), missing_authors).all())
+
+    values_by_url, authors_by_url = {}, {}
+    for course, values in courses:
+        values["difficulty_id"] = difficulty_ids[course.difficulty]
+        values_by_url[values["url"]] = values
+        authors_by_url.setdefault(values["url"], set()).update(author_ids[author.strip()] for author in course.author)
+
+    course_ids = dict(db.execute(upsert_courses_statement(), list(values_by_url.values())).all())
+
+    links = {(course_ids[url], author_id) for url, author_ids_ in authors_by_url.items() for author_id in author_ids_}
+    existing = set(db.execute(SELECT_LINKS, {"course_ids": list({course_id for course_id, _ in links})}).all())
+    missing_links = [{"course_id": course_id, "author_id": author_id} for course_id, author_id in links - existing]
+    if missing_links:
+        db.execute(insert(Authors_Courses), missing_links)
+
+def write_records(db: Session, records: list[tuple[int, dict]], errors: list[dict]) -> int:
+    """
+    Validates a batch of records, writes it with `upsert_courses_batch` and
+    commits it. If the batch breaks a constraint of the table, its courses are
+    written one by one, each in a savepoint, to find the failing ones.
+    The failed records are appended to `errors`.
+
+    :param records: The index and the content of every record
+    :type records: list[tuple[int, dict]]
+    :return: The number of written courses
+    :rtype: int
+    """
+
+    courses = []
+    for index, record in records:
+        try:
+            course = CourseInput(**record)
+            values = course_values(course, None)
+        except ValidationError as e:
+            errors.append({"record": index, "errors": [
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+            ]})
+            continue
+        except (ValueError, TypeError, AttributeError) as e:
+            errors.append({"record": index, "errors": [f"{type(e).__name__}: {e}"]})
+            continue
+        courses.append((index, course, values))
+
+    if not courses:
+        db.commit()
+        return 0
+
+    try:
+        with db.begin_nested():
+            upsert_courses_batch(db, [(course, values) for _, course, values in courses])
+        written = len(courses)
+    except Exception as e:
+        logging.warning(f"Batch of {len(courses)} courses rejected ({type(e).__name__}), writing them one by one")
+        written = 0
+        for index, course, _ in courses:
+            try:
+                with db.begin_nested():
+                    insert_course(db, course)
+            except Exception as e:
+                ## the message of the database, without the statement and its parameters
+                cause = getattr(e, "orig", None) or e
+                errors.append({"record": index, "errors": [f"{type(cause).__name__}: {str(cause).splitlines()[0]}"]})
+                continue
+            written += 1
+    db.commit()
+    return written
+
+async def import_course_records(db: Session, records: AsyncIterator[tuple[int, dict | None, str | None]],
+                                batch_size: int = IMPORT_BATCH_SIZE) -> dict:
+    """
+    Writes the records of an import in batches. The body is not read while a
+    batch is written (in the thread pool), so the memory is bounded by a batch.
+
+    :param records: `iter_ndjson_records` or `iter_json_records` of the body
+    :param batch_size: Records committed at once
+    :type batch_size: int
+    :return: The number of records, imported and failed courses, the first
+        IMPORT_MAX_ERRORS errors, and the reason the import stopped early, if any
+    :rtype: dict
+    """
+
+    result = {"Records": 0, "Imported": 0, "Failed": 0, "Errors": [], "Aborted": None}
+    batch = []
+
+    def add_errors(errors: list[dict]):
+        result["Failed"] += len(errors)
+        IMPORTED_RECORDS.inc(len(errors), result="failed")
+        result["Errors"].extend(errors[:max(0, IMPORT_MAX_ERRORS - len(result["Errors"]))])
+
+    async def flush():
+        errors = []
+        written = await run_in_threadpool(write_records, db, batch, errors)
+        result["Imported"] += written
+        IMPORTED_RECORDS.inc(written, result="imported")
+        add_errors(errors)
+        batch.clear()
+
+    try:
+        try:
+            async for index, record, error in records:
+                result["Records"] += 1
+                if error is not None:
+                    add_errors([{"record": index, "errors": [error]}])
+                    continue
+                batch.append((index, record))
+                if len(batch) >= batch_size:
+                    await flush()
+        except ImportFormatError as e:
+            result["Aborted"] = str(e)
+        ## the records read before a format error are kept
+        if batch:
+            await flush()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        if result["Imported"]:
+            catalog_changed()
+
+    result["Errors"].sort(key=lambda error: error["record"])
+    logging.info(f"Imported {result['Imported']} of {result['Records']} records, {result['Failed']} failed"
+                 + (f", aborted: {result['Aborted']}" if result["Aborted"] else ""))
+    return result
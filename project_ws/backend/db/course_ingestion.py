@@ -0,0 +1,231 @@
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from schemas.web_retrieval_schema import CourseInput
+from models.authors import Authors, Authors_Courses
+from models.courses import Courses, Course_difficulties
+
+## The ingestion of scraped courses, shared by insert_courses, the scrape workers and the imports.
+## Nothing is committed here: the caller commits a page of courses together with its checkpoint.
+## A course is matched by its url (unique) with INSERT ... ON CONFLICT, so concurrent workers
+## scraping the same course update one row instead of inserting it twice. The authors and
+## difficulties found are locked FOR KEY SHARE until the commit: the garbage collection
+## (catalog_cleanup) skips them, so it cannot delete one that is about to be referenced.
+
+def insert_scraped_courses(db: Session, scraped: list[dict]) -> list[CourseInput]:
+    """
+    Validates scraped courses and inserts them (or updates the
+    courses with the same url) with their difficulty and authors
+    (created when they do not exist).
+
+    :param db: The database session
+    :type db: Session
+    :param scraped: The courses returned by a page scraper
+    :type scraped: list[dict]
+    :return: The validated courses
+    :rtype: list[CourseInput]
+    """
+
+    courses = [CourseInput(**course) for course in scraped]
+    for course in courses:
+        insert_course(db, course)
+    return courses
+
+def insert_course(db: Session, course_input: CourseInput) -> int:
+    """
+    Inserts (or updates) one validated course with its
+    difficulty and authors, created when they do not exist.
+
+    :param db: The database session
+    :type db: Session
+    :param course_input: The validated course
+    :type course_input: CourseInput
+    :return: The id of the inserted or updated course
+    :rtype: int
+    """
+
+    difficulty = get_or_create_difficulty(db, course_input.difficulty)
+    course_id = upsert_course(db, course_input, difficulty.id)
+    authors = get_or_create_author(db, course_input.author)
+    for author in authors:
+        link_author_to_course(db, author.id, course_id)
+    return course_id
+
+def get_or_create_difficulty(db: Session, difficulty_str: str) -> Course_difficulties:
+    """
+    If the difficulty is not in
+    the database it creates it and
+    returns it.
+
+    :param db: The database session
+    :type db: Session
+    :param difficulty_str: The difficulty extracted from the web scraping
+    :type difficulty_str: str
+    :return: A model object 
+    :rtype: Course_difficulties
+    """
+
+    difficulty = (
+        db.query(Course_difficulties)
+        .filter(Course_difficulties.difficulty == difficulty_str)
+        .order_by(Course_difficulties.id)
+        .with_for_update(read=True, key_share=True)
+        .first()
+    )
+    if not difficulty:
+        difficulty = Course_difficulties(difficulty=difficulty_str)
+        db.add(difficulty)
+        db.flush()
+
+    return difficulty
+
+def get_or_create_author(db: Session, author_names: list) -> list[Authors]:
+    """
+    Return a list of the author objects.
+    If an author doesnt exits in the database
+    it creates it
+
+    :param db: The database session
+    :type db: Session
+    :param author_names: Authors extracted from the webscraping
+    :type author_names: list
+    :return: a list of authors object
+    :rtype: list[Authors]
+    """
+
+    all_authors = []
+    for author in author_names:
+        cleaned = author.strip()
+        author_obj = (
+            db.query(Authors)
+            .filter(Authors.name == cleaned)
+            .order_by(Authors.id)
+            .with_for_update(read=True, key_share=True)
+            .first()
+        )
+        if not author_obj:
+            author_obj = Authors(name=cleaned)
+            db.add(author_obj)
+            db.flush()
+
+        all_authors.append(author_obj)
+    return all_authors
+
+def link_author_to_course(db: Session, author_id: int, course_id: int):
+    """
+    Creates a link between author and course
+    if it doenst exist
+
+    :param db: The database session
+    :type db: Session
+    :param author_id: The id of the author from the object
+    :type author_id: int
+    :param course_id: The id of the course fro the object
+    :type course_id: int
+    """
+
+    link = db.query(Authors_Courses).filter(Authors_Courses.author_id == author_id, Authors_Courses.course_id == course_id).first()
+    if not link:
+        link = Authors_Courses(author_id=author_id, course_id=course_id)
+        db.add(link)
+        db.flush()
+
+    return link
+
+## The columns written by the ingestion, the keys of `course_values`
+INGESTED_COLUMNS = ("name", "url", "duration", "total_lectures", "rating", "total_students",
+                    "current_price", "original_price", "difficulty_id")
+
+def course_values(course_input: CourseInput, difficulty_id: int) -> dict:
+    """
+    Converts a validated scraped course to the column values of `Courses`.
+
+    :param course_input: The course object that has validated the data from the json
+    :type course_input: CourseInput
+    :param difficulty_id: The id of the difficulty (since it is a foreign key)
+    :type difficulty_id: int
+    :return: The column values
+    :rtype: dict
+    """
+
+    def safe_cast_int(value):
+        return int(value) if value is not None else None
+
+    def parse_price(price_str: str) -> float:
+        if price_str is None:
+            return None
+        return float(price_str.replace("€", "").replace(",", "").strip())
+
+    def parse_students(students: str | int) -> int:
+        if isinstance(students, int):
+            return students
+        return int(students.replace(",", "").strip())
+
+    return {
+        "name": course_input.title,
+        "url": str(course_input.target_url),
+        "duration": float(course_input.hours_required),
+        "total_lectures": safe_cast_int(course_input.lectures_count),
+        "rating": float(course_input.rating),
+        "total_students": parse_students(course_input.total_students),
+        "current_price": parse_price(course_input.current_price),
+        "original_price": parse_price(course_input.original_price),
+        "difficulty_id": difficulty_id
+    }
+
+def create_course(db: Session, course_input: CourseInput, difficulty_id: int) -> Courses:
+    """
+    Creates a course
+
+    :param db: The database session
+    :type db: Session
+    :param course_input: The course object that has validated the data from the json
+    :type course_input: CourseInput
+    :param difficulty_id: The id of the difficulty (since it is a foreign key)
+    :type difficulty_id: int
+    :return: A model of type Courses
+    :rtype: Courses
+    """
+
+    course = Courses(**course_values(course_input, difficulty_id))
+
+    db.add(course)
+    db.flush()
+
+    return course
+
+def upsert_courses_statement():
+    """
+    INSERT ... ON CONFLICT (url) DO UPDATE of the columns of `course_values`:
+    a course whose url is in the catalog gets the new values (prices, students,
+    rating, ...) and is marked as seen now. Executed with the values of one
+    course or of many (each url at most once per execution).
+
+    :return: The statement, returning the url and the id of every course
+    """
+
+    statement = pg_insert(Courses)
+    updated = {column: statement.excluded[column] for column in INGESTED_COLUMNS if column != "url"}
+    return statement.on_conflict_do_update(
+        index_elements=[Courses.url],
+        set_={**updated, "last_seen_at": func.now()}
+    ).returning(Courses.url, Courses.id)
+
+def upsert_course(db: Session, course_input: CourseInput, difficulty_id: int) -> int:
+    """
+    Updates the course with the same url (prices, students, rating, ...)
+    and marks it as seen now, or creates it if the url is new, in one statement.
+    A recrawled page therefore refreshes its courses instead of duplicating them.
+
+    :param db: The database session
+    :type db: Session
+    :param course_input: The course object that has validated the data from the json
+    :type course_input: CourseInput
+    :param difficulty_id: The id of the difficulty (since it is a foreign key)
+    :type difficulty_id: int
+    :return: The id of the updated or created course
+    :rtype: int
+    """
+
+    values = course_values(course_input, difficulty_id)
+    return db.execute(upsert_courses_statement().values(**values)).one().id
@@ -0,0 +1,96 @@
+from sqlalchemy import Float, Text, case, cast, func, literal_column, null, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import Session
+from models.authors import Authors, Authors_Courses
+from models.courses import Courses, Course_difficulties
+
+## An empty JSON array, returned by json_agg's coalesce when no rows match
+EMPTY_JSON_ARRAY = literal_column("'[]'::json")
+
+def json_object(**fields):
+    """
+    Builds a `json_build_object(...)` expression from keyword arguments,
+    e.g. json_object(id=Authors.id) -> json_build_object('id', authors.id)
+    """
+
+    arguments = []
+    for key, value in fields.items():
+        arguments.extend([literal_column(f"'{key}'"), value])
+    return func.json_build_object(*arguments)
+
+def course_json_object():
+    """
+    The JSON object of a single course in the shape of `CourseOut`,
+    including the nested difficulty and the list of authors.
+    Prices are cast to float, as `CourseOut` does with the Numeric columns.
+    """
+
+    authors_json = (
+        select(func.coalesce(
+            func.json_agg(aggregate_order_by(json_object(id=Authors.id, name=Authors.name), Authors.id)),
+            EMPTY_JSON_ARRAY
+        ))
+        .select_from(Authors_Courses)
+        .join(Authors, Authors.id == Authors_Courses.author_id)
+        .where(Authors_Courses.course_id == Courses.id)
+        .scalar_subquery()
+    )
+
+    difficulty_json = case(
+        (Course_difficulties.id.is_(None), null()),
+        else_=json_object(id=Course_difficulties.id, difficulty=Course_difficulties.difficulty)
+    )
+
+    return json_object(
+        id=Courses.id,
+        name=Courses.name,
+        url=Courses.url,
+        duration=Courses.duration,
+        total_lectures=Courses.total_lectures,
+        rating=Courses.rating,
+        total_students=Courses.total_students,
+        current_price=cast(Courses.current_price, Float),
+        original_price=cast(Courses.original_price, Float),
+        description=Courses.description,
+        last_updated_at=Courses.last_updated_at,
+        updated_at=Courses.updated_at,
+        difficulty=difficulty_json,
+        authors=authors_json
+    )
+
+def render_courses_json(db: Session, course_ids=None, ordered: bool = False) -> bytes:
+    """
+    Lets PostgreSQL build the JSON array of courses (json_agg/json_build_object)
+    so no ORM objects are created and no pydantic validation is done.
+
+    :param db: The database session
+    :type db: Session
+    :param course_ids: A select of course ids to render, all courses if None
+    :type course_ids: Select | None
+    :param ordered: If True `course_ids` also selects a `position` column
+        (see `apply_sorting`) and the courses are returned in that order
+    :type ordered: bool
+    :return: The JSON array of courses, ordered by id or by position
+    :rtype: bytes
+    """
+
+    if ordered:
+        ranked = course_ids.subquery()
+        order_by = ranked.c.position
+    else:
+        order_by = Courses.id
+
+    statement = (
+        select(cast(
+            func.coalesce(func.json_agg(aggregate_order_by(course_json_object(), order_by)), EMPTY_JSON_ARRAY),
+            Text
+        ))
+        .select_from(Courses)
+        .outerjoin(Course_difficulties, Course_difficulties.id == Courses.difficulty_id)
+    )
+    if ordered:
+        statement = statement.join(ranked, ranked.c.id == Courses.id)
+    elif course_ids is not None:
+        statement = statement.where(Courses.id.in_(course_ids.correlate(None)))
+
+    return db.execute(statement).scalar_one().encode("utf-8")
@@ -0,0 +1,308 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import zip_longest
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+from models.scrape_jobs import Crawl_jobs, Scrape_jobs, Scrape_job_pages
+from schemas.web_retrieval_schema import CrawlTargetIn
+from .db_config import SessionLocal
+from .catalog_events import catalog_changed
+from .course_ingestion import insert_scraped_courses
+from .recrawl import record_page_crawl
+from .scrape_checkpoints import get_or_create_scrape_job, pending_pages, complete_page, fail_page, finish_job
+from utils.metrics import scrape_context, time_stage
+from utils.logger import logger_setup
+import logging
+
+## Crawl jobs: several platforms and categories crawled at once (POST /save_data/crawl_jobs).
+## Every target is a scrape job with its checkpoints, so a crawl job of the same targets resumes
+## the pages that are not completed. The pages of all targets are scraped by one thread pool,
+## interleaved, so every platform makes progress; the browsers are limited per process by the
+## browser supervisor (SCRAPE_MAX_BROWSERS) and the requests per host by the politeness scheduler.
+
+## Pages scraped at once by a crawl job (over all its targets)
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "4"))
+
+## A running job renews its heartbeat every CRAWL_HEARTBEAT_SECONDS; a queued or running job
+## without a heartbeat for CRAWL_STALE_SECONDS was lost with its API process (restart, crash)
+CRAWL_HEARTBEAT_SECONDS = float(os.getenv("CRAWL_HEARTBEAT_SECONDS", "30"))
+CRAWL_STALE_SECONDS = float(os.getenv("CRAWL_STALE_SECONDS", "120"))
+
+RENEW_HEARTBEAT = text("UPDATE crawl_jobs SET heartbeat_at = now() WHERE id = :id")
+
+## The scrape jobs of a failed crawl job are not completed, so posting the same targets resumes them
+FAIL_STALE_CRAWL_JOBS = text("""
+    UPDATE crawl_jobs
+    SET status = 'failed', finished_at = now(),
+        error = 'Interrupted: no heartbeat since ' || heartbeat_at || ', post the same targets to resume'
+    WHERE status IN ('queued', 'running')
+      AND heartbeat_at < now() - make_interval(secs => :stale_after)
+    RETURNING id
+""")
+
+def merge_crawl_targets(targets: list[CrawlTargetIn]) -> list[CrawlTargetIn]:
+    """
+    Merges the targets of the same platform and category whose page ranges
+    overlap, so no page is scraped twice by a crawl job.
+
+    :param targets: The validated targets (known platform and category, start_page <= end_page)
+    :type targets: list[CrawlTargetIn]
+    :return: The merged targets, listing by listing in the order of their first target
+    :rtype: list[CrawlTargetIn]
+    """
+
+    listings = {}
+    for target in targets:
+        listings.setdefault((target.platform, target.category), []).append(target)
+
+    merged = []
+    for listing_targets in listings.values():
+        ranges = []
+        for target in sorted(listing_targets, key=lambda target: target.start_page):
+            if ranges and target.start_page <= ranges[-1].end_page:
+                ranges[-1].end_page = max(ranges[-1].end_page, target.end_page)
+            else:
+                ranges.append(target.model_copy())
+        merged += ranges
+    return merged
+
+def fail_stale_crawl_jobs(stale_after: float = CRAWL_STALE_SECONDS) -> list[int]:
+    """
+    Marks failed the queued and running crawl jobs without a heartbeat for
+    `stale_after` seconds: their process is gone (the background tasks do
+    not survive a restart of the API). Called when the API starts.
+
+    :return: The ids of the failed crawl jobs
+    :rtype: list[int]
+    """
+
+    db = SessionLocal()
+    try:
+        failed = list(db.execute(FAIL_STALE_CRAWL_JOBS, {"stale_after": stale_after}).scalars())
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logging.error(f"Stale crawl jobs could not be failed: {e}")
+        return []
+    finally:
+        db.close()
+    if failed:
+        logging.warning(f"Crawl jobs {failed} were interrupted (no heartbeat for {stale_after:.0f}s), marked failed")
+    return failed
+
+class CrawlJobHeartbeat:
+    """
+    Renews the heartbeat of a crawl job in a background thread, with its
+    own session, while the job runs.
+    """
+
+    def __init__(self, crawl_job_id: int, interval: float = CRAWL_HEARTBEAT_SECONDS):
+        self.crawl_job_id = crawl_job_id
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        db = SessionLocal()
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    db.execute(RENEW_HEARTBEAT, {"id": self.crawl_job_id})
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    logging.warning(f"Heartbeat of crawl job {self.crawl_job_id} failed: {e}")
+        finally:
+            db.close()
+
+    def __enter__(self) -> "CrawlJobHeartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+def create_crawl_job(db: Session, targets: list[CrawlTargetIn], concurrency: int = CRAWL_CONCURRENCY) -> Crawl_jobs:
+    """
+    Creates a queued crawl job with a scrape job per target (an unfinished
+    scrape job of the same target is resumed by the crawl job) and commits.
+
+    :param targets: The validated targets (known platform and category)
+    :type targets: list[CrawlTargetIn]
+    :param concurrency: Pages scraped at once
+    :type concurrency: int
+    :return: The crawl job
+    :rtype: Crawl_jobs
+    """
+
+    crawl_job = Crawl_jobs(concurrency=concurrency)
+    db.add(crawl_job)
+    db.flush()
+    for target in targets:
+        get_or_create_scrape_job(db, target.platform, target.start_page, target.end_page,
+                                 target.category, crawl_job.id)
+    db.commit()
+    return crawl_job
+
+def run_crawl_job(crawl_job_id: int, scrape=None, discover=None) -> Crawl_jobs:
+    """
+    Runs a crawl job with its own session (it runs in the background):
+    reads the last page of every target, then scrapes the pending pages of
+    all targets with `concurrency` threads. The courses of a page and its
+    checkpoint are committed together, by this thread only.
+
+    :param crawl_job_id: The id of the crawl job
+    :type crawl_job_id: int
+    :param scrape: Scrapes a page, `scrape_page` of multiple_pages_scraper by default
+    :param discover: Reads the last page of a listing, `get_last_page` of multiple_pages_scraper by default
+    :return: The finished crawl job
+    :rtype: Crawl_jobs
+    """
+
+    from utils.web_scraper_scripts.multiple_pages_scraper import scrape_page, get_last_page, PageScrapeError
+    scrape = scrape or scrape_page
+    discover = discover or get_last_page
+
+    db = SessionLocal()
+    inserted = 0
+    try:
+        crawl_job = db.get(Crawl_jobs, crawl_job_id)
+        crawl_job.status = "running"
+        crawl_job.started_at = func.now()
+        crawl_job.heartbeat_at = func.now()
+        db.commit()
+        jobs = list(crawl_job.scrape_jobs)
+
+        with CrawlJobHeartbeat(crawl_job_id), ThreadPoolExecutor(max_workers=crawl_job.concurrency, thread_name_prefix=f"crawl-{crawl_job_id}") as executor:
+            ## the pagination of every target at once
+            last_pages = {}
+            futures = {executor.submit(discover, job.platform, job.category): job for job in jobs}
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    last_pages[job.id] = future.result()
+                except PageScrapeError as e:
+                    logging.error(f"Crawl job {crawl_job_id}: {e}")
+
+            ## page 1 of every target, then page 2 of every target, ...
+            per_job = [pending_pages(db, job, last_pages[job.id]) for job in jobs if job.id in last_pages]
+            checkpoints = [checkpoint for round_ in zip_longest(*per_job) for checkpoint in round_ if checkpoint is not None]
+            jobs_by_id = {job.id: job for job in jobs}
+
+            futures = {
+                executor.submit(scrape, jobs_by_id[checkpoint.job_id].platform, checkpoint.page,
+                                jobs_by_id[checkpoint.job_id].category): checkpoint
+                for checkpoint in checkpoints
+            }
+            for future in as_completed(futures):
+                checkpoint = futures[future]
+                inserted += store_page(db, jobs_by_id[checkpoint.job_id], checkpoint, future, PageScrapeError)
+
+        for job in jobs:
+            if job.id in last_pages:
+                finish_job(db, job, last_pages[job.id])
+            else:
+                job.status = "failed"
+        crawl_job.courses_count = inserted
+        crawl_job.status = "completed" if all(job.status == "completed" for job in jobs) else "failed"
+        crawl_job.finished_at = func.now()
+        db.commit()
+        logging.info(f"Crawl job {crawl_job_id} {crawl_job.status}: {inserted} courses")
+        return crawl_job
+    except Exception as e:
+        db.rollback()
+        logging.error(f"Crawl job {crawl_job_id} failed: {e}")
+        crawl_job = db.get(Crawl_jobs, crawl_job_id)
+        if crawl_job is not None:
+            crawl_job.status = "failed"
+            crawl_job.error = f"{type(e).__name__}: {e}"[:1000]
+            crawl_job.courses_count = inserted
+            crawl_job.finished_at = func.now()
+            db.commit()
+        raise
+    finally:
+        ## pages are committed one by one, so invalidate even after a partial crawl
+        if inserted:
+            catalog_changed()
+        db.close()
+
+def store_page(db: Session, job: Scrape_jobs, checkpoint: Scrape_job_pages, future, page_error: type) -> int:
+    """
+    Inserts the courses of a scraped page and completes its checkpoint in one
+    transaction, or marks the page failed.
+
+    :return: The number of inserted courses
+    :rtype: int
+    """
+
+    from utils.web_scraper_scripts.platforms import get_platform
+
+    try:
+        scraped, attempts = future.result()
+    except page_error as e:
+        logging.error(str(e))
+        fail_page(db, checkpoint, e.attempts, e.cause)
+        return 0
+
+    try:
+        with scrape_context(job.platform, checkpoint.page), time_stage("db_write"):
+            courses = insert_scraped_courses(db, scraped)
+            complete_page(db, checkpoint, attempts, len(courses))
+            ## the recrawl schedule follows the default listing of each platform, named or not
+            if job.category in (None, get_platform(job.platform).default_category):
+                record_page_crawl(db, job.platform, checkpoint.page, courses)
+            db.commit()
+    except Exception as e:
+        db.rollback()
+        logging.error(f"Error processing page {checkpoint.page} of {job.platform}: {e}")
+        fail_page(db, checkpoint, attempts, e)
+        return 0
+    return len(courses)
+
+def crawl_job_status(db: Session, crawl_job_id: int) -> dict | None:
+    """
+    :return: The crawl job with the progress of every target, None if it does not exist
+    :rtype: dict | None
+    """
+
+    crawl_job = db.get(Crawl_jobs, crawl_job_id)
+    if crawl_job is None:
+        return None
+
+    counts = dict.fromkeys((job.id for job in crawl_job.scrape_jobs), None)
+    rows = (
+        db.query(Scrape_job_pages.job_id, Scrape_job_pages.status, func.count(), func.coalesce(func.sum(Scrape_job_pages.courses_count), 0))
+        .filter(Scrape_job_pages.job_id.in_(list(counts)))
+        .group_by(Scrape_job_pages.job_id, Scrape_job_pages.status)
+        .all()
+    )
+    for job_id in counts:
+        counts[job_id] = {"pending": 0, "completed": 0, "failed": 0, "courses": 0}
+    for job_id, page_status, pages, courses in rows:
+        counts[job_id][page_status] = pages
+        counts[job_id]["courses"] += courses
+
+    return {
+        "id": crawl_job.id,
+        "status": crawl_job.status,
+        "concurrency": crawl_job.concurrency,
+        "created_at": crawl_job.created_at,
+        "started_at": crawl_job.started_at,
+        "finished_at": crawl_job.finished_at,
+        "courses_count": crawl_job.courses_count,
+        "error": crawl_job.error,
+        "targets": [
+            {
+                "scrape_job_id": job.id,
+                "platform": job.platform,
+                "category": job.category,
+                "start_page": job.start_page,
+                "end_page": job.end_page,
+                "status": job.status,
+                "pages": counts[job.id],
+            }
+            for job in crawl_job.scrape_jobs
+        ],
+    }
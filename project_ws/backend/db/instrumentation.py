@@ -0,0 +1,153 @@
+import os
+import random
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from utils.metrics import Counter, Histogram
+from utils.logger import logger_setup
+from utils.logger.logger_setup import log_event
+import logging
+
+## In debug mode the query statistics of every request are sent back as response headers
+DEBUG = os.getenv("DEBUG", "false").lower() in ("1", "true", "yes")
+
+## Statements slower than this are always logged
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+
+## Fraction of the other statements that are logged (0 disables it, 1 logs every statement)
+SQL_LOG_SAMPLE_RATE = float(os.getenv("SQL_LOG_SAMPLE_RATE", "0"))
+
+DB_STATEMENT_SECONDS = Histogram(
+    "db_statement_duration_seconds",
+    "Duration of the SQL statements, by kind of statement.",
+    ("kind",),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+
+DB_SLOW_STATEMENTS = Counter(
+    "db_slow_statements_total",
+    "SQL statements slower than SLOW_QUERY_THRESHOLD_MS, by kind of statement.",
+    ("kind",)
+)
+
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Number of SQL statements issued by a request, by route.",
+    ("method", "route"),
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+)
+
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_duration_seconds",
+    "Time a request spent in SQL statements, by route.",
+    ("method", "route")
+)
+
+class QueryStats:
+    """
+    The SQL statements issued while it is the current one (see `track_queries`):
+    their number, their total duration and the slowest of them.
+    """
+
+    __slots__ = ("count", "total_seconds", "slowest_seconds", "slowest_statement")
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement: Optional[str] = None
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.total_seconds += seconds
+        if seconds > self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = statement
+
+## Statistics of the request running in the current task. The object itself is shared,
+## so statements executed by a sync endpoint in the threadpool are counted as well
+_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+@contextmanager
+def track_queries():
+    """
+    Collects the statistics of the statements executed inside the `with` block.
+
+    :return: The statistics, filled while the block runs
+    :rtype: QueryStats
+    """
+
+    stats = QueryStats()
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+
+def _one_line(statement: str) -> str:
+    return re.sub(r"\s+", " ", statement).strip()
+
+def _statement_kind(statement: str) -> str:
+    kind = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else ""
+    return kind if kind in ("select", "insert", "update", "delete", "with") else "other"
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["query_start_time"].pop()
+    kind = _statement_kind(statement)
+    DB_STATEMENT_SECONDS.observe(seconds, kind=kind)
+
+    stats = _query_stats.get()
+    if stats is not None:
+        stats.record(statement, seconds)
+
+    ## Only the parameterized statement is logged, never the parameters
+    if seconds * 1000 >= SLOW_QUERY_THRESHOLD_MS:
+        DB_SLOW_STATEMENTS.inc(kind=kind)
+        log_event(logging.WARNING, "slow_query", "Slow query (%.1f ms): %s", seconds * 1000, _one_line(statement),
+                  duration_ms=round(seconds * 1000, 1))
+    elif SQL_LOG_SAMPLE_RATE and random.random() < SQL_LOG_SAMPLE_RATE:
+        log_event(logging.INFO, "sampled_query", "Sampled query (%.1f ms): %s", seconds * 1000, _one_line(statement),
+                  duration_ms=round(seconds * 1000, 1))
+
+def install_query_hooks(engine: Engine):
+    """
+    Times every statement executed through the engine.
+
+    :param engine: The engine to instrument
+    :type engine: Engine
+    """
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+async def query_stats_middleware(request: Request, call_next):
+    """
+    Attaches the query statistics of each request to the response headers
+    in debug mode, and records them in the metrics otherwise.
+    """
+
+    with track_queries() as stats:
+        response = await call_next(request)
+
+    if DEBUG:
+        response.headers["X-DB-Query-Count"] = str(stats.count)
+        response.headers["X-DB-Time-Ms"] = f"{stats.total_seconds * 1000:.1f}"
+        response.headers["X-DB-Slowest-Ms"] = f"{stats.slowest_seconds * 1000:.1f}"
+        if stats.slowest_statement:
+            slowest = _one_line(stats.slowest_statement)[:300]
+            response.headers["X-DB-Slowest-Statement"] = slowest.encode("ascii", "replace").decode("ascii")
+    else:
+        route = request.scope.get("route")
+        route_path = route.path if route is not None else "unmatched"
+        REQUEST_DB_QUERIES.observe(stats.count, method=request.method, route=route_path)
+        REQUEST_DB_SECONDS.observe(stats.total_seconds, method=request.method, route=route_path)
+
+    return response
@@ -0,0 +1,205 @@
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from models.scrape_jobs import Listing_pages
+from schemas.web_retrieval_schema import CourseInput
+
+## Crawl history of the listing pages, used by recrawl_scheduler.py to decide which pages to
+## scrape again. Every crawl compares the page with the previous crawl: the interval until the
+## next crawl is cut when the page changed and grows when it did not, so volatile pages are
+## refreshed often and stable ones rarely.
+
+## Bounds of the interval between two crawls of a page (seconds)
+RECRAWL_MIN_INTERVAL = float(os.getenv("RECRAWL_MIN_INTERVAL", "3600"))
+RECRAWL_MAX_INTERVAL = float(os.getenv("RECRAWL_MAX_INTERVAL", str(7 * 24 * 3600)))
+RECRAWL_INITIAL_INTERVAL = float(os.getenv("RECRAWL_INITIAL_INTERVAL", str(24 * 3600)))
+
+## Interval multipliers after a crawl that found changes / no changes
+RECRAWL_CHANGED_FACTOR = float(os.getenv("RECRAWL_CHANGED_FACTOR", "0.5"))
+RECRAWL_UNCHANGED_FACTOR = float(os.getenv("RECRAWL_UNCHANGED_FACTOR", "1.5"))
+
+## Weight of the last crawl in the moving average of the change rate
+RECRAWL_CHANGE_RATE_WEIGHT = float(os.getenv("RECRAWL_CHANGE_RATE_WEIGHT", "0.3"))
+
+## Pages that were never crawled come first, then the most overdue pages (time since
+## the last crawl relative to their interval), weighted up by their change rate.
+## Pages that are already queued or being scraped are skipped.
+SELECT_DUE_PAGES = text("""
+    SELECT lp.platform, lp.page, lp.last_crawled_at, lp.interval_seconds, lp.change_rate,
+           extract(epoch FROM now() - lp.last_crawled_at) / lp.interval_seconds AS staleness
+    FROM listing_pages lp
+    WHERE lp.next_crawl_at <= now()
+      AND NOT EXISTS (
+          SELECT 1 FROM scrape_queue q
+          WHERE q.platform = lp.platform AND q.page = lp.page AND q.status IN ('queued', 'claimed')
+      )
+    ORDER BY lp.last_crawled_at IS NOT NULL,
+             extract(epoch FROM now() - lp.last_crawled_at) / lp.interval_seconds * (1 + lp.change_rate) DESC,
+             lp.platform, lp.page
+    LIMIT :limit
+""")
+
+## A page whose queue entry ended failed (its scrape kept failing, or it is past the end of a
+## listing that shrank) is not crawled, so record_page_crawl does not move its next crawl:
+## every new failure pushes it back by its interval, doubled per failure in a row, at most
+## RECRAWL_MAX_INTERVAL, so it does not come back at every tick and take the budget.
+RECORD_FAILED_CRAWLS = text("""
+    UPDATE listing_pages lp
+    SET crawl_failures = lp.crawl_failures + 1,
+        last_failed_at = q.finished_at,
+        next_crawl_at = now() + make_interval(
+            secs => least(lp.interval_seconds * power(2, lp.crawl_failures), :max_interval))
+    FROM scrape_queue q
+    WHERE q.platform = lp.platform AND q.page = lp.page AND q.status = 'failed'
+      AND q.finished_at > coalesce(lp.last_failed_at, '-infinity')
+    RETURNING lp.id
+""")
+
+REGISTER_PAGE = text("""
+    INSERT INTO listing_pages (platform, page, interval_seconds)
+    VALUES (:platform, :page, :interval)
+    ON CONFLICT (platform, page) DO NOTHING
+    RETURNING id
+""")
+
+RECRAWL_STATS = text("""
+    SELECT platform, count(*) AS pages,
+           count(*) FILTER (WHERE last_crawled_at IS NULL) AS never_crawled,
+           count(*) FILTER (WHERE next_crawl_at <= now()) AS due,
+           avg(interval_seconds) AS avg_interval_seconds,
+           avg(change_rate) AS avg_change_rate,
+           min(last_crawled_at) AS oldest_crawl,
+           count(*) FILTER (WHERE crawl_failures > 0) AS failing
+    FROM listing_pages
+    GROUP BY platform
+    ORDER BY platform
+""")
+
+def page_fingerprint(courses: list[CourseInput]) -> str:
+    """
+    Hash of the values of a listing page that a recrawl refreshes
+    (which courses are listed, their prices, students and rating).
+
+    :param courses: The validated courses of the page
+    :type courses: list[CourseInput]
+    :return: The hex digest
+    :rtype: str
+    """
+
+    rows = sorted(
+        (str(course.target_url), str(course.current_price), str(course.original_price),
+         str(course.total_students), str(course.rating))
+        for course in courses
+    )
+    return hashlib.sha256(repr(rows).encode()).hexdigest()
+
+def register_pages(db: Session, platform: str, pages: list[int]) -> int:
+    """
+    Adds pages to the crawl schedule (due right away) and commits.
+    Pages that are already scheduled are left as they are.
+
+    :param platform: The platform (udemy or pluralsight)
+    :type platform: str
+    :param pages: The page numbers
+    :type pages: list[int]
+    :return: The number of new pages
+    :rtype: int
+    """
+
+    added = 0
+    for page in pages:
+        params = {"platform": platform, "page": page, "interval": RECRAWL_INITIAL_INTERVAL}
+        if db.execute(REGISTER_PAGE, params).first() is not None:
+            added += 1
+    db.commit()
+    return added
+
+def record_page_crawl(db: Session, platform: str, page: int, courses: list[CourseInput]) -> Listing_pages:
+    """
+    Records a crawl of a listing page and schedules the next one. Not committed:
+    the caller commits it together with the courses of the page.
+
+    :param platform: The platform (udemy or pluralsight)
+    :type platform: str
+    :param page: The page number
+    :type page: int
+    :param courses: The validated courses of the page
+    :type courses: list[CourseInput]
+    :return: The updated (or created) listing page
+    :rtype: Listing_pages
+    """
+
+    now = datetime.now(timezone.utc)
+    fingerprint = page_fingerprint(courses)
+    listing_page = (
+        db.query(Listing_pages)
+        .filter(Listing_pages.platform == platform, Listing_pages.page == page)
+        .with_for_update()
+        .first()
+    )
+    if listing_page is None:
+        listing_page = Listing_pages(platform=platform, page=page, interval_seconds=RECRAWL_INITIAL_INTERVAL,
+                                     crawl_count=0, change_count=0, change_rate=0, crawl_failures=0)
+        db.add(listing_page)
+
+    ## the first crawl only sets the baseline, it is not a change
+    if listing_page.content_hash is not None:
+        changed = listing_page.content_hash != fingerprint
+        if changed:
+            listing_page.change_count += 1
+            listing_page.last_changed_at = now
+            interval = listing_page.interval_seconds * RECRAWL_CHANGED_FACTOR
+        else:
+            interval = listing_page.interval_seconds * RECRAWL_UNCHANGED_FACTOR
+        listing_page.interval_seconds = min(RECRAWL_MAX_INTERVAL, max(RECRAWL_MIN_INTERVAL, interval))
+        listing_page.change_rate = ((1 - RECRAWL_CHANGE_RATE_WEIGHT) * listing_page.change_rate
+                                    + RECRAWL_CHANGE_RATE_WEIGHT * (1 if changed else 0))
+    elif listing_page.last_changed_at is None:
+        listing_page.last_changed_at = now
+
+    listing_page.content_hash = fingerprint
+    listing_page.courses_count = len(courses)
+    listing_page.crawl_count += 1
+    listing_page.crawl_failures = 0
+    listing_page.last_crawled_at = now
+    listing_page.next_crawl_at = now + timedelta(seconds=listing_page.interval_seconds)
+    db.flush()
+
+    return listing_page
+
+def record_failed_crawls(db: Session, max_interval: float = RECRAWL_MAX_INTERVAL) -> int:
+    """
+    Pushes back the next crawl of the pages whose queue entry failed since the
+    last call (see RECORD_FAILED_CRAWLS), and commits.
+
+    :param max_interval: The longest backoff in seconds
+    :type max_interval: float
+    :return: The number of pages pushed back
+    :rtype: int
+    """
+
+    failed = len(db.execute(RECORD_FAILED_CRAWLS, {"max_interval": max_interval}).all())
+    db.commit()
+    return failed
+
+def select_due_pages(db: Session, limit: int) -> list[dict]:
+    """
+    :param limit: The maximum number of pages
+    :type limit: int
+    :return: platform, page, last_crawled_at, interval_seconds, change_rate and
+        staleness of the due pages, the most urgent first
+    :rtype: list[dict]
+    """
+
+    return [dict(row) for row in db.execute(SELECT_DUE_PAGES, {"limit": limit}).mappings()]
+
+def recrawl_stats(db: Session) -> list[dict]:
+    """
+    :return: Scheduled, never crawled, due and failing pages, average interval
+        and change rate and the oldest crawl per platform
+    :rtype: list[dict]
+    """
+
+    return [dict(row) for row in db.execute(RECRAWL_STATS).mappings()]
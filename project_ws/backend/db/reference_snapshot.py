@@ -0,0 +1,131 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from .db_config import SessionLocal
+from models.authors import Authors
+from models.courses import Course_difficulties
+from utils.http_cache import body_etag, compress_body
+from utils.response_cache import response_cache
+from utils.logger import logger_setup
+import logging
+
+## A snapshot is rebuilt when the data version changes or when it is older than this
+## (the data version of the local cache backend is not shared between workers)
+REFERENCE_SNAPSHOT_MAX_AGE = int(os.getenv("REFERENCE_SNAPSHOT_MAX_AGE", "300"))  # seconds
+
+class ReferenceSnapshot:
+    """
+    An immutable copy of the small reference tables (difficulties and authors),
+    already serialized to JSON. It is never modified: a rebuild creates a new
+    snapshot and swaps the reference, so readers always see a consistent one.
+    """
+
+    __slots__ = ("version", "built_at", "difficulties_count", "difficulties_body", "difficulties_etag",
+                 "authors_count", "authors_body", "authors_etag")
+
+    def __init__(self, version: int, difficulties: list[dict], authors: list[dict]):
+        self.version = version
+        self.built_at = time.monotonic()
+        ## the ETags come from the content, so a rebuild with the same rows (a new data version
+        ## after a write to the courses, or the max age) keeps them and the clients get a 304
+        difficulties_json = json.dumps(difficulties).encode("utf-8")
+        self.difficulties_count = len(difficulties)
+        self.difficulties_body = compress_body(difficulties_json)
+        self.difficulties_etag = body_etag(difficulties_json)
+        authors_json = json.dumps(authors).encode("utf-8")
+        self.authors_count = len(authors)
+        self.authors_body = compress_body(authors_json)
+        self.authors_etag = body_etag(authors_json)
+
+    def is_current(self, version: int) -> bool:
+        return self.version == version and time.monotonic() - self.built_at < REFERENCE_SNAPSHOT_MAX_AGE
+
+def build_snapshot() -> ReferenceSnapshot:
+    """
+    Reads the reference tables. The data version is read before the tables,
+    so a write during the build schedules another build on the next request.
+
+    :return: A new snapshot
+    :rtype: ReferenceSnapshot
+    """
+
+    version = response_cache.data_version()
+    db = SessionLocal()
+    try:
+        difficulties = [
+            {"id": row.id, "difficulty": row.difficulty}
+            for row in db.query(Course_difficulties.id, Course_difficulties.difficulty).order_by(Course_difficulties.id)
+        ]
+        authors = [
+            {"id": row.id, "name": row.name}
+            for row in db.query(Authors.id, Authors.name).order_by(Authors.id)
+        ]
+    finally:
+        db.close()
+
+    logging.info(f"Reference snapshot built for data version {version}")
+    return ReferenceSnapshot(version, difficulties, authors)
+
+class ReferenceSnapshotStore:
+    """
+    Holds the current reference snapshot of the process.
+    Requests are always served from memory; an outdated snapshot is
+    served until its background rebuild replaces it.
+    """
+
+    def __init__(self):
+        self._snapshot: Optional[ReferenceSnapshot] = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reference-snapshot")
+        self._rebuild_pending = threading.Event()
+        self._schedule_lock = threading.Lock()
+
+    def get(self) -> ReferenceSnapshot:
+        """
+        :return: The current snapshot. An outdated one is still returned while
+            a rebuild is scheduled in the background, so a request never waits
+            for the tables to be read (except the first one of the process)
+        :rtype: ReferenceSnapshot
+        """
+
+        version = response_cache.data_version()
+        snapshot = self._snapshot
+        if snapshot is not None:
+            if not snapshot.is_current(version):
+                self.schedule_rebuild()
+            return snapshot
+
+        with self._lock:
+            ## another request may have built it while this one was waiting
+            if self._snapshot is None:
+                self._snapshot = build_snapshot()
+            return self._snapshot
+
+    def rebuild(self):
+        self._rebuild_pending.clear()
+        try:
+            snapshot = build_snapshot()
+        except Exception as e:
+            logging.error(f"Reference snapshot rebuild failed: {e}")
+            return
+        with self._lock:
+            self._snapshot = snapshot
+
+    def schedule_rebuild(self):
+        """
+        Rebuilds the snapshot in the background, so the first
+        request after a write does not wait for it.
+        Several writes in a row lead to a single pending rebuild.
+        """
+
+        ## the check and the set are one step, so two writers never both submit
+        with self._schedule_lock:
+            if self._rebuild_pending.is_set():
+                return
+            self._rebuild_pending.set()
+        self._executor.submit(self.rebuild)
+
+reference_snapshot = ReferenceSnapshotStore()
@@ -0,0 +1,104 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from models.scrape_jobs import Scrape_jobs, Scrape_job_pages
+
+def get_or_create_scrape_job(db: Session, platform: str, start_page: int, end_page: int,
+                             category: str = None, crawl_job_id: int = None) -> Scrape_jobs:
+    """
+    Returns the unfinished job of the same platform, category and page range,
+    so a restarted or crashed scrape resumes it, or creates a new job.
+
+    :param db: The database session
+    :type db: Session
+    :param platform: The platform (udemy or pluralsight)
+    :type platform: str
+    :param start_page: The first page of the range
+    :type start_page: int
+    :param end_page: The last page of the range (inclusive)
+    :type end_page: int
+    :param category: The category of the listing, None for the default one of the platform
+    :type category: str
+    :param crawl_job_id: The crawl job the scrape job is part of (it moves to it when resumed)
+    :type crawl_job_id: int
+    :return: The job, with a checkpoint row for every page of the range
+    :rtype: Scrape_jobs
+    """
+
+    job = (
+        db.query(Scrape_jobs)
+        .filter(Scrape_jobs.platform == platform,
+                Scrape_jobs.category.is_not_distinct_from(category),
+                Scrape_jobs.start_page == start_page,
+                Scrape_jobs.end_page == end_page,
+                Scrape_jobs.status != "completed")
+        .order_by(Scrape_jobs.id.desc())
+        .with_for_update()
+        .first()
+    )
+    if job is None:
+        job = Scrape_jobs(platform=platform, category=category, start_page=start_page,
+                          end_page=end_page, crawl_job_id=crawl_job_id)
+        job.pages = [Scrape_job_pages(page=page) for page in range(start_page, end_page + 1)]
+        db.add(job)
+    else:
+        job.status = "running"
+        if crawl_job_id is not None:
+            job.crawl_job_id = crawl_job_id
+    db.commit()
+    return job
+
+def pending_pages(db: Session, job: Scrape_jobs, last_page: int) -> list[Scrape_job_pages]:
+    """
+    :return: The checkpoints of the pages of the job that are not completed
+        yet, up to `last_page`, in page order
+    :rtype: list[Scrape_job_pages]
+    """
+
+    return (
+        db.query(Scrape_job_pages)
+        .filter(Scrape_job_pages.job_id == job.id,
+                Scrape_job_pages.status != "completed",
+                Scrape_job_pages.page <= last_page)
+        .order_by(Scrape_job_pages.page)
+        .all()
+    )
+
+def complete_page(db: Session, checkpoint: Scrape_job_pages, attempts: int, courses_count: int):
+    """
+    Marks a page completed. Not committed: the caller commits it
+    together with the courses of the page.
+    """
+
+    checkpoint.status = "completed"
+    checkpoint.attempts += attempts
+    checkpoint.courses_count = courses_count
+    checkpoint.error = None
+    checkpoint.completed_at = func.now()
+
+def fail_page(db: Session, checkpoint: Scrape_job_pages, attempts: int, error: Exception):
+    """
+    Marks a page failed (it is retried when the job is resumed) and commits.
+    """
+
+    checkpoint.status = "failed"
+    checkpoint.attempts += attempts
+    checkpoint.error = f"{type(error).__name__}: {error}"[:1000]
+    db.commit()
+
+def finish_job(db: Session, job: Scrape_jobs, last_page: int) -> Scrape_jobs:
+    """
+    Marks the job completed when every page up to `last_page` is
+    completed (pages after the last page of the platform do not exist),
+    failed otherwise, and commits.
+    """
+
+    remaining = (
+        db.query(func.count(Scrape_job_pages.id))
+        .filter(Scrape_job_pages.job_id == job.id,
+                Scrape_job_pages.status != "completed",
+                Scrape_job_pages.page <= last_page)
+        .scalar()
+    )
+    job.status = "completed" if remaining == 0 else "failed"
+    db.commit()
+    return job
@@ -0,0 +1,173 @@
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+## Page-level work queue of the scrape workers (see scrape_worker.py), in the scrape_queue table.
+## A worker claims a page with FOR UPDATE SKIP LOCKED, so concurrent workers never wait for
+## each other or claim the same page, and holds it with a lease renewed by heartbeats.
+
+ENQUEUE_PAGE = text("""
+    INSERT INTO scrape_queue (platform, page)
+    VALUES (:platform, :page)
+    ON CONFLICT (platform, page) DO UPDATE
+        SET status = 'queued', attempts = 0, available_at = now(), enqueued_at = now(),
+            leased_by = NULL, lease_expires_at = NULL, heartbeat_at = NULL,
+            finished_at = NULL, courses_count = NULL, error = NULL
+        WHERE scrape_queue.status IN ('done', 'failed')
+    RETURNING id
+""")
+
+CLAIM_PAGE = text("""
+    UPDATE scrape_queue
+    SET status = 'claimed', attempts = attempts + 1, leased_by = :worker,
+        lease_expires_at = now() + make_interval(secs => :lease), heartbeat_at = now()
+    WHERE id = (
+        SELECT id FROM scrape_queue
+        WHERE status = 'queued' AND available_at <= now()
+        ORDER BY available_at, id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, platform, page, attempts
+""")
+
+HEARTBEAT = text("""
+    UPDATE scrape_queue
+    SET lease_expires_at = now() + make_interval(secs => :lease), heartbeat_at = now()
+    WHERE id = :id AND status = 'claimed' AND leased_by = :worker
+    RETURNING id
+""")
+
+COMPLETE_PAGE = text("""
+    UPDATE scrape_queue
+    SET status = 'done', finished_at = now(), courses_count = :courses_count, error = NULL,
+        leased_by = NULL, lease_expires_at = NULL
+    WHERE id = :id AND status = 'claimed' AND leased_by = :worker
+    RETURNING id
+""")
+
+FAIL_PAGE = text("""
+    UPDATE scrape_queue
+    SET status = CASE WHEN attempts >= :max_attempts THEN 'failed' ELSE 'queued' END,
+        available_at = now() + make_interval(secs => :retry_delay * power(2, attempts - 1)),
+        finished_at = CASE WHEN attempts >= :max_attempts THEN now() END,
+        error = :error, leased_by = NULL, lease_expires_at = NULL
+    WHERE id = :id AND status = 'claimed' AND leased_by = :worker
+    RETURNING status
+""")
+
+## The attempt of an expired lease counts: a page that keeps crashing its worker ends up failed
+REQUEUE_EXPIRED = text("""
+    UPDATE scrape_queue
+    SET status = CASE WHEN attempts >= :max_attempts THEN 'failed' ELSE 'queued' END,
+        finished_at = CASE WHEN attempts >= :max_attempts THEN now() END,
+        error = 'lease of ' || leased_by || ' expired',
+        leased_by = NULL, lease_expires_at = NULL
+    WHERE status = 'claimed' AND lease_expires_at < now()
+    RETURNING id
+""")
+
+QUEUE_STATS = text("""
+    SELECT platform, status, count(*) AS pages, coalesce(sum(courses_count), 0) AS courses
+    FROM scrape_queue
+    GROUP BY platform, status
+    ORDER BY platform, status
+""")
+
+def enqueue_pages(db: Session, platform: str, pages: list[int]) -> int:
+    """
+    Queues pages of a platform and commits. A page that is already queued or
+    claimed is left as it is; a page that is done or failed is queued again.
+
+    :param db: The database session
+    :type db: Session
+    :param platform: The platform (udemy or pluralsight)
+    :type platform: str
+    :param pages: The page numbers
+    :type pages: list[int]
+    :return: The number of pages that were (re)queued
+    :rtype: int
+    """
+
+    queued = 0
+    for page in pages:
+        if db.execute(ENQUEUE_PAGE, {"platform": platform, "page": page}).first() is not None:
+            queued += 1
+    db.commit()
+    return queued
+
+def claim_page(db: Session, worker: str, lease: float) -> Optional[dict]:
+    """
+    Claims the oldest available page and commits, so the claim is visible
+    to the other workers right away.
+
+    :param worker: The id of the worker, e.g. "host:pid"
+    :type worker: str
+    :param lease: Seconds until the claim expires if it is not renewed
+    :type lease: float
+    :return: id, platform, page and attempts of the claimed page, None if the queue is empty
+    :rtype: Optional[dict]
+    """
+
+    row = db.execute(CLAIM_PAGE, {"worker": worker, "lease": lease}).mappings().first()
+    db.commit()
+    return dict(row) if row is not None else None
+
+def heartbeat(db: Session, item_id: int, worker: str, lease: float) -> bool:
+    """
+    Renews the lease of a claimed page and commits.
+
+    :return: False if the worker does not hold the page anymore (its lease expired)
+    :rtype: bool
+    """
+
+    renewed = db.execute(HEARTBEAT, {"id": item_id, "worker": worker, "lease": lease}).first() is not None
+    db.commit()
+    return renewed
+
+def complete_page(db: Session, item_id: int, worker: str, courses_count: int) -> bool:
+    """
+    Marks a claimed page done. Not committed: the caller commits it together
+    with the courses of the page, or rolls both back when it returns False.
+
+    :return: False if the worker does not hold the page anymore (another worker may have it)
+    :rtype: bool
+    """
+
+    return db.execute(COMPLETE_PAGE, {"id": item_id, "worker": worker, "courses_count": courses_count}).first() is not None
+
+def fail_page(db: Session, item_id: int, worker: str, error: Exception, max_attempts: int, retry_delay: float) -> Optional[str]:
+    """
+    Queues a page again after an exponential delay, or marks it failed after
+    `max_attempts` attempts, and commits.
+
+    :return: The new status (queued or failed), None if the worker does not hold the page anymore
+    :rtype: Optional[str]
+    """
+
+    status = db.execute(FAIL_PAGE, {
+        "id": item_id, "worker": worker, "error": f"{type(error).__name__}: {error}"[:1000],
+        "max_attempts": max_attempts, "retry_delay": retry_delay,
+    }).scalar()
+    db.commit()
+    return status
+
+def requeue_expired(db: Session, max_attempts: int) -> int:
+    """
+    Queues again the pages whose worker stopped sending heartbeats, and commits.
+
+    :return: The number of expired leases
+    :rtype: int
+    """
+
+    expired = len(db.execute(REQUEUE_EXPIRED, {"max_attempts": max_attempts}).all())
+    db.commit()
+    return expired
+
+def queue_stats(db: Session) -> list[dict]:
+    """
+    :return: The number of pages and inserted courses per platform and status
+    :rtype: list[dict]
+    """
+
+    return [dict(row) for row in db.execute(QUEUE_STATS).mappings()]
@@ -0,0 +1,32 @@
+import argparse
+from db.db_config import SessionLocal
+from db.course_enrichment import enrich_courses, ENRICH_CONCURRENCY, ENRICH_MAX_AGE
+from utils.logger import logger_setup
+import logging
+
+## Enriches the courses with their detail page, outside of the API:
+##
+##   python enrich_courses.py --limit 1000 --concurrency 8
+##   python enrich_courses.py --platform udemy --max-age 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrapes the detail pages of the courses that are not (recently) enriched.")
+    parser.add_argument("--limit", type=int, default=100, help="The maximum number of courses")
+    parser.add_argument("--concurrency", type=int, default=ENRICH_CONCURRENCY, help="Detail pages (and browsers) at once")
+    parser.add_argument("--platform", help="Only the courses of this platform, e.g. udemy")
+    parser.add_argument("--max-age", type=float, default=ENRICH_MAX_AGE,
+                        help="Courses enriched less than this many seconds ago are skipped")
+    args = parser.parse_args()
+
+    if args.platform:
+        from utils.web_scraper_scripts.platforms import get_platform
+        if get_platform(args.platform) is None:
+            parser.error(f"Unknown platform '{args.platform}'")
+        args.platform = get_platform(args.platform).name
+
+    db = SessionLocal()
+    try:
+        result = enrich_courses(db, args.limit, args.concurrency, args.platform, args.max_age)
+    finally:
+        db.close()
+    logging.info(f"Enriched {result['Enriched']} of {result['Selected']} courses, {len(result['Failed'])} failed")
@@ -0,0 +1,25 @@
+import argparse
+from db.catalog_export import ExportTable, ExportFormat, EXPORT_BATCH_ROWS, PyarrowMissing, export_catalog
+from utils.logger import logger_setup
+import logging
+
+## Exports the catalog as Parquet or Arrow IPC files (one per table) for the analytics:
+##
+##   python export_catalog.py --output-dir exports
+##   python export_catalog.py --format arrow --table courses --batch-rows 100000
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exports the courses, the authors and their links as columnar files.")
+    parser.add_argument("--output-dir", default="exports", help="The directory of the files")
+    parser.add_argument("--format", type=ExportFormat, choices=list(ExportFormat), default=ExportFormat.parquet)
+    parser.add_argument("--table", type=ExportTable, choices=list(ExportTable), action="append",
+                        help="A table to export (repeatable), all by default")
+    parser.add_argument("--batch-rows", type=int, default=EXPORT_BATCH_ROWS, help="Rows per record batch")
+    args = parser.parse_args()
+
+    try:
+        exported = export_catalog(args.output_dir, args.format, args.table, args.batch_rows)
+    except PyarrowMissing as e:
+        parser.error(str(e))
+    for table, result in exported.items():
+        logging.info(f"{table}: {result['rows']} rows in {result['path']}")
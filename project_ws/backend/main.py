@@ -1,10 +1,43 @@
+import os
 from fastapi import FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
 from db.db_config import engine
-from routers import retrieve_data, modify_data, get_data
+from db.instrumentation import query_stats_middleware
+from db.catalog_version import catalog_version_store
+from db.catalog_events import refresh_derived_data
+from utils.response_cache import response_cache
+from routers import get_data, metrics
+
+## "full" mounts every router, "readonly" only the read routers (for API replicas
+## that never scrape or modify the catalog)
+APP_PROFILE = os.getenv("APP_PROFILE", "full").lower()
 
 app = FastAPI() ## Instatiate the FastAPI application
 
-app.include_router(retrieve_data.router)  ## Include the router from models
-app.include_router(get_data.router)
-app.include_router(modify_data.router)
+## The cached responses and ETags follow the catalog_version table, which every write bumps
+## (the scrape workers, the enrichment and the other API processes included)
+response_cache.use_version_store(catalog_version_store)
+## A new version (written by this process or another one) refreshes the statistics views and the
+## reference snapshot here, in the API, and not in every scrape worker
+response_cache.on_version_change(refresh_derived_data)
+
+## Compresses large responses (already compressed cached responses are left as they are)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+## Query count and database time of every request (headers in debug mode, metrics otherwise)
+app.middleware("http")(query_stats_middleware)
+
+app.include_router(get_data.router)  ## Include the router from models
+app.include_router(metrics.router)
+
+if APP_PROFILE != "readonly":
+    from routers import retrieve_data, modify_data
+    from utils.browser_supervisor import supervisor
+    from db.crawl_jobs import fail_stale_crawl_jobs
+    app.include_router(retrieve_data.router)
+    app.include_router(modify_data.router)
+    ## kills the browsers left behind by a crashed run, then keeps reaping on a schedule
+    app.add_event_handler("startup", supervisor.start)
+    ## the crawl jobs of a previous run of the API are gone with its background tasks
+    app.add_event_handler("startup", fail_stale_crawl_jobs)
 
@@ -1,5 +1,5 @@
 from db.db_config import Base
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
 
 class Authors(Base):
     """
@@ -14,6 +14,11 @@ class Authors(Base):
     id = Column(Integer,primary_key=True,index=True)
     name = Column(String)
 
+    __table_args__ = (
+        ## the ingestion looks up the authors by name
+        Index("ix_authors_name", "name"),
+    )
+
 class Authors_Courses(Base):
     """
     A model(association table) that represents the conncention
@@ -29,4 +34,12 @@ class Authors_Courses(Base):
 
     id = Column(Integer,primary_key=True,index=True)
     author_id = Column(Integer, ForeignKey("authors.id", ondelete='SET NULL'), nullable=True)
-    course_id = Column(Integer, ForeignKey("courses.id", ondelete='CASCADE'))
\ No newline at end of file
+    course_id = Column(Integer, ForeignKey("courses.id", ondelete='CASCADE'))
+
+    __table_args__ = (
+        ## the ingestion looks up the link of a course and an author for every course,
+        ## and deleting a course cascades to its links
+        Index("ix_authors_courses_course_author", "course_id", "author_id"),
+        ## the garbage collection looks for the authors without any link
+        Index("ix_authors_courses_author_id", "author_id"),
+    )
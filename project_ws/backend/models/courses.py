@@ -1,5 +1,5 @@
 from db.db_config import Base
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, CheckConstraint, Numeric
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Date, DateTime, ForeignKey, Float, CheckConstraint, Numeric, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -24,6 +24,13 @@ class Courses(Base):
     current_price = Column(Numeric(precision=10, scale=2), nullable=True)
     original_price = Column(Numeric(precision=10, scale=2), nullable=True)
     difficulty_id = Column(Integer, ForeignKey("course_difficulties.id", ondelete='SET NULL'), nullable=True)
+    last_seen_at = Column(DateTime(timezone=True), server_default=func.now())  # last scrape that listed the course
+    description = Column(Text, nullable=True)
+    last_updated_at = Column(Date, nullable=True)  # last update of the course content, from its detail page
+    enriched_at = Column(DateTime(timezone=True), nullable=True)  # last scrape of the detail page
+    enrich_attempted_at = Column(DateTime(timezone=True), nullable=True)  # last scrape of the detail page, failed or not
+    enrich_failures = Column(Integer, nullable=False, server_default="0")  # failed scrapes of the detail page in a row
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())  # last change of the content, set by a trigger
 
     difficulty = relationship("Course_difficulties", backref="courses")
     authors = relationship("Authors", secondary="authors_courses", backref="courses")
@@ -36,6 +43,19 @@ class Courses(Base):
             "url ~* '^https?://'",  # PostgreSQL regex to check http or https
             name="valid_url_check"
         ),
+        ## (column, id) indexes for the sort_by/limit (top-k) queries, read forwards or backwards
+        Index("ix_courses_rating_id", "rating", "id"),
+        Index("ix_courses_total_students_id", "total_students", "id"),
+        Index("ix_courses_current_price_id", "current_price", "id"),
+        Index("ix_courses_duration_id", "duration", "id"),
+        Index("ix_courses_created_at_id", "created_at", "id"),
+        ## difficulty filter combined with the most common sorts
+        Index("ix_courses_difficulty_rating_id", "difficulty_id", "rating", "id"),
+        Index("ix_courses_difficulty_total_students_id", "difficulty_id", "total_students", "id"),
+        ## scraped courses are matched by url (recrawls update them with INSERT ... ON CONFLICT (url))
+        Index("ix_courses_url", "url", unique=True),
+        ## the enrichment picks the courses never enriched first, then the oldest
+        Index("ix_courses_enriched_at_id", "enriched_at", "id"),
     )
 
 class Course_difficulties(Base):
@@ -53,3 +73,51 @@ class Course_difficulties(Base):
 
     id = Column(Integer,primary_key=True,index=True)
     difficulty = Column(String)
+
+class Course_changes(Base):
+    """
+    A model (table) that logs every insert, update and delete of a course
+    (and of its author links) for the change feed. Written by triggers
+    only (see the course_change_feed migration); a delete is kept as a
+    tombstone with the url of the course.
+
+    :param Base: Base class for SQLAlchemy models.
+    :type Base: sqlalchemy.ext.declarative.DeclarativeMeta
+    """
+
+    __tablename__ = "course_changes"
+
+    id = Column(BigInteger, primary_key=True)
+    txid = Column(BigInteger, nullable=False)  # the transaction of the change, pg_current_xact_id()
+    course_id = Column(Integer, nullable=False)  # no foreign key: the tombstones outlive their course
+    operation = Column(String, nullable=False)  # insert, update or delete
+    url = Column(String, nullable=True)  # of a deleted course
+    changed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        ## the feed reads the log in (txid, id) order from a cursor
+        Index("ix_course_changes_txid_id", "txid", "id"),
+        ## the compaction keeps the last change of every course
+        Index("ix_course_changes_course_id", "course_id", "txid", "id"),
+        CheckConstraint("operation IN ('insert', 'update', 'delete')", name="course_changes_operation_check"),
+    )
+
+class Catalog_version(Base):
+    """
+    A model (table) with a single row: the data version of the catalog,
+    bumped once by every transaction that writes to the catalog (deferred
+    triggers, see the catalog_version migration). The cached responses and
+    the ETags of every process are built from it.
+
+    :param Base: Base class for SQLAlchemy models.
+    :type Base: sqlalchemy.ext.declarative.DeclarativeMeta
+    """
+
+    __tablename__ = "catalog_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False)
+
+    __table_args__ = (
+        CheckConstraint("id = 1", name="catalog_version_single_row"),
+    )
@@ -0,0 +1,147 @@
+from db.db_config import Base
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, UniqueConstraint, Index
+from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
+
+class Scrape_jobs(Base):
+    """
+    A model (table) that represents a scrape of a range of pages
+    of a platform. A job that is not completed is resumed by the
+    next scrape of the same platform and range.
+
+    :param Base: Base class for SQLAlchemy models.
+    :type Base: sqlalchemy.ext.declarative.DeclarativeMeta
+    """
+
+    __tablename__ = "scrape_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    platform = Column(String, nullable=False)
+    category = Column(String, nullable=True)  # NULL: the default category of the platform
+    start_page = Column(Integer, nullable=False)
+    end_page = Column(Integer, nullable=False)
+    status = Column(String, nullable=False, server_default="running")  # running, completed or failed
+    crawl_job_id = Column(Integer, ForeignKey("crawl_jobs.id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    pages = relationship("Scrape_job_pages", backref="job", cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (
+        Index("ix_scrape_jobs_platform_range_status", "platform", "start_page", "end_page", "status"),
+    )
+
+class Crawl_jobs(Base):
+    """
+    A model (table) that represents a crawl of several platforms and
+    categories at once, one scrape job per target (platform, category
+    and page range), run in the background by the API. A queued or running
+    job whose heartbeat stopped (the API was restarted) is marked failed.
+
+    :param Base: Base class for SQLAlchemy models.
+    :type Base: sqlalchemy.ext.declarative.DeclarativeMeta
+    """
+
+    __tablename__ = "crawl_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String, nullable=False, server_default="queued")  # queued, running, completed or failed
+    concurrency = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    courses_count = Column(Integer, nullable=False, server_default="0")
+    error = Column(String, nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), server_default=func.now())  # renewed while the job runs
+
+    scrape_jobs = relationship("Scrape_jobs", backref="crawl_job", order_by="Scrape_jobs.id")
+
+class Scrape_job_pages(Base):
+    """
+    A model (table) with the checkpoint of one page of a scrape job.
+    A page is marked completed in the same transaction as its courses.
+
+    :param Base: Base class for SQLAlchemy models.
+    :type Base: sqlalchemy.ext.declarative.DeclarativeMeta
+    """
+
+    __tablename__ = "scrape_job_pages"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("scrape_jobs.id", ondelete="CASCADE"), nullable=False)
+    page = Column(Integer, nullable=False)
+    status = Column(String, nullable=False, server_default="pending")  # pending, completed or failed
+    attempts = Column(Integer, nullable=False, server_default="0")
+    courses_count = Column(Integer, nullable=True)
+    error = Column(String, nullable=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("job_id", "page", name="uq_scrape_job_pages_job_page"),
+    )
+
+class Scrape_queue(Base):
+    """
+    A model (table) with the pages waiting to be scraped by the scrape workers.
+    A page is queued once per platform: enqueuing it again while it is queued
+    or claimed does nothing. Workers claim pages with a lease that they renew
+    with heartbeats; a page whose lease expired is queued again.
+
+    :param Base: Base class for SQLAlchemy models.
+    :type Base: sqlalchemy.ext.declarative.DeclarativeMeta
+    """
+
+    __tablename__ = "scrape_queue"
+
+    id = Column(Integer, primary_key=True, index=True)
+    platform = Column(String, nullable=False)
+    page = Column(Integer, nullable=False)
+    status = Column(String, nullable=False, server_default="queued")  # queued, claimed, done or failed
+    attempts = Column(Integer, nullable=False, server_default="0")
+    available_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    leased_by = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    enqueued_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    courses_count = Column(Integer, nullable=True)
+    error = Column(String, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("platform", "page", name="uq_scrape_queue_platform_page"),
+        ## claiming only reads the queued pages, in order
+        Index("ix_scrape_queue_queued", "available_at", "id", postgresql_where=(status == "queued")),
+        Index("ix_scrape_queue_claimed_lease", "lease_expires_at", postgresql_where=(status == "claimed")),
+    )
+
+class Listing_pages(Base):
+    """
+    A model (table) with the crawl history of a listing page, used by the
+    recrawl scheduler. The interval until the next crawl shrinks when the
+    page changed since the last crawl and grows when it did not.
+
+    :param Base: Base class for SQLAlchemy models.
+    :type Base: sqlalchemy.ext.declarative.DeclarativeMeta
+    """
+
+    __tablename__ = "listing_pages"
+
+    id = Column(Integer, primary_key=True, index=True)
+    platform = Column(String, nullable=False)
+    page = Column(Integer, nullable=False)
+    last_crawled_at = Column(DateTime(timezone=True), nullable=True)  # NULL: never crawled
+    last_changed_at = Column(DateTime(timezone=True), nullable=True)
+    next_crawl_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    interval_seconds = Column(Float, nullable=False)
+    crawl_count = Column(Integer, nullable=False, server_default="0")
+    change_count = Column(Integer, nullable=False, server_default="0")
+    change_rate = Column(Float, nullable=False, server_default="0")  # moving average of "changed" per crawl
+    courses_count = Column(Integer, nullable=True)
+    content_hash = Column(String, nullable=True)
+    crawl_failures = Column(Integer, nullable=False, server_default="0")  # failed crawls in a row
+    last_failed_at = Column(DateTime(timezone=True), nullable=True)  # end of the last failed queue entry counted
+
+    __table_args__ = (
+        UniqueConstraint("platform", "page", name="uq_listing_pages_platform_page"),
+        Index("ix_listing_pages_next_crawl_at", "next_crawl_at"),
+    )
@@ -0,0 +1,173 @@
+import argparse
+import math
+import os
+import signal
+import threading
+import time
+from db.db_config import SessionLocal
+from db.recrawl import register_pages, record_failed_crawls, select_due_pages
+from db.scrape_queue import enqueue_pages
+from utils.metrics import Counter, Gauge, start_metrics_server
+from utils.logger import logger_setup
+import logging
+
+## Recrawl scheduler: queues the listing pages that are due (see db/recrawl.py) for the
+## scrape workers, the most stale and volatile first, within a budget of pages per hour.
+## Run one scheduler per database; the scrape workers do the scraping.
+##
+##   python recrawl_scheduler.py --register udemy:1-50 --register pluralsight:1-10
+##   python recrawl_scheduler.py --pages-per-hour 120
+##   python recrawl_scheduler.py --once
+##   python recrawl_scheduler.py --metrics-port 9100   (GET /metrics: due and queued pages)
+
+RECRAWL_PAGES_PER_HOUR = float(os.getenv("RECRAWL_PAGES_PER_HOUR", "60"))
+RECRAWL_TICK_SECONDS = float(os.getenv("RECRAWL_TICK_SECONDS", "60"))
+RECRAWL_METRICS_PORT = int(os.getenv("RECRAWL_METRICS_PORT", "0"))  # 0 for no metrics server
+
+RECRAWL_DUE_PAGES = Gauge(
+    "recrawl_due_pages",
+    "Listing pages that were due at the last tick of the recrawl scheduler (up to the budget of the tick)."
+)
+
+RECRAWL_ENQUEUED_PAGES = Counter(
+    "recrawl_enqueued_pages_total",
+    "Listing pages queued by the recrawl scheduler.",
+    ("platform",)
+)
+
+class PageBudget:
+    """
+    A token bucket of pages: tokens are added at `pages_per_hour`, and at
+    most one tick worth of them is kept, so an idle period (nothing due)
+    does not turn into a burst of recrawls later.
+
+    :param pages_per_hour: The budget
+    :type pages_per_hour: float
+    :param tick: Seconds between two ticks of the scheduler
+    :type tick: float
+    """
+
+    def __init__(self, pages_per_hour: float, tick: float):
+        self.rate = pages_per_hour / 3600
+        self.capacity = max(1, math.ceil(self.rate * tick))
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+
+    def available(self) -> int:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        return int(self.tokens)
+
+    def spend(self, pages: int):
+        self.tokens -= pages
+
+def schedule_tick(db, budget: PageBudget) -> int:
+    """
+    Queues the most urgent due pages allowed by the budget.
+
+    :return: The number of pages queued
+    :rtype: int
+    """
+
+    failed = record_failed_crawls(db)
+    if failed:
+        logging.warning(f"Pushed back the next crawl of {failed} pages that failed")
+
+    available = budget.available()
+    if available < 1:
+        return 0
+
+    due = select_due_pages(db, available)
+    RECRAWL_DUE_PAGES.set(len(due))
+
+    pages_by_platform = {}
+    for row in due:
+        pages_by_platform.setdefault(row["platform"], []).append(row["page"])
+
+    queued = 0
+    for platform, pages in pages_by_platform.items():
+        platform_queued = enqueue_pages(db, platform, pages)
+        RECRAWL_ENQUEUED_PAGES.inc(platform_queued, platform=platform)
+        queued += platform_queued
+
+    budget.spend(queued)
+    if queued:
+        logging.info(f"Queued {queued} pages for recrawl: {pages_by_platform}")
+    return queued
+
+def run_scheduler(pages_per_hour: float = RECRAWL_PAGES_PER_HOUR, tick: float = RECRAWL_TICK_SECONDS,
+                  once: bool = False) -> int:
+    """
+    Runs a tick every `tick` seconds until stopped (SIGTERM or SIGINT).
+
+    :param once: Runs a single tick with the budget of one tick
+    :type once: bool
+    :return: The number of pages queued
+    :rtype: int
+    """
+
+    stopping = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stopping.set())
+
+    budget = PageBudget(pages_per_hour, tick)
+    queued = 0
+    db = SessionLocal()
+    try:
+        while not stopping.is_set():
+            try:
+                queued += schedule_tick(db, budget)
+            except Exception as e:
+                db.rollback()
+                logging.error(f"Recrawl tick failed: {e}")
+            if once:
+                break
+            stopping.wait(tick)
+    finally:
+        db.close()
+
+    logging.info(f"Recrawl scheduler stopped after queuing {queued} pages")
+    return queued
+
+def parse_page_range(value: str) -> tuple[str, list[int]]:
+    """
+    :param value: platform:start-end (or platform:page), e.g. udemy:1-50
+    :return: The platform and the pages
+    :rtype: tuple[str, list[int]]
+    """
+
+    from utils.web_scraper_scripts.platforms import get_platform
+
+    platform, _, pages = value.partition(":")
+    start, _, end = pages.partition("-")
+    adapter = get_platform(platform)
+    if adapter is None or not start:
+        raise argparse.ArgumentTypeError(f"Expected platform:start-end with a known platform, got '{value}'")
+    start, end = int(start), int(end or start)
+    return adapter.name, list(range(start, end + 1))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Queues stale listing pages for the scrape workers within a pages-per-hour budget.")
+    parser.add_argument("--pages-per-hour", type=float, default=RECRAWL_PAGES_PER_HOUR)
+    parser.add_argument("--tick", type=float, default=RECRAWL_TICK_SECONDS, help="Seconds between two ticks")
+    parser.add_argument("--register", type=parse_page_range, action="append", default=[],
+                        help="Adds pages to the schedule first, e.g. udemy:1-50 (repeatable)")
+    parser.add_argument("--once", action="store_true", help="Runs a single tick and exits")
+    parser.add_argument("--metrics-port", type=int, default=RECRAWL_METRICS_PORT,
+                        help="Serves GET /metrics of the scheduler on this port, off if 0")
+    args = parser.parse_args()
+
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+
+    if args.register:
+        db = SessionLocal()
+        try:
+            for platform, pages in args.register:
+                added = register_pages(db, platform, pages)
+                logging.info(f"Registered {added} new pages of {platform} for recrawl")
+        finally:
+            db.close()
+
+    run_scheduler(args.pages_per_hour, args.tick, args.once)
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from db.db_config import SessionLocal
 from typing import Annotated, Optional
@@ -6,9 +7,19 @@ from starlette import status
 from typing import List
 from models.authors import Authors, Authors_Courses
 from models.courses import Courses, Course_difficulties
-from sqlalchemy.orm import joinedload
 from typing import List
-from schemas.db_retrieval_schema import CourseOut, DifficultyOut, AuthorOut
+from schemas.db_retrieval_schema import CourseOut, DifficultyOut, AuthorOut, CatalogStatsOut, CourseFacetsOut, CourseIdsIn, CoursesByIdsOut, CourseChangesOut
+from schemas.course_filters import CourseFilters, CourseSortField, SortOrder, apply_sorting
+from db.course_json import render_courses_json
+from db.catalog_stats import get_catalog_stats
+from db.course_facets import count_course_facets
+from db.course_batch import fetch_courses_by_ids, MAX_BATCH_IDS
+from db.reference_snapshot import reference_snapshot, ReferenceSnapshot
+from db.course_changes import get_changes, CHANGES_PAGE_SIZE, CHANGES_MAX_PAGE_SIZE
+from db.catalog_export import ExportTable, ExportFormat, EXPORT_MEDIA_TYPES, EXPORT_BATCH_ROWS, PyarrowMissing, import_pyarrow, stream_table
+from utils.response_cache import response_cache
+from utils.http_cache import make_etag, etag_matches, not_modified, compress_body, json_response
+import json
 
 router = APIRouter(
     prefix="/get_data",
@@ -34,11 +45,65 @@ def get_db():
 
 ##The depandancy injection
 db_dependancy = Annotated[Session,Depends(get_db)]
+filters_dependancy = Annotated[CourseFilters, Depends()]
+
+def cached_body_response(request: Request, cache_key: str, render_body) -> Response:
+    """
+    Serves the response from the cache if present, otherwise renders
+    the JSON body, stores it (compressed) in the cache and returns it.
+
+    The ETag is derived from the cache key, so a client that sends
+    a matching `If-None-Match` gets a 304 before any query is made.
+
+    :param request: The incoming request
+    :type request: Request
+    :param cache_key: Key built with `response_cache.make_key`
+    :type cache_key: str
+    :param render_body: Function that returns the serialized JSON (may raise HTTPException)
+    :type render_body: Callable[[], bytes]
+    :return: A JSON response with the rendered body
+    :rtype: Response
+    """
+
+    etag = make_etag(cache_key)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    body = response_cache.get(cache_key)
+    if body is None:
+        body = compress_body(render_body())
+        response_cache.set(cache_key, body)
+
+    return json_response(request, body, etag)
+
+def snapshot_response(request: Request, snapshot: ReferenceSnapshot, body: bytes, etag: str) -> Response:
+    """
+    Returns a table of the reference snapshot with an ETag
+    and the version of the snapshot, or a 304 if the client has it.
+
+    :param request: The incoming request
+    :type request: Request
+    :param snapshot: The current reference snapshot
+    :type snapshot: ReferenceSnapshot
+    :param body: The serialized table
+    :type body: bytes
+    :param etag: The ETag of the table, built from its content
+    :type etag: str
+    :rtype: Response
+    """
+
+    if etag_matches(request, etag):
+        response = not_modified(etag)
+    else:
+        response = json_response(request, body, etag)
+
+    response.headers["X-Snapshot-Version"] = str(snapshot.version)
+    return response
 
 @router.get("/get_all_courses_from_db",
             response_model=List[CourseOut],
             status_code=status.HTTP_200_OK)
-async def get_all_courses(db: db_dependancy):
+async def get_all_courses(db: db_dependancy, request: Request):
     """
     Returns all courses in the database.
 
@@ -50,13 +115,13 @@ async def get_all_courses(db: db_dependancy):
 
 
     """
-    courses = db.query(Courses).options(
-        joinedload(Courses.difficulty),
-        joinedload(Courses.authors)
-    ).all()
-    if courses:
-        return courses
-    raise HTTPException(status_code=404, detail="No courses found.")
+    def render_courses():
+        body = render_courses_json(db)
+        if body != b"[]":
+            return body
+        raise HTTPException(status_code=404, detail="No courses found.")
+
+    return cached_body_response(request, response_cache.make_key("get_all_courses"), render_courses)
 
 ##Unified filters if separate it would lead to complexxity explosion
 @router.get("/get_filtered_courses",
@@ -64,13 +129,11 @@ async def get_all_courses(db: db_dependancy):
             status_code=status.HTTP_200_OK)
 async def get_courses(
     db: db_dependancy,
-    id: Optional[int] = Query(None, gt=0, description="Filter by course ID."),
-    keyword: Optional[str] = Query(None, description="Search for a keyword in the course name (case-insensitive)."),
-    min_price: Optional[float] = Query(None, gte=0, description="Search for courses with a price greater than or equal to this value."),
-    max_price: Optional[float] = Query(None, le=1000, description="Search for courses with a price less than or equal to this value."),
-    rating: Optional[float] = Query(None, gt=0, le=5, description="Search for a course rating above the given value."),
-    difficulty: Optional[str] = Query(None, description="Filter by difficulty level."),
-    author_name: Optional[str] = Query(None, description="Filter by author name.")
+    request: Request,
+    filters: filters_dependancy,
+    sort_by: Optional[CourseSortField] = Query(None, description="Sort the courses by this column."),
+    order: SortOrder = Query(SortOrder.desc, description="Sort order, used with sort_by."),
+    limit: Optional[int] = Query(None, gt=0, le=1000, description="Return at most this many courses (top-k with sort_by).")
 ):
     """
     Returns a list of courses based on various optional filters.
@@ -83,6 +146,10 @@ async def get_courses(
     - **rating**: Course rating from 0 to 5.
     - **difficulty**: Filter by the difficulty level (e.g., 'Beginner').
     - **author_name**: Filter by the name of an author.
+    - **sort_by**: rating, total_students, current_price, duration or created_at
+      (courses without a value in that column are left out).
+    - **order**: asc or desc (default desc).
+    - **limit**: Maximum number of courses, e.g. the top 20 with sort_by.
 
     ### Returns
 
@@ -93,84 +160,132 @@ async def get_courses(
     - **HTTPException(404, "Not Found")**: If no courses are found that match the provided criteria.
     """
 
-    # not a db call!!! - it is without all
-    query = db.query(Courses).options(
-        joinedload(Courses.difficulty),
-        joinedload(Courses.authors)
+    def render_courses():
+        # not a db call!!! - it is without all
+        ## only the ids are filtered here, the JSON is built by the database
+        query = filters.apply(db.query(Courses.id))
+
+        if sort_by:
+            query = apply_sorting(query, sort_by, order, limit)
+            body = render_courses_json(db, query.statement, ordered=True)
+        else:
+            if limit:
+                query = query.order_by(Courses.id).limit(limit)
+            body = render_courses_json(db, query.statement)
+
+        if body == b"[]":
+            raise HTTPException(status_code=404, detail="No courses found matching the criteria.")
+
+        return body
+
+    cache_key = response_cache.make_key(
+        "get_filtered_courses",
+        sort_by=sort_by.value if sort_by else None,
+        order=order.value if sort_by else None,
+        limit=limit,
+        **filters.as_dict()
     )
+    return cached_body_response(request, cache_key, render_courses)
+
+@router.post("/get_courses_by_ids",
+             response_model=CoursesByIdsOut,
+             status_code=status.HTTP_200_OK)
+async def get_courses_by_ids(db: db_dependancy, course_ids: CourseIdsIn):
+    """
+    Returns the courses with the given ids, in the requested order,
+    using one query for the courses and one for their authors.
+
+    - **db**: The database dependency.
+    - **ids**: Up to 5000 course ids (duplicates are ignored).
+
+    ### Returns
 
-    if id:
-        query = query.filter(Courses.id == id)
+    A `CoursesByIdsOut` object with the found courses and the ids that were not found.
 
-    if keyword:
-        search_term = f"%{keyword}%"
-        query = query.filter(Courses.name.ilike(search_term))
+    ### Raises
 
-    if min_price and max_price:
-        if min_price > max_price:
-            raise HTTPException(
-                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail="Minimum price cannot be greater than maximum price."
-            )
-        query = query.filter((Courses.current_price <= max_price) & (Courses.current_price >= min_price))
+    - **HTTPException(422, "Unprocessable Entity")**: If no ids, more than 5000 ids or an id below 1 are sent.
+    """
 
-    if min_price and not max_price:
-        query = query.filter(Courses.current_price >= min_price)
+    if not course_ids.ids or len(course_ids.ids) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Between 1 and {MAX_BATCH_IDS} ids must be sent."
+        )
+    if any(course_id < 1 for course_id in course_ids.ids):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Course ids must be positive.")
 
-    if max_price and not min_price:
-        query = query.filter(Courses.current_price <= max_price)
+    courses, missing_ids = fetch_courses_by_ids(db, course_ids.ids)
+    body = json.dumps({"courses": courses, "missing_ids": missing_ids}).encode("utf-8")
+    return Response(content=body, media_type="application/json")
 
-    if rating:
-        query = query.filter(Courses.rating >= rating)
+@router.get("/get_course_facets",
+            response_model=CourseFacetsOut,
+            status_code=status.HTTP_200_OK)
+async def get_course_facets(
+    db: db_dependancy,
+    request: Request,
+    filters: filters_dependancy,
+    top_authors: int = Query(10, gt=0, le=100, description="Number of authors (by number of courses) to return.")
+):
+    """
+    Returns the number of courses per difficulty, price bucket, rating bucket
+    and author for the courses that match the filters.
+    Takes the same filters as **get_filtered_courses** and computes
+    all counts in a single query.
 
-    if difficulty:
-        search_difficulty_term = f"%{difficulty}%"
-        query = query.join(Course_difficulties).filter(Course_difficulties.difficulty.ilike(search_difficulty_term))
+    - **id**, **keyword**, **min_price**, **max_price**, **rating**, **difficulty**, **author_name**: The course filters.
+    - **top_authors**: Number of authors to return (1 to 100).
 
-    if author_name:
-        search_author_term = f"%{author_name}%"
-        query = query.join(Courses.authors).filter(Authors.name.ilike(search_author_term))
+    ### Returns
 
-    courses = query.all()
+    A `CourseFacetsOut` object (all counts are 0 if no course matches).
+    """
 
-    if not courses:
-        raise HTTPException(status_code=404, detail="No courses found matching the criteria.")
+    def render_facets():
+        query = filters.apply(db.query(Courses.id))
+        facets = CourseFacetsOut.model_validate(count_course_facets(db, query.statement, top_authors))
+        return facets.model_dump_json().encode("utf-8")
 
-    return courses
+    cache_key = response_cache.make_key("get_course_facets", top_authors=top_authors, **filters.as_dict())
+    return cached_body_response(request, cache_key, render_facets)
 
 @router.get("/get_all_difficulty_types",
             response_model=List[DifficultyOut],
             status_code=status.HTTP_200_OK)
-async def get_all_difficulty_types(db: db_dependancy):
+async def get_all_difficulty_types(request: Request):
     """
-    Returns a course with the given id.
+    Returns a list of all difficulty types.
 
-    - **db**: The database dependency.
-    - **course_id**: The ID of the course to retrieve.
+    Served from the in-memory reference snapshot (no database access).
+    The `ETag` and `X-Snapshot-Version` headers identify the snapshot,
+    a matching `If-None-Match` returns a 304.
 
     ### Returns
 
-    The found course with all its related data.
+    A list of `DifficultyOut` objects.
 
     ### Raises
 
-    - **HTTPException(404, "Not Found")**: If a course with the given ID is not found.
+    - **HTTPException(404, "Not Found")**: If no difficulty types are found in the database.
     """
 
-    difficulties = db.query(Course_difficulties).all()
+    snapshot = reference_snapshot.get()
+    if not snapshot.difficulties_count:
+        raise HTTPException(status_code=404,detail="No difficulty items were found")
 
-    if difficulties:
-        return difficulties
-    raise HTTPException(status_code=404,detail="No difficulty items were found")
+    return snapshot_response(request, snapshot, snapshot.difficulties_body, snapshot.difficulties_etag)
 
 @router.get("/get_all_authors",
             response_model=List[AuthorOut],
             status_code=status.HTTP_200_OK)
-async def get_all_authors(db: db_dependancy):
+async def get_all_authors(request: Request):
     """
     Returns a list of all authors.
 
-    - **db**: The database dependency.
+    Served from the in-memory reference snapshot (no database access).
+    The `ETag` and `X-Snapshot-Version` headers identify the snapshot,
+    a matching `If-None-Match` returns a 304.
 
     ### Returns
 
@@ -181,8 +296,102 @@ async def get_all_authors(db: db_dependancy):
     - **HTTPException(404, "Not Found")**: If no authors are found in the database.
     """
 
-    authors = db.query(Authors).all()
+    snapshot = reference_snapshot.get()
+    if not snapshot.authors_count:
+        raise HTTPException(status_code=404, detail="No authors were found")
+
+    return snapshot_response(request, snapshot, snapshot.authors_body, snapshot.authors_etag)
+
+@router.get("/stats",
+            response_model=CatalogStatsOut,
+            status_code=status.HTTP_200_OK)
+async def get_stats(
+    db: db_dependancy,
+    top_authors: int = Query(10, gt=0, le=100, description="Number of authors (by total students) to return.")
+):
+    """
+    Returns aggregates over the whole catalog: average price and rating by difficulty,
+    the rating distribution, the top authors by total students and the course count per platform.
+
+    The aggregates are served from materialized views that are refreshed
+    in the background after every insert or delete (of any process).
+
+    - **db**: The database dependency.
+    - **top_authors**: Number of authors to return (1 to 100).
+
+    ### Returns
+
+    A `CatalogStatsOut` object.
+    """
+
+    ## reads the data version, so a write of a scrape worker schedules the refresh of the views
+    response_cache.data_version()
+    return get_catalog_stats(db, top_authors)
+
+@router.get("/changes",
+            response_model=CourseChangesOut,
+            status_code=status.HTTP_200_OK)
+async def get_course_changes(
+    db: db_dependancy,
+    since: Optional[str] = Query(None, description="The cursor of the previous response, empty for the start of the feed."),
+    limit: int = Query(CHANGES_PAGE_SIZE, gt=0, le=CHANGES_MAX_PAGE_SIZE, description="Maximum number of changes to read.")
+):
+    """
+    Returns the courses inserted, updated and deleted since a cursor, in the
+    order of their transactions, and the cursor to pass as `since` next time.
+    The cost depends on the number of changes, not on the size of the catalog.
+
+    A change has the current state of the course, or none for a deleted course
+    (a tombstone). A course changed again after the cursor may come twice:
+    applying the changes as upserts and deletes by `course_id` is enough.
+    The feed starts with every course of the catalog, so an empty cursor is a full sync.
+
+    - **db**: The database dependency.
+    - **since**: The cursor of the previous response.
+    - **limit**: Maximum number of changes to read (`has_more` tells if more are ready).
+
+    ### Raises
+
+    - **HTTPException(422, "Unprocessable Entity")**: If the cursor is malformed.
+    """
+
+    try:
+        return get_changes(db, since, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+@router.get("/export/{table}",
+            response_class=StreamingResponse,
+            status_code=status.HTTP_200_OK)
+async def export_table(
+    table: ExportTable,
+    format: ExportFormat = Query(ExportFormat.parquet, description="parquet or arrow (Arrow IPC file)"),
+    batch_rows: int = Query(EXPORT_BATCH_ROWS, gt=0, le=500000, description="Rows per record batch (Parquet row group).")
+):
+    """
+    Streams a table of the catalog (courses, authors or authors_courses) as a Parquet
+    or an Arrow IPC file, in record batches read with a server-side cursor, so the
+    memory of the API does not depend on the size of the catalog.
 
-    if authors:
-        return authors
-    raise HTTPException(status_code=404, detail="No authors were found")
\ No newline at end of file
+    The columns keep their types: the prices are decimal(10, 2), the timestamps are
+    in UTC and `last_updated_at` is a date. The courses include the difficulty as text.
+
+    - **table**: The table to export.
+    - **format**: parquet (default) or arrow.
+    - **batch_rows**: Rows per record batch.
+
+    ### Raises
+
+    - **HTTPException(501, "Not Implemented")**: If pyarrow is missing from the deployment (it is in requirements.txt).
+    """
+
+    try:
+        import_pyarrow()
+    except PyarrowMissing as e:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e))
+
+    return StreamingResponse(
+        stream_table(table, format, batch_rows),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{table.value}.{format.value}"'}
+    )
@@ -0,0 +1,20 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from starlette import status
+from utils.metrics import render_metrics
+
+router = APIRouter(
+    tags=["Metrics"]
+)
+
+@router.get("/metrics",
+            response_class=PlainTextResponse,
+            status_code=status.HTTP_200_OK)
+async def get_metrics():
+    """
+    Returns the metrics of this process in the Prometheus text format:
+    the duration of every stage of the scraping pipeline (labeled by
+    platform, page and stage) and the extraction failures by exception class.
+    """
+
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
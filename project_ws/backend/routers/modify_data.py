@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, Path
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Path, Query
+from sqlalchemy import delete
 from sqlalchemy.orm import Session
 from db.db_config import SessionLocal
 from typing import Annotated
@@ -6,6 +7,9 @@ from starlette import status
 from schemas.web_retrieval_schema import CourseInput, CoursesInput
 from models.authors import Authors, Authors_Courses
 from models.courses import Courses, Course_difficulties
+from db.catalog_events import catalog_changed
+from db.catalog_cleanup import delete_courses, collect_garbage, schedule_garbage_collection
+from schemas.course_filters import CourseFilters
 
 router = APIRouter(
     prefix="/modify_date",
@@ -30,11 +34,13 @@ def get_db():
         db.close()
 
 db_dependancy = Annotated[Session,Depends(get_db)]
+filters_dependancy = Annotated[CourseFilters, Depends()]
 
 @router.delete("/delete_course/{course_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_course(db: db_dependancy, course_id: int = Path(gt=0)):
     """
-    Deletes a course with the given ID.
+    Deletes a course with the given ID. The deletion is kept as a tombstone
+    in the change feed (**GET /get_data/changes**).
 
     - **db**: The database dependency.
     
@@ -43,10 +49,50 @@ async def delete_course(db: db_dependancy, course_id: int = Path(gt=0)):
     - **HTTPException(404, "Not Found")**: If no courses are found that match the provided criteria.
     """
 
-    course_to_delete = db.query(Courses).filter(Courses.id == course_id).first()
+    ## one statement, the links are removed by the ON DELETE CASCADE of authors_courses
+    deleted = db.execute(delete(Courses).where(Courses.id == course_id)).rowcount
 
-    if course_to_delete is None:
+    if not deleted:
         raise HTTPException(status_code=404, detail="Course not found.")
 
-    db.delete(course_to_delete)
     db.commit()
+    catalog_changed()
+    schedule_garbage_collection()
+
+@router.delete("/delete_courses", status_code=status.HTTP_200_OK)
+async def delete_filtered_courses(db: db_dependancy, filters: filters_dependancy,
+                                  dry_run: bool = Query(True, description="Only count the courses that would be deleted.")):
+    """
+    Deletes every course matching the filters (the same as **get_filtered_courses**)
+    with a single statement. By default it is a dry run that only counts them.
+    The authors and difficulties left without courses are removed afterwards
+    by the garbage collection.
+
+    - **db**: The database dependency.
+    - **filters**: The course filters, at least one is required.
+    - **dry_run**: Only count the matching courses (default), false to delete them.
+
+    ### Returns
+
+    The number of matching and of deleted courses.
+
+    ### Raises
+
+    - **HTTPException(422, "Unprocessable Entity")**: If no filter is set.
+    """
+
+    try:
+        return delete_courses(db, filters, dry_run)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+@router.post("/collect_garbage", status_code=status.HTTP_202_ACCEPTED)
+async def start_garbage_collection(background_tasks: BackgroundTasks):
+    """
+    Removes in the background, in small batches, the authors without courses,
+    the links without an author or a course and the unused difficulties.
+    It also runs after every delete.
+    """
+
+    background_tasks.add_task(collect_garbage)
+    return {"Status": "scheduled"}
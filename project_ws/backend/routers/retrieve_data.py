@@ -1,14 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Path, Query, Request
 from sqlalchemy.orm import Session
 from db.db_config import SessionLocal
-from utils.web_scraper_scripts.multiple_pages_scraper import retrive_mulitiple_courses
 from typing import Annotated
 from starlette import status
 from typing import List
-from schemas.web_retrieval_schema import CourseInput, CoursesInput
-from models.authors import Authors, Authors_Courses
-from models.courses import Courses, Course_difficulties
 from utils.logger import logger_setup
+from db.catalog_events import catalog_changed
+from db.course_ingestion import insert_scraped_courses
+from db.scrape_queue import enqueue_pages, queue_stats
+from db.recrawl import register_pages, record_page_crawl, recrawl_stats
+from db.course_enrichment import enrich_courses, ENRICH_CONCURRENCY
+from db.crawl_jobs import create_crawl_job, run_crawl_job, crawl_job_status, merge_crawl_targets, CRAWL_CONCURRENCY
+from db.course_import import import_course_records, iter_json_records, iter_ndjson_records, NDJSON_CONTENT_TYPES, IMPORT_BATCH_SIZE
+from schemas.web_retrieval_schema import CrawlJobIn
+from db.scrape_checkpoints import get_or_create_scrape_job, pending_pages, complete_page, fail_page, finish_job
+from utils.metrics import scrape_context, time_stage
 import logging
 
 router = APIRouter(
@@ -35,6 +41,25 @@ def get_db():
 
 db_dependancy = Annotated[Session, Depends(get_db)]
 
+def get_known_platform(web_platform: str) -> str:
+    """
+    Normalizes the name of a platform and checks that a platform adapter
+    is registered for it (see utils/web_scraper_scripts/platforms.py).
+
+    :raises HTTPException: 404 if the platform is unknown
+    :return: The name of the platform
+    :rtype: str
+    """
+
+    ## The scraping stack (selenium, undetected_chromedriver) is imported on first use,
+    ## so processes that only serve reads never load it
+    from utils.web_scraper_scripts.platforms import get_platform
+
+    adapter = get_platform(web_platform)
+    if adapter is None:
+        raise HTTPException(status_code=404, detail=f"Unknown web platform '{web_platform}'")
+    return adapter.name
+
 @router.post("/insert_courses/{start_page}/{end_page}", status_code=status.HTTP_201_CREATED)
 async def insert_courses(db: db_dependancy, 
                         web_platform:str = Query(description="Type udemy or pluralsight"),
@@ -58,167 +83,280 @@ async def insert_courses(db: db_dependancy,
     - **start_page**: that starts the webscraping starts from
     - **end_page**: that is the last page the is webscraped (including)
 
+    Every page is retried with exponential backoff and checkpointed: its courses and its
+    checkpoint are committed together. A scrape of the same platform and range that was
+    interrupted or had failed pages is resumed from the pages that are not completed.
+
     ### Returns
 
     A JSON object indicating success and the number of courses successfully processed as well as
-    the inserted courses
+    the inserted courses, the id of the scrape job and its completed and failed pages
 
     ### Raises
 
-    - **HTTPException(404, "Not Found")**: If the external scraping process returns no courses for the given pages or platform.
-    - **HTTPException(500, "Internal Server Error")**: If any error occurs during the processing of individual courses or a database operation.
+    - **HTTPException(404, "Not Found")**: If the platform is unknown or no page of the range could be scraped.
+    - **HTTPException(500, "Internal Server Error")**: If the checkpoints could not be read or written.
     """
-    try:
-        if start_page > end_page:
-            return {"Error":"starting page cannot be bigger tha ending page"}
-        all_courses = retrive_mulitiple_courses(web_platform, start_page, end_page)
+    if start_page > end_page:
+        return {"Error":"starting page cannot be bigger tha ending page"}
 
-        logging.info(f"Retrieved coureses: {all_courses}")
+    platform = get_known_platform(web_platform)
+    from utils.web_scraper_scripts.multiple_pages_scraper import get_last_page, scrape_page, PageScrapeError
 
-        attempts = 0
-        while not all_courses and attempts < 3:
-            attempts+=1
-            logging.warning(f"No courses retrieved for {web_platform}, pages {start_page} to {end_page}")
-        if not all_courses:
-            raise HTTPException(status_code=404, detail="Error while processing data")
+    try:
+        job = get_or_create_scrape_job(db, platform, start_page, end_page)
+        last_page = get_last_page(platform)
+        pages = pending_pages(db, job, last_page)
+    except PageScrapeError as e:
+        logging.error(str(e))
+        raise HTTPException(status_code=404, detail="Error while processing data")
+    except Exception as e:
+        db.rollback()
+        logging.error(f"Scrape job could not be started: {e}")
+        raise HTTPException(status_code=500, detail="Error on the incoming data")
 
-        all_courses_validated = [CourseInput(**course) for course in all_courses]
+    logging.info(f"Scrape job {job.id}: {len(pages)} pages left of {platform} {start_page}-{end_page}")
+
+    inserted_courses = []
+    completed_pages = []
+    failed_pages = []
+    try:
+        for checkpoint in pages:
+            try:
+                scraped, attempts = scrape_page(platform, checkpoint.page)
+            except PageScrapeError as e:
+                logging.error(str(e))
+                fail_page(db, checkpoint, e.attempts, e.cause)
+                failed_pages.append(checkpoint.page)
+                continue
 
-        courses_counter = 0
-        for course in all_courses_validated:
             try:
-                courses_counter+=1
-                difficulty = get_or_create_difficulty(db, course.difficulty)
-                created_course = create_course(db, course, difficulty.id)
-                authors = get_or_create_author(db, course.author)
-                for author in authors:
-                    link_author_to_course(db, author.id, created_course.id)
-                db.commit()
-            except Exception:
+                ## the courses of the page and its checkpoint are committed together
+                with scrape_context(platform, checkpoint.page), time_stage("db_write"):
+                    page_courses = insert_scraped_courses(db, scraped)
+                    complete_page(db, checkpoint, attempts, len(page_courses))
+                    record_page_crawl(db, platform, checkpoint.page, page_courses)
+                    db.commit()
+            except Exception as e:
                 db.rollback()
                 logging.info("Transaction cancelled")
-                logging.error(f"Error processing course in: {course.target_url}")
-                raise HTTPException(status_code=500, detail="Error while processing data")
+                logging.error(f"Error processing page {checkpoint.page} of {platform}: {e}")
+                fail_page(db, checkpoint, attempts, e)
+                failed_pages.append(checkpoint.page)
+                continue
 
-        return {
-                "Success":courses_counter,
-                "Inserted_courses": all_courses_validated
-        }
+            inserted_courses.extend(page_courses)
+            completed_pages.append(checkpoint.page)
 
-    except Exception as exc:
-        raise HTTPException(status_code=500, detail="Error on the incoming data")
+        finish_job(db, job, last_page)
+    finally:
+        ## pages are committed one by one, so invalidate even after a partial scrape
+        if inserted_courses:
+            catalog_changed()
+
+    if failed_pages and not completed_pages:
+        raise HTTPException(status_code=404, detail="Error while processing data")
+
+    return {
+            "Success": len(inserted_courses),
+            "Inserted_courses": inserted_courses,
+            "Job_id": job.id,
+            "Completed_pages": completed_pages,
+            "Failed_pages": failed_pages
+    }
+
+@router.post("/import_courses",
+             status_code=status.HTTP_201_CREATED,
+             openapi_extra={"requestBody": {"required": True, "content": {
+                 "application/json": {"schema": {"type": "object", "description": "CoursesInput, or an array of CourseInput"}},
+                 "application/x-ndjson": {"schema": {"type": "string", "description": "One CourseInput per line"}},
+             }}})
+async def import_courses(db: db_dependancy, request: Request,
+                         batch_size: int = Query(IMPORT_BATCH_SIZE, gt=0, le=10000, description="Records committed at once")):
+    """
+    Imports courses scraped elsewhere (an offline scraper run, another environment)
+    without scraping. The body is read as it arrives and the records are validated
+    (`CourseInput`) and written in batches, so uploads of any size use the memory
+    of one batch. A course whose url is already in the catalog is updated.
 
-def get_or_create_difficulty(db: db_dependancy, difficulty_str: str) -> Course_difficulties:
+    - **Content-Type: application/x-ndjson**: one `CourseInput` per line.
+    - **Content-Type: application/json**: a `CoursesInput` object ({"courses": [...]}) or an array of `CourseInput`.
+    - **batch_size**: Records committed at once.
+
+    ### Returns
+
+    The number of records, of imported and of failed courses, and the errors
+    of the failed records with their index in the upload.
+
+    ### Raises
+
+    - **HTTPException(400, "Bad Request")**: If the JSON body cannot be parsed. The batches
+      before the error are kept; the detail has the same fields as the response.
     """
-    If the difficulty is not in
-    the database it creates it and
-    returns it.
 
-    :param db: The db dependancy
-    :type db: db_dependancy
-    :param difficulty_str: The difficulty extracted from the web scraping
-    :type difficulty_str: str
-    :return: A model object 
-    :rtype: Course_difficulties
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in NDJSON_CONTENT_TYPES:
+        records = iter_ndjson_records(request.stream())
+    else:
+        records = iter_json_records(request.stream())
+
+    result = await import_course_records(db, records, batch_size)
+    if result["Aborted"]:
+        raise HTTPException(status_code=400, detail=result)
+    return result
+
+@router.post("/enqueue_pages/{start_page}/{end_page}", status_code=status.HTTP_202_ACCEPTED)
+async def enqueue_pages_for_workers(db: db_dependancy,
+                        web_platform: str = Query(description="Type udemy or pluralsight"),
+                        start_page: int = Path(gt=0),
+                        end_page: int = Path(gt=0)):
     """
+    Queues a range of pages for the scrape workers (`scrape_worker.py`) instead
+    of scraping them inside the request. Pages that are already queued or being
+    scraped are not queued twice; pages that are done or failed are queued again.
 
-    difficulty = db.query(Course_difficulties).filter(Course_difficulties.difficulty == difficulty_str).first()
-    if not difficulty:
-        difficulty = Course_difficulties(difficulty=difficulty_str)
-        db.add(difficulty)
-        db.flush()
+    - **web_platform** either udemy or pluralsight
+    - **start_page**: the first page to queue
+    - **end_page**: the last page to queue (including)
 
-    return difficulty
+    ### Returns
 
-def get_or_create_author(db: db_dependancy, author_names: list) -> list[Authors]:
+    The number of pages that were queued
     """
-    Return a list of the author objects.
-    If an author doesnt exits in the database
-    it creates it
 
-    :param db: The db dependancy
-    :type db: db_dependancy
-    :param author_names: Authors extracted from the webscraping
-    :type author_names: list
-    :return: a list of authors object
-    :rtype: list[Authors]
+    platform = get_known_platform(web_platform)
+    if start_page > end_page:
+        raise HTTPException(status_code=422, detail="Starting page cannot be greater than ending page.")
+
+    queued = enqueue_pages(db, platform, list(range(start_page, end_page + 1)))
+    return {"Queued": queued, "Already_queued": end_page - start_page + 1 - queued}
+
+@router.get("/queue", status_code=status.HTTP_200_OK)
+async def get_queue_status(db: db_dependancy):
+    """
+    Returns the number of pages (and inserted courses) of the
+    scrape queue per platform and status (queued, claimed, done, failed).
     """
 
-    all_authors = []
-    for author in author_names:
-        cleaned = author.strip()
-        author_obj = db.query(Authors).filter(Authors.name == cleaned).first()
-        if not author_obj:
-            author_obj = Authors(name=cleaned)
-            db.add(author_obj)
-            db.flush()
+    return queue_stats(db)
 
-        all_authors.append(author_obj)
-    return all_authors
 
-def link_author_to_course(db: db_dependancy, author_id: int, course_id: int):
+@router.post("/recrawl/register_pages/{start_page}/{end_page}", status_code=status.HTTP_201_CREATED)
+async def register_recrawl_pages(db: db_dependancy,
+                        web_platform: str = Query(description="Type udemy or pluralsight"),
+                        start_page: int = Path(gt=0),
+                        end_page: int = Path(gt=0)):
     """
-    Creates a link between author and course
-    if it doenst exist
+    Adds a range of listing pages to the recrawl schedule of `recrawl_scheduler.py`.
+    New pages are due right away; pages that are already scheduled keep their history.
+
+    - **web_platform** either udemy or pluralsight
+    - **start_page**: the first page to schedule
+    - **end_page**: the last page to schedule (including)
+
+    ### Returns
 
-    :param db: The db dependancy
-    :type db: db_dependancy
-    :param author_id: The id of the author from the object
-    :type author_id: int
-    :param course_id: The id of the course fro the object
-    :type course_id: int
+    The number of pages that were added
     """
 
-    link = db.query(Authors_Courses).filter(Authors_Courses.author_id == author_id, Authors_Courses.course_id == course_id).first()
-    if not link:
-        link = Authors_Courses(author_id=author_id, course_id=course_id)
-        db.add(link)
-        db.flush()
+    platform = get_known_platform(web_platform)
+    if start_page > end_page:
+        raise HTTPException(status_code=422, detail="Starting page cannot be greater than ending page.")
+
+    added = register_pages(db, platform, list(range(start_page, end_page + 1)))
+    return {"Added": added, "Already_scheduled": end_page - start_page + 1 - added}
+
+@router.get("/recrawl", status_code=status.HTTP_200_OK)
+async def get_recrawl_status(db: db_dependancy):
+    """
+    Returns per platform the number of scheduled, never crawled, due and failing pages,
+    their average recrawl interval and change rate and the oldest crawl.
+    """
 
-    return link
+    return recrawl_stats(db)
 
-def create_course(db: db_dependancy, course_input: CourseInput, difficulty_id: int) -> Courses:
+@router.post("/enrich_courses", status_code=status.HTTP_200_OK)
+def enrich_courses_details(db: db_dependancy,
+                        web_platform: str = Query(None, description="Only the courses of udemy or pluralsight (all if not set)"),
+                        limit: int = Query(100, gt=0, le=5000, description="The maximum number of courses to enrich"),
+                        concurrency: int = Query(ENRICH_CONCURRENCY, gt=0, le=16, description="Detail pages loaded at once")):
     """
-    Creates a course
+    Scrapes the detail page of courses that were never enriched (or not recently,
+    see **ENRICH_MAX_AGE**) and stores their description and last update, and the
+    price, lectures and students when the course card did not have them.
+
+    - **web_platform** udemy or pluralsight (optional)
+    - **limit**: the maximum number of courses
+    - **concurrency**: the number of detail pages (and browsers) at once
+
+    ### Returns
 
-    :param db: The db depandancy
-    :type db: db_dependancy
-    :param course_input: The course object that has validated the data from the json
-    :type course_input: CourseInput
-    :param difficulty_id: The id of the difficulty (since it is a foreign key)
-    :type difficulty_id: int
-    :return: A model of type Courses
-    :rtype: Courses
+    The number of enriched courses and the ids of the courses that failed
     """
-    def safe_cast_int(value):
-        return int(value) if value is not None else None
 
-    def safe_cast_float(value):
-        return float(value) if value is not None else None
+    ## not async: the scraping blocks, so FastAPI runs this endpoint in its thread pool
+    platform = get_known_platform(web_platform) if web_platform else None
+
+    return enrich_courses(db, limit, concurrency, platform)
+
+@router.get("/platforms", status_code=status.HTTP_200_OK)
+async def get_platforms():
+    """
+    Returns the registered platforms with their categories (the first one is the default).
+    """
 
-    def parse_price(price_str: str) -> float:
-        if price_str is None:
-            return None
-        return float(price_str.replace("€", "").replace(",", "").strip())
+    from utils.web_scraper_scripts.platforms import get_platform, platform_names
 
-    def parse_students(students: str | int) -> int:
-        if isinstance(students, int):
-            return students
-        return int(students.replace(",", "").strip())
+    return [
+        {"platform": name, "categories": list(get_platform(name).categories)}
+        for name in platform_names()
+    ]
 
-    course = Courses(
-        name=course_input.title,
-        url=str(course_input.target_url),
-        duration=float(course_input.hours_required),
-        total_lectures=safe_cast_int(course_input.lectures_count),
-        rating=float(course_input.rating),
-        total_students=parse_students(course_input.total_students),
-        current_price=parse_price(course_input.current_price),
-        original_price=parse_price(course_input.original_price),
-        difficulty_id=difficulty_id
-    )
-
-    db.add(course)
-    db.flush()
+@router.post("/crawl_jobs", status_code=status.HTTP_202_ACCEPTED)
+async def start_crawl_job(db: db_dependancy, crawl: CrawlJobIn, background_tasks: BackgroundTasks):
+    """
+    Starts a crawl of several platforms and categories at once in the background.
+    The pages of all targets are scraped by **concurrency** threads (**CRAWL_CONCURRENCY**
+    by default), interleaved, within the browser limit of the process (**SCRAPE_MAX_BROWSERS**)
+    and the request rate of every host. Targets that were partly crawled before are resumed.
+    Overlapping page ranges of the same platform and category are merged into one target.
+
+    - **targets**: platform, category (see **GET /save_data/platforms**, the default one if not set), start_page and end_page
+    - **concurrency**: the number of pages scraped at once
+
+    ### Returns
+
+    The id of the crawl job, to follow with **GET /save_data/crawl_jobs/{job_id}**
+    """
+
+    from utils.web_scraper_scripts.platforms import get_platform
+
+    for target in crawl.targets:
+        target.platform = get_known_platform(target.platform)
+        if target.category is not None and target.category not in get_platform(target.platform).categories:
+            raise HTTPException(status_code=404, detail=f"Unknown category '{target.category}' of {target.platform}")
+        if target.start_page > target.end_page:
+            raise HTTPException(status_code=422, detail="Starting page cannot be greater than ending page.")
+    targets = merge_crawl_targets(crawl.targets)
+
+    try:
+        crawl_job = create_crawl_job(db, targets, crawl.concurrency or CRAWL_CONCURRENCY)
+    except Exception as e:
+        db.rollback()
+        logging.error(f"Crawl job could not be created: {e}")
+        raise HTTPException(status_code=500, detail="Error on the incoming data")
+
+    background_tasks.add_task(run_crawl_job, crawl_job.id)
+    return {"Job_id": crawl_job.id, "Targets": len(targets)}
+
+@router.get("/crawl_jobs/{job_id}", status_code=status.HTTP_200_OK)
+async def get_crawl_job(db: db_dependancy, job_id: int = Path(gt=0)):
+    """
+    Returns the status of a crawl job and the pages (pending, completed, failed)
+    and inserted courses of each of its targets.
+    """
 
-    return course
\ No newline at end of file
+    crawl_job = crawl_job_status(db, job_id)
+    if crawl_job is None:
+        raise HTTPException(status_code=404, detail=f"Crawl job {job_id} not found")
+    return crawl_job
@@ -0,0 +1,163 @@
+from enum import Enum
+from fastapi import HTTPException, Query
+from sqlalchemy import func, select
+from starlette import status
+from typing import Optional
+from models.authors import Authors
+from models.courses import Courses, Course_difficulties
+
+
+class CourseSortField(str, Enum):
+    """
+    The columns the courses can be sorted by. Each one
+    has a composite index (column, id) on the courses table.
+    """
+
+    rating = "rating"
+    total_students = "total_students"
+    current_price = "current_price"
+    duration = "duration"
+    created_at = "created_at"
+
+class SortOrder(str, Enum):
+    asc = "asc"
+    desc = "desc"
+
+class CourseFilters:
+    """
+    The optional course filters shared by every endpoint that
+    works on a filtered set of courses. Used as a dependency
+    (`Annotated[CourseFilters, Depends()]`), so every endpoint
+    exposes the same query parameters.
+    """
+
+    def __init__(
+        self,
+        id: Optional[int] = Query(None, gt=0, description="Filter by course ID."),
+        keyword: Optional[str] = Query(None, description="Search for a keyword in the course name (case-insensitive)."),
+        min_price: Optional[float] = Query(None, ge=0, description="Search for courses with a price greater than or equal to this value."),
+        max_price: Optional[float] = Query(None, le=1000, description="Search for courses with a price less than or equal to this value."),
+        rating: Optional[float] = Query(None, gt=0, le=5, description="Search for a course rating above the given value."),
+        difficulty: Optional[str] = Query(None, description="Filter by difficulty level."),
+        author_name: Optional[str] = Query(None, description="Filter by author name.")
+    ):
+        if min_price is not None and max_price is not None and min_price > max_price:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Minimum price cannot be greater than maximum price."
+            )
+        ## a filter is set when it is not None (is_empty and apply agree), so "" cannot be a value
+        for name, value in (("keyword", keyword), ("difficulty", difficulty), ("author_name", author_name)):
+            if value is not None and not value.strip():
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=f"The {name} filter cannot be empty."
+                )
+
+        self.id = id
+        self.keyword = keyword
+        self.min_price = min_price
+        self.max_price = max_price
+        self.rating = rating
+        self.difficulty = difficulty
+        self.author_name = author_name
+
+    def as_dict(self) -> dict:
+        """
+        :return: The filters as a dict (used for the cache keys)
+        :rtype: dict
+        """
+
+        return {
+            "id": self.id,
+            "keyword": self.keyword,
+            "min_price": self.min_price,
+            "max_price": self.max_price,
+            "rating": self.rating,
+            "difficulty": self.difficulty,
+            "author_name": self.author_name,
+        }
+
+    def is_empty(self) -> bool:
+        """
+        :return: True if no filter is set (`apply` adds a condition for every value that is not None)
+        :rtype: bool
+        """
+
+        return all(value is None for value in self.as_dict().values())
+
+    def apply(self, query):
+        """
+        Adds the filters that are set (not None) to a query on `Courses`.
+
+        :param query: A query that selects from `Courses` (e.g. `db.query(Courses.id)`)
+        :type query: Query
+        :return: The filtered query
+        :rtype: Query
+        """
+
+        if self.id is not None:
+            query = query.filter(Courses.id == self.id)
+
+        if self.keyword is not None:
+            search_term = f"%{self.keyword}%"
+            query = query.filter(Courses.name.ilike(search_term))
+
+        if self.min_price is not None:
+            query = query.filter(Courses.current_price >= self.min_price)
+
+        if self.max_price is not None:
+            query = query.filter(Courses.current_price <= self.max_price)
+
+        if self.rating is not None:
+            query = query.filter(Courses.rating >= self.rating)
+
+        ## Subqueries instead of joins: a course is never returned twice (e.g. for two
+        ## matching authors) and the (difficulty_id, ...) indexes can be used
+        if self.difficulty is not None:
+            search_difficulty_term = f"%{self.difficulty}%"
+            query = query.filter(Courses.difficulty_id.in_(
+                select(Course_difficulties.id).where(Course_difficulties.difficulty.ilike(search_difficulty_term))
+            ))
+
+        if self.author_name is not None:
+            search_author_term = f"%{self.author_name}%"
+            query = query.filter(Courses.authors.any(Authors.name.ilike(search_author_term)))
+
+        return query
+
+def apply_sorting(query, sort_by: CourseSortField, order: SortOrder, limit: Optional[int]):
+    """
+    Sorts a query on `Courses` by the given column (ties broken by id) and adds
+    a `position` column with the rank of each course. Courses without a value
+    in the column are left out.
+
+    The ORDER BY matches the (column, id) indexes, so with a limit PostgreSQL
+    reads the index in order and stops after `limit` rows.
+
+    :param query: A query that selects `Courses.id`
+    :type query: Query
+    :param sort_by: The column to sort by
+    :type sort_by: CourseSortField
+    :param order: asc or desc
+    :type order: SortOrder
+    :param limit: The maximum number of courses, all if None
+    :type limit: Optional[int]
+    :return: The sorted query, selecting `id` and `position`
+    :rtype: Query
+    """
+
+    column = getattr(Courses, sort_by.value)
+    if order == SortOrder.desc:
+        order_by = [column.desc(), Courses.id.desc()]
+    else:
+        order_by = [column.asc(), Courses.id.asc()]
+
+    query = (
+        query.add_columns(func.row_number().over(order_by=order_by).label("position"))
+        .filter(column.isnot(None))
+        .order_by(*order_by)
+    )
+    if limit:
+        query = query.limit(limit)
+    return query
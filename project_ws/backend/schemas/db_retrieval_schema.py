@@ -1,3 +1,4 @@
+from datetime import date, datetime
 from pydantic import BaseModel, HttpUrl
 from typing import List, Optional
 
@@ -53,7 +54,10 @@ class CourseOut(BaseModel):
     total_students: int
     current_price: Optional[float] = None
     original_price: Optional[float] = None
-    difficulty: DifficultyOut
+    description: Optional[str] = None
+    last_updated_at: Optional[date] = None
+    updated_at: Optional[datetime] = None
+    difficulty: Optional[DifficultyOut] = None  # null once its difficulty is deleted (ON DELETE SET NULL)
     authors: List[AuthorOut]
 
     class Config:
@@ -61,3 +65,137 @@ class CourseOut(BaseModel):
         Enables ORM mode for compatibility with ORM objects.
         """
         orm_mode = True
+
+class DifficultyStatsOut(BaseModel):
+    """
+    Aggregates of all courses with a given difficulty.
+    """
+
+    difficulty_id: int
+    difficulty: Optional[str] = None
+    course_count: int
+    avg_current_price: Optional[float] = None
+    avg_rating: Optional[float] = None
+    total_students: int
+
+class RatingBucketOut(BaseModel):
+    """
+    Number of courses whose rating falls in a bucket of width 0.5
+    (e.g. 4.5 contains the ratings from 4.5 up to 5.0 excluded).
+    """
+
+    rating_bucket: float
+    course_count: int
+
+class AuthorStatsOut(BaseModel):
+    """
+    Number of courses and total students (summed over the courses) of an author.
+    """
+
+    author_id: int
+    name: Optional[str] = None
+    course_count: int
+    total_students: int
+
+class PlatformStatsOut(BaseModel):
+    """
+    Aggregates of the courses of a platform (the host name of the course url).
+    """
+
+    platform: str
+    course_count: int
+    avg_rating: Optional[float] = None
+    avg_current_price: Optional[float] = None
+
+class CatalogStatsOut(BaseModel):
+    """
+    Represents the statistics of the whole catalog.
+
+    The values are read from materialized views that are refreshed after every
+    ingest, so they may lag a few seconds behind the latest write.
+    """
+
+    difficulties: List[DifficultyStatsOut]
+    rating_distribution: List[RatingBucketOut]
+    top_authors: List[AuthorStatsOut]
+    platforms: List[PlatformStatsOut]
+
+class FacetCountOut(BaseModel):
+    """
+    Number of filtered courses with a given value (a difficulty or a price bucket).
+    """
+
+    value: Optional[str] = None
+    count: int
+
+class RatingFacetOut(BaseModel):
+    """
+    Number of filtered courses in a rating bucket of width 0.5.
+    """
+
+    value: float
+    count: int
+
+class AuthorFacetOut(BaseModel):
+    """
+    Number of filtered courses of an author.
+    """
+
+    id: int
+    name: Optional[str] = None
+    count: int
+
+class CourseFacetsOut(BaseModel):
+    """
+    Represents the facet counts of a filtered set of courses.
+
+    Used by filter UIs to show how many courses each difficulty,
+    price bucket, rating bucket and author would return.
+    """
+
+    total: int
+    difficulties: List[FacetCountOut]
+    price_buckets: List[FacetCountOut]
+    rating_buckets: List[RatingFacetOut]
+    top_authors: List[AuthorFacetOut]
+
+class CourseIdsIn(BaseModel):
+    """
+    Represents the body of a batch lookup: a list of course ids.
+    """
+
+    ids: List[int]
+
+class CoursesByIdsOut(BaseModel):
+    """
+    Represents the result of a batch lookup.
+
+    The courses are returned in the requested order, the
+    ids that do not match any course are listed separately.
+    """
+
+    courses: List[CourseOut]
+    missing_ids: List[int]
+
+class CourseChangeOut(BaseModel):
+    """
+    Represents a change of a course in the change feed.
+
+    `course` is the current state of an inserted or updated course, None
+    for a deleted one (a tombstone with the id and the url of the course).
+    """
+
+    operation: str
+    course_id: int
+    url: Optional[str] = None
+    changed_at: datetime
+    course: Optional[CourseOut] = None
+
+class CourseChangesOut(BaseModel):
+    """
+    Represents a page of the change feed and the cursor to read the next one.
+    """
+
+    changes: List[CourseChangeOut]
+    cursor: str
+    has_more: bool
@@ -29,4 +29,25 @@ class CoursesInput(BaseModel):
     typically for bulk processing or storage. It contains a list of CourseInput objects.
     """
 
-    courses: List[CourseInput]
\ No newline at end of file
+    courses: List[CourseInput]
+
+
+class CrawlTargetIn(BaseModel):
+    """
+    A listing to crawl: a platform, one of its categories (the default
+    one if not set) and a range of pages.
+    """
+
+    platform: str
+    category: Optional[str] = None
+    start_page: int = Field(gt=0)
+    end_page: int = Field(gt=0)
+
+class CrawlJobIn(BaseModel):
+    """
+    The targets of a crawl job, crawled concurrently, and the number
+    of pages scraped at once over all of them.
+    """
+
+    targets: List[CrawlTargetIn] = Field(min_length=1, max_length=50)
+    concurrency: Optional[int] = Field(None, gt=0, le=16)
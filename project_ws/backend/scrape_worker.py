@@ -0,0 +1,184 @@
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from db.db_config import SessionLocal
+from db.course_ingestion import insert_scraped_courses
+from db.recrawl import record_page_crawl
+from db.scrape_queue import claim_page, heartbeat, complete_page, fail_page, requeue_expired
+from utils.metrics import scrape_context, time_stage, start_metrics_server
+from utils.logger import logger_setup
+import logging
+
+## Scrape worker: claims pages from the scrape_queue table, scrapes them and inserts their
+## courses. Any number of workers can run on any number of hosts against the same database.
+##
+##   python scrape_worker.py --processes 4
+##   python scrape_worker.py --processes 2 --exit-when-empty
+##   python scrape_worker.py --processes 4 --metrics-port 9101   (GET /metrics on ports 9101 to 9104)
+
+SCRAPE_LEASE_SECONDS = float(os.getenv("SCRAPE_LEASE_SECONDS", "300"))
+SCRAPE_MAX_ATTEMPTS = int(os.getenv("SCRAPE_MAX_ATTEMPTS", "3"))
+SCRAPE_QUEUE_RETRY_DELAY = float(os.getenv("SCRAPE_QUEUE_RETRY_DELAY", "60"))  # seconds, doubled per attempt
+SCRAPE_IDLE_SLEEP = float(os.getenv("SCRAPE_IDLE_SLEEP", "5"))  # seconds between polls of an empty queue
+SCRAPE_METRICS_PORT = int(os.getenv("SCRAPE_METRICS_PORT", "0"))  # first metrics port, 0 for no metrics server
+
+class LeaseKeeper:
+    """
+    Renews the lease of the claimed page in a background thread every
+    third of the lease, with its own session, while the page is scraped.
+    """
+
+    def __init__(self, item_id: int, worker: str, lease: float):
+        self.item_id = item_id
+        self.worker = worker
+        self.lease = lease
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        db = SessionLocal()
+        try:
+            while not self._stop.wait(self.lease / 3):
+                try:
+                    if not heartbeat(db, self.item_id, self.worker, self.lease):
+                        logging.warning(f"{self.worker} lost the lease of queue item {self.item_id}")
+                        self.lost.set()
+                        return
+                except Exception as e:
+                    db.rollback()
+                    logging.warning(f"Heartbeat of queue item {self.item_id} failed: {e}")
+        finally:
+            db.close()
+
+    def __enter__(self) -> "LeaseKeeper":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+def process_page(db, item: dict, worker: str, lease: float, max_attempts: int, retry_delay: float, scrape) -> bool:
+    """
+    Scrapes a claimed page and inserts its courses in the same transaction
+    that marks the page done. A failed page is queued again or marked failed.
+
+    :return: True if the page is done
+    :rtype: bool
+    """
+
+    platform, page = item["platform"], item["page"]
+    try:
+        with LeaseKeeper(item["id"], worker, lease) as keeper:
+            scraped, _ = scrape(platform, page)
+        if keeper.lost.is_set():
+            ## another worker may already have the page, do not insert it twice
+            logging.warning(f"Dropping page {page} of {platform}: the lease expired while scraping")
+            return False
+
+        with scrape_context(platform, page), time_stage("db_write"):
+            courses = insert_scraped_courses(db, scraped)
+            record_page_crawl(db, platform, page, courses)
+            if not complete_page(db, item["id"], worker, len(courses)):
+                db.rollback()
+                logging.warning(f"Dropping page {page} of {platform}: the lease expired before the commit")
+                return False
+            db.commit()
+    except Exception as e:
+        db.rollback()
+        status = fail_page(db, item["id"], worker, e, max_attempts, retry_delay)
+        logging.error(f"Page {page} of {platform} failed (attempt {item['attempts']}, now {status}): {e}")
+        return False
+
+    ## the commit bumped the catalog version (triggers): the API refreshes its cache, the statistics
+    ## views and the reference snapshot when it reads it, not every worker after every page
+    logging.info(f"{worker} inserted {len(courses)} courses from page {page} of {platform}")
+    return True
+
+def run_worker(worker: str, lease: float = SCRAPE_LEASE_SECONDS, max_attempts: int = SCRAPE_MAX_ATTEMPTS,
+               retry_delay: float = SCRAPE_QUEUE_RETRY_DELAY, idle_sleep: float = SCRAPE_IDLE_SLEEP,
+               exit_when_empty: bool = False, scrape=None) -> int:
+    """
+    Claims and processes pages until stopped (SIGTERM or SIGINT finish the
+    current page first), or until the queue is empty with `exit_when_empty`.
+
+    :param worker: The id of the worker, stored with the claimed pages
+    :type worker: str
+    :param scrape: The function scraping a page, `scrape_page` of multiple_pages_scraper by default
+    :return: The number of pages done
+    :rtype: int
+    """
+
+    if scrape is None:
+        from utils.web_scraper_scripts.multiple_pages_scraper import scrape_page
+        from utils.browser_supervisor import supervisor
+        supervisor.start() ## reaps the browsers of dead workers before scraping
+        scrape = scrape_page
+
+    stopping = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stopping.set())
+
+    done = 0
+    db = SessionLocal()
+    try:
+        while not stopping.is_set():
+            expired = requeue_expired(db, max_attempts)
+            if expired:
+                logging.warning(f"{worker} requeued {expired} pages with an expired lease")
+
+            item = claim_page(db, worker, lease)
+            if item is None:
+                if exit_when_empty:
+                    break
+                stopping.wait(idle_sleep)
+                continue
+
+            if process_page(db, item, worker, lease, max_attempts, retry_delay, scrape):
+                done += 1
+    finally:
+        db.close()
+
+    logging.info(f"{worker} stopped after {done} pages")
+    return done
+
+def _worker_process(index: int, args):
+    if args.metrics_port:
+        ## the metrics are per process: the worker `index` serves them on the port after the one of `index - 1`
+        start_metrics_server(args.metrics_port + index)
+    run_worker(f"{socket.gethostname()}:{os.getpid()}:{index}", args.lease, args.max_attempts,
+               args.retry_delay, args.idle_sleep, args.exit_when_empty)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Claims pages from the scrape queue, scrapes them and inserts their courses.")
+    parser.add_argument("--processes", type=int, default=1, help="Worker processes on this host (one browser each)")
+    parser.add_argument("--lease", type=float, default=SCRAPE_LEASE_SECONDS, help="Lease of a claimed page in seconds")
+    parser.add_argument("--max-attempts", type=int, default=SCRAPE_MAX_ATTEMPTS)
+    parser.add_argument("--retry-delay", type=float, default=SCRAPE_QUEUE_RETRY_DELAY,
+                        help="Delay before a failed page is retried in seconds (doubled per attempt)")
+    parser.add_argument("--idle-sleep", type=float, default=SCRAPE_IDLE_SLEEP)
+    parser.add_argument("--exit-when-empty", action="store_true", help="Stops when there is no page left to claim")
+    parser.add_argument("--metrics-port", type=int, default=SCRAPE_METRICS_PORT,
+                        help="Serves GET /metrics of worker i on this port + i (browsers, stages), off if 0")
+    args = parser.parse_args()
+
+    ## the rates per host are shared by the processes of this host (see utils/politeness.py); set
+    ## before any import of the scraper, and inherited by the spawned processes
+    os.environ.setdefault("SCRAPE_RATE_PROCESSES", str(args.processes))
+
+    if args.processes == 1:
+        _worker_process(0, args)
+    else:
+        ## spawn: every process opens its own database connections
+        context = multiprocessing.get_context("spawn")
+        processes = [context.Process(target=_worker_process, args=(i, args)) for i in range(args.processes)]
+        for process in processes:
+            process.start()
+        signal.signal(signal.SIGTERM, lambda *_: [p.terminate() for p in processes])
+        for process in processes:
+            process.join()
@@ -0,0 +1,377 @@
+import atexit
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+import psutil
+from .metrics import Counter, Gauge
+from .logger import logger_setup
+import logging
+
+## Every browser is started with its own profile directory (--user-data-dir) under BROWSER_PROFILE_ROOT.
+## The directory is the marker of the browser: it holds the pids of the process tree and of the
+## process that owns it, so the Chrome and chromedriver processes of a crashed scrape (or of a dead
+## worker process) can be found and killed later, by any process on the same host.
+BROWSER_PROFILE_ROOT = os.getenv("BROWSER_PROFILE_ROOT", os.path.join(tempfile.gettempdir(), "web_scraper_browsers"))
+
+## RSS ceiling of one browser (chromedriver, Chrome and all its renderer processes), in MB
+BROWSER_MAX_RSS_MB = float(os.getenv("BROWSER_MAX_RSS_MB", "1024"))
+
+## Browsers running at once in this process, shared by every scrape (insert_courses, crawl jobs,
+## enrichment, ...): a scrape that needs one more browser waits for a free slot
+SCRAPE_MAX_BROWSERS = int(os.getenv("SCRAPE_MAX_BROWSERS", "4"))
+
+## A browser older than this is considered hung and recycled (seconds)
+BROWSER_MAX_AGE = float(os.getenv("BROWSER_MAX_AGE", "600"))
+
+## Seconds between two memory checks of the live browsers / two scans for orphaned browsers
+BROWSER_MONITOR_INTERVAL = float(os.getenv("BROWSER_MONITOR_INTERVAL", "5"))
+BROWSER_REAP_INTERVAL = float(os.getenv("BROWSER_REAP_INTERVAL", "300"))
+
+MARKER_FILE = "supervisor.json"
+PROFILE_PREFIX = "scraper-"
+
+LIVE_BROWSERS = Gauge(
+    "scraper_browsers_live",
+    "Browsers started by this process that are still running."
+)
+
+BROWSERS_RSS = Gauge(
+    "scraper_browsers_rss_bytes",
+    "Resident memory of the browsers of this process (chromedriver, Chrome and its child processes)."
+)
+
+BROWSER_RECYCLES = Counter(
+    "scraper_browser_recycles_total",
+    "Browsers killed by the supervisor before the end of their scrape.",
+    ("reason",)
+)
+
+ORPHANS_REAPED = Counter(
+    "scraper_browser_orphans_reaped_total",
+    "Processes of orphaned browsers (whose owner or scrape is gone) killed by the supervisor."
+)
+
+class BrowserRecycled(Exception):
+    """
+    Raised by `BrowserSupervisor.check` when the browser was killed
+    because it went over the RSS ceiling or the maximum age.
+    """
+    pass
+
+def _process(pid: Optional[int], create_time: Optional[float] = None) -> Optional[psutil.Process]:
+    """
+    :return: The process, None if it is gone or if the pid was reused by another process
+    """
+
+    if not pid:
+        return None
+    try:
+        process = psutil.Process(pid)
+        if create_time is not None and abs(process.create_time() - create_time) > 1:
+            return None
+        return process
+    except psutil.Error:
+        return None
+
+def _tree(processes: list[psutil.Process]) -> list[psutil.Process]:
+    tree = {}
+    for process in processes:
+        tree[process.pid] = process
+        try:
+            for child in process.children(recursive=True):
+                tree[child.pid] = child
+        except psutil.Error:
+            continue
+    return list(tree.values())
+
+def _kill(processes: list[psutil.Process], timeout: float = 3) -> int:
+    """
+    Terminates processes, and kills the ones still running after `timeout`.
+
+    :return: The number of processes that were running
+    :rtype: int
+    """
+
+    running = []
+    for process in processes:
+        try:
+            process.terminate()
+            running.append(process)
+        except psutil.Error:
+            continue
+    _, alive = psutil.wait_procs(running, timeout=timeout)
+    for process in alive:
+        try:
+            process.kill()
+        except psutil.Error:
+            continue
+    return len(running)
+
+class BrowserHandle:
+    """
+    A browser started by the supervisor: its driver, its profile directory
+    (the marker) and the pids of chromedriver and Chrome.
+    """
+
+    def __init__(self, profile_dir: str):
+        self.profile_dir = profile_dir
+        self.driver = None
+        self.pids = {}  # pid -> create time
+        self.started_at = time.monotonic()
+        self.recycled = None  # reason, once killed by the supervisor
+        self.released = False
+
+    def processes(self) -> list[psutil.Process]:
+        """
+        :return: chromedriver and Chrome with all their child processes
+        :rtype: list[psutil.Process]
+        """
+
+        roots = [_process(pid, create_time) for pid, create_time in self.pids.items()]
+        return _tree([process for process in roots if process is not None])
+
+    def rss(self) -> int:
+        total = 0
+        for process in self.processes():
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                continue
+        return total
+
+class BrowserSupervisor:
+    """
+    Starts and stops the browsers of the scrapers and keeps them in check:
+    a monitor thread kills a browser that goes over the RSS ceiling or the
+    maximum age (its scrape fails and is retried with a new browser), and
+    orphaned browsers are reaped when the supervisor starts and then on a
+    schedule. Both threads start with the first browser.
+    """
+
+    def __init__(self, root: str = BROWSER_PROFILE_ROOT, max_rss_mb: float = BROWSER_MAX_RSS_MB,
+                 max_age: float = BROWSER_MAX_AGE, monitor_interval: float = BROWSER_MONITOR_INTERVAL,
+                 reap_interval: float = BROWSER_REAP_INTERVAL, max_browsers: int = SCRAPE_MAX_BROWSERS):
+        self.root = root
+        self.max_browsers = max_browsers
+        self._slots = threading.BoundedSemaphore(max_browsers)
+        self.max_rss = max_rss_mb * 1024 * 1024
+        self.max_age = max_age
+        self.monitor_interval = monitor_interval
+        self.reap_interval = reap_interval
+        self._handles: dict[str, BrowserHandle] = {}
+        self._lock = threading.Lock()
+        self._started = False
+        self._stop = threading.Event()
+
+    def start(self):
+        """
+        Reaps the orphans left by earlier runs and starts the monitor
+        and the reaper threads (once).
+        """
+
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        os.makedirs(self.root, exist_ok=True)
+        self.reap_orphans()
+        self.enforce_limits()
+        threading.Thread(target=self._monitor_loop, name="browser-monitor", daemon=True).start()
+        threading.Thread(target=self._reap_loop, name="browser-reaper", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        for handle in list(self._handles.values()):
+            self.release(handle)
+
+    def acquire(self, launch: Callable[[str], object]) -> BrowserHandle:
+        """
+        Starts a browser with a new profile directory and tracks its processes.
+        Waits while `max_browsers` browsers are running.
+
+        :param launch: Starts the driver with the given user data directory, e.g. `setup_driver`
+        :type launch: Callable[[str], WebDriver]
+        :return: The handle of the browser, to give back with `release`
+        :rtype: BrowserHandle
+        """
+
+        self.start()
+        self._slots.acquire()
+        profile_dir = os.path.join(self.root, f"{PROFILE_PREFIX}{os.getpid()}-{uuid.uuid4().hex[:12]}")
+        handle = BrowserHandle(profile_dir)
+        with self._lock:
+            self._handles[profile_dir] = handle
+
+        try:
+            os.makedirs(profile_dir)
+            self._write_marker(handle)
+            handle.driver = launch(profile_dir)
+        except Exception:
+            ## chromedriver may be running even if Chrome did not start (release frees the slot)
+            self.release(handle)
+            raise
+
+        for pid in (getattr(getattr(getattr(handle.driver, "service", None), "process", None), "pid", None),
+                    getattr(handle.driver, "browser_pid", None)):
+            process = _process(pid)
+            if process is not None:
+                handle.pids[pid] = process.create_time()
+        self._write_marker(handle)
+        self._update_metrics()
+        return handle
+
+    def release(self, handle: BrowserHandle):
+        """
+        Quits the driver, kills whatever is left of its process tree and removes
+        its profile directory. Safe to call more than once.
+        """
+
+        with self._lock:
+            if handle.released:
+                return
+            handle.released = True
+            self._handles.pop(handle.profile_dir, None)
+
+        processes = handle.processes()
+        if handle.driver is not None:
+            try:
+                handle.driver.quit()
+            except Exception as e:
+                logging.warning(f"driver.quit() failed for {handle.profile_dir}: {e}")
+        ## Chrome is started detached, quitting the driver does not always stop all its processes
+        _kill([process for process in processes if process.is_running()], timeout=3)
+        _kill(self._marked_processes(handle.profile_dir), timeout=3)
+        shutil.rmtree(handle.profile_dir, ignore_errors=True)
+        self._slots.release()
+        self._update_metrics()
+
+    def check(self, handle: BrowserHandle):
+        """
+        :raises BrowserRecycled: If the monitor killed the browser
+        """
+
+        if handle.recycled:
+            raise BrowserRecycled(f"Browser recycled: {handle.recycled}")
+
+    def recycle(self, handle: BrowserHandle, reason: str):
+        """
+        Kills the process tree of a browser that is still in use: the scrape
+        using it fails (and is retried by the caller with a new browser).
+        """
+
+        handle.recycled = reason
+        BROWSER_RECYCLES.inc(reason=reason)
+        logging.warning(f"Recycling browser {handle.profile_dir}: {reason}")
+        _kill(handle.processes(), timeout=3)
+
+    def enforce_limits(self):
+        """
+        Recycles the browsers that are over the RSS ceiling or the maximum age
+        and updates the browser metrics.
+        """
+
+        total = 0
+        now = time.monotonic()
+        for handle in list(self._handles.values()):
+            if handle.recycled or handle.driver is None:
+                continue
+            rss = handle.rss()
+            total += rss
+            if rss > self.max_rss:
+                self.recycle(handle, "memory")
+            elif now - handle.started_at > self.max_age:
+                self.recycle(handle, "max_age")
+        LIVE_BROWSERS.set(len(self._handles))
+        BROWSERS_RSS.set(total)
+
+    def reap_orphans(self) -> int:
+        """
+        Kills the browsers whose owner process is gone, and removes their profile
+        directories. Browsers of other live processes are left alone.
+
+        :return: The number of killed processes
+        :rtype: int
+        """
+
+        if not os.path.isdir(self.root):
+            return 0
+
+        killed = 0
+        for name in os.listdir(self.root):
+            profile_dir = os.path.join(self.root, name)
+            if not name.startswith(PROFILE_PREFIX) or profile_dir in self._handles:
+                continue
+            marker = self._read_marker(profile_dir)
+            if marker is None:
+                continue
+            ## the create time tells a live owner from a new process with a reused pid (e.g. pid 1 after a restart)
+            if _process(marker["owner_pid"], marker["owner_create_time"]) is not None:
+                continue
+
+            roots = [_process(int(pid), create_time) for pid, create_time in marker.get("pids", {}).items()]
+            processes = _tree([process for process in roots if process is not None])
+            processes += [process for process in self._marked_processes(profile_dir)
+                          if process.pid not in {p.pid for p in processes}]
+            killed += _kill(processes)
+            shutil.rmtree(profile_dir, ignore_errors=True)
+            logging.warning(f"Reaped orphaned browser {profile_dir} ({len(processes)} processes)")
+
+        if killed:
+            ORPHANS_REAPED.inc(killed)
+        return killed
+
+    def _marked_processes(self, profile_dir: str) -> list[psutil.Process]:
+        """
+        :return: The processes started with this profile directory (Chrome and its child processes)
+        """
+
+        marker = f"--user-data-dir={profile_dir}"
+        processes = []
+        for process in psutil.process_iter(["cmdline"]):
+            try:
+                if marker in (process.info["cmdline"] or []):
+                    processes.append(process)
+            except psutil.Error:
+                continue
+        return processes
+
+    def _write_marker(self, handle: BrowserHandle):
+        owner = psutil.Process()
+        marker = {"owner_pid": owner.pid, "owner_create_time": owner.create_time(),
+                  "pids": {str(pid): create_time for pid, create_time in handle.pids.items()}}
+        with open(os.path.join(handle.profile_dir, MARKER_FILE), "w") as f:
+            json.dump(marker, f)
+
+    def _read_marker(self, profile_dir: str) -> Optional[dict]:
+        try:
+            with open(os.path.join(profile_dir, MARKER_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _update_metrics(self):
+        LIVE_BROWSERS.set(len(self._handles))
+
+    def _monitor_loop(self):
+        while not self._stop.wait(self.monitor_interval):
+            try:
+                self.enforce_limits()
+            except Exception as e:
+                logging.error(f"Browser monitor failed: {e}")
+
+    def _reap_loop(self):
+        while not self._stop.wait(self.reap_interval):
+            try:
+                self.reap_orphans()
+            except Exception as e:
+                logging.error(f"Browser reaper failed: {e}")
+
+supervisor = BrowserSupervisor()
+
+## no browser outlives the process on a normal exit
+atexit.register(supervisor.stop)
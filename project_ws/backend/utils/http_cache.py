@@ -0,0 +1,110 @@
+import gzip
+import hashlib
+from fastapi import Request, Response
+
+## Bodies smaller than this are not worth compressing
+GZIP_MINIMUM_SIZE = 1024
+GZIP_COMPRESS_LEVEL = 6
+GZIP_MAGIC = b"\x1f\x8b"  ## a JSON document never starts with these bytes
+
+## The ETags are weak (W/"..."): the same JSON is sent gzipped or not depending on the
+## Accept-Encoding of the client, and a strong ETag must differ between two encodings
+
+def make_etag(cache_key: str) -> str:
+    """
+    Builds a weak ETag from a response cache key. The key already
+    contains the catalog data version and the normalized query parameters,
+    so the ETag changes exactly when the response body can change.
+
+    :param cache_key: Key built with `response_cache.make_key`
+    :type cache_key: str
+    :return: The ETag
+    :rtype: str
+    """
+
+    return 'W/"' + hashlib.sha1(cache_key.encode("utf-8")).hexdigest() + '"'
+
+def body_etag(body: bytes) -> str:
+    """
+    Builds a weak ETag from the content of a body, for the responses
+    that are not built from a cache key (e.g. the reference snapshot).
+
+    :param body: The serialized JSON, before compression
+    :type body: bytes
+    :return: The ETag
+    :rtype: str
+    """
+
+    return 'W/"' + hashlib.sha1(body).hexdigest() + '"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Checks the `If-None-Match` header of the request against the ETag.
+
+    :param request: The incoming request
+    :type request: Request
+    :param etag: The current ETag of the resource
+    :type etag: str
+    :return: True if the client already has the current version
+    :rtype: bool
+    """
+
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    ## If-None-Match uses the weak comparison: W/ is ignored on both sides
+    etag = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        if candidate.strip().removeprefix("W/") == etag:
+            return True
+    return False
+
+def not_modified(etag: str) -> Response:
+    """
+    :return: An empty 304 response for the given ETag
+    :rtype: Response
+    """
+
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+def compress_body(body: bytes) -> bytes:
+    """
+    Gzips the body if it is large enough, so that it is compressed once
+    when it is cached instead of once per response.
+
+    :param body: The serialized JSON
+    :type body: bytes
+    :return: The gzipped body, or the body itself if it is small
+    :rtype: bytes
+    """
+
+    if len(body) < GZIP_MINIMUM_SIZE:
+        return body
+    return gzip.compress(body, compresslevel=GZIP_COMPRESS_LEVEL)
+
+def json_response(request: Request, body: bytes, etag: str) -> Response:
+    """
+    Returns the JSON body with its ETag. A gzipped body (see `compress_body`)
+    is sent as it is to clients that accept gzip and decompressed for the others.
+
+    :param request: The incoming request
+    :type request: Request
+    :param body: The serialized JSON, gzipped or not
+    :type body: bytes
+    :param etag: The ETag of the body
+    :type etag: str
+    :rtype: Response
+    """
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if body[:2] == GZIP_MAGIC:
+        if "gzip" in request.headers.get("accept-encoding", "").lower():
+            headers["Content-Encoding"] = "gzip"
+            headers["Vary"] = "Accept-Encoding"
+        else:
+            body = gzip.decompress(body)
+
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,6 +1,101 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
+import time
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="[%(levelname)s] %(message)s"
-)
+## LOG_LEVEL: the minimum level that is logged (e.g. DEBUG to see every scraped card)
+## LOG_FORMAT: "json" (one JSON object per line) or "text"
+## LOG_SAMPLE_RATES: fraction of the records kept per event, e.g. "card_extracted=0.01,sampled_query=0.1"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+
+def _parse_sample_rates(value: str) -> dict[str, float]:
+    rates = {}
+    for item in value.split(","):
+        if "=" in item:
+            event, rate = item.split("=", 1)
+            rates[event.strip()] = float(rate)
+    return rates
+
+LOG_SAMPLE_RATES = _parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+
+## Attributes every LogRecord has, anything else was passed with `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as one JSON object per line, with the fields
+    passed in `extra` (e.g. by `log_event`) as top level keys.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts the records in the queue as they are. The default QueueHandler formats
+    the message in the calling thread; here it is formatted by the listener thread,
+    so the caller only pays for creating the record.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+def _setup() -> logging.handlers.QueueListener:
+    output = logging.StreamHandler()
+    if LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("[%(levelname)s] %(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(LazyQueueHandler(log_queue))
+    root.setLevel(LOG_LEVEL)
+
+    ## The listener thread is the only one writing to the stream
+    listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+_listener = _setup()
+
+def log_event(level: int, event: str, msg: str, *args, **fields):
+    """
+    Logs a named event with structured fields. Meant for the hot paths:
+    nothing is built when the level is disabled, a fraction of the records
+    is dropped according to LOG_SAMPLE_RATES, and the message is only
+    formatted (with `args`, %-style) by the listener thread.
+
+    :param level: The logging level, e.g. logging.DEBUG
+    :type level: int
+    :param event: The name of the event, used for sampling and as the "event" field
+    :type event: str
+    :param msg: The message, with %-style placeholders for `args`
+    :type msg: str
+    """
+
+    if not logging.getLogger().isEnabledFor(level):
+        return
+    rate = LOG_SAMPLE_RATES.get(event, 1.0)
+    if rate < 1.0 and random.random() >= rate:
+        return
+    logging.log(level, msg, *args, extra={"event": event, **fields})
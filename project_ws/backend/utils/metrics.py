@@ -0,0 +1,228 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+## Metrics are kept per process, every uvicorn worker exposes its own values
+_registry = []
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escaped = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        escaped.append(f'{name}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+class Metric:
+    """
+    Base class of the metrics. Every metric registers itself
+    and has one value per combination of label values.
+    """
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects the labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def values(self) -> dict:
+        """
+        :return: A copy of the current values, keyed on the label values
+            (a histogram value is a tuple of the cumulative bucket counts and the sum)
+        :rtype: dict
+        """
+
+        with self._lock:
+            return {key: (list(value[0]), value[1]) if isinstance(value, tuple) else value
+                    for key, value in self._values.items()}
+
+    def _samples(self):
+        """
+        :return: (suffix, labels, value) of every sample of the metric
+        """
+
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield "", dict(zip(self.labelnames, key)), value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for suffix, labels, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines)
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    type_name = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60)
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Observes the duration of the `with` block in seconds (also when it raises).
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        with self._lock:
+            items = [(key, (list(counts), total)) for key, (counts, total) in self._values.items()]
+        for key, (counts, total) in items:
+            labels = dict(zip(self.labelnames, key))
+            for bound, count in zip(self.buckets, counts):
+                yield "_bucket", {**labels, "le": _format_value(bound)}, count
+            yield "_sum", labels, total
+            yield "_count", labels, counts[-1]
+
+def render_metrics() -> str:
+    """
+    :return: All registered metrics in the Prometheus text format
+    :rtype: str
+    """
+
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass ## scrapes every few seconds, not worth a log line
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """
+    Serves GET /metrics of this process in a background thread, for the
+    processes that do not run the API (scrape workers, recrawl scheduler).
+
+    :param port: The port to listen on
+    :type port: int
+    :param host: The address to listen on
+    :type host: str
+    :return: The running server
+    :rtype: ThreadingHTTPServer
+    """
+
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-server").start()
+    return server
+
+## Scraping pipeline metrics
+
+SCRAPE_STAGE_SECONDS = Histogram(
+    "scraper_stage_duration_seconds",
+    "Duration of the stages of the scraping pipeline.",
+    ("platform", "page", "stage")
+)
+
+EXTRACTION_FAILURES = Counter(
+    "scraper_extraction_failures_total",
+    "Course card fields that could not be extracted, by exception class.",
+    ("platform", "error")
+)
+
+## Platform and page of the scrape running in the current thread/task
+_scrape_labels = ContextVar("scrape_labels", default={"platform": "unknown", "page": "unknown"})
+
+@contextmanager
+def scrape_context(platform: str, page):
+    """
+    Sets the platform and page labels of every stage
+    timed inside the `with` block.
+
+    :param platform: The platform being scraped (udemy or pluralsight)
+    :type platform: str
+    :param page: The page being scraped
+    :type page: int | str
+    """
+
+    token = _scrape_labels.set({"platform": str(platform).lower().strip(), "page": str(page)})
+    try:
+        yield
+    finally:
+        _scrape_labels.reset(token)
+
+def time_stage(stage: str):
+    """
+    Times a stage of the scraping pipeline, labeled with
+    the platform and page of the current scrape context.
+
+    :param stage: The name of the stage, e.g. "page_load"
+    :type stage: str
+    """
+
+    return SCRAPE_STAGE_SECONDS.time(stage=stage, **_scrape_labels.get())
+
+def count_extraction_failure(error: Exception):
+    """
+    Counts a failed field extraction by the class of the exception.
+    """
+
+    EXTRACTION_FAILURES.inc(platform=_scrape_labels.get()["platform"], error=type(error).__name__)
@@ -0,0 +1,155 @@
+import os
+import random
+import threading
+import time
+from urllib.parse import urlparse
+from .metrics import Counter, Gauge
+from .logger import logger_setup
+import logging
+
+## Initial request rate per host (requests per second), e.g. "www.udemy.com=0.5,www.pluralsight.com=0.2"
+## Hosts that are not listed start at SCRAPE_DEFAULT_RATE
+SCRAPE_RATE_LIMITS = os.getenv("SCRAPE_RATE_LIMITS", "")
+SCRAPE_DEFAULT_RATE = float(os.getenv("SCRAPE_DEFAULT_RATE", "0.5"))
+
+## The adaptive rate stays between these bounds (requests per second)
+SCRAPE_MIN_RATE = float(os.getenv("SCRAPE_MIN_RATE", "0.05"))
+SCRAPE_MAX_RATE = float(os.getenv("SCRAPE_MAX_RATE", "2"))
+
+## Requests that can be sent at once after an idle period
+SCRAPE_BURST = int(os.getenv("SCRAPE_BURST", "1"))
+
+## Random delay (0 to SCRAPE_JITTER seconds) added to every request, so the requests are not evenly spaced
+SCRAPE_JITTER = float(os.getenv("SCRAPE_JITTER", "1.0"))
+
+## Additive increase after a successful page, multiplicative decrease after a block signal
+SCRAPE_RATE_INCREASE = float(os.getenv("SCRAPE_RATE_INCREASE", "0.02"))
+SCRAPE_RATE_DECREASE = float(os.getenv("SCRAPE_RATE_DECREASE", "0.5"))
+
+## The buckets live in the memory of each process, so every process scraping the same hosts
+## (the scrape worker processes of every machine, and the API running crawl jobs) sends its own
+## share of requests. The rates above are for all of them together: each process uses
+## 1 / SCRAPE_RATE_PROCESSES of them. scrape_worker.py sets it to its --processes when it is not set,
+## which is right for a single machine; set it to the total number of processes otherwise.
+SCRAPE_RATE_PROCESSES = max(1, int(os.getenv("SCRAPE_RATE_PROCESSES", "1")))
+
+HOST_RATE = Gauge(
+    "scraper_host_rate",
+    "Current allowed request rate per host of this process (requests per second).",
+    ("host",)
+)
+
+THROTTLE_EVENTS = Counter(
+    "scraper_throttle_events_total",
+    "Block signals (timeouts, pages without course cards, ...) that lowered the rate of a host.",
+    ("host", "reason")
+)
+
+def _parse_rates(value: str) -> dict[str, float]:
+    rates = {}
+    for item in value.split(","):
+        if "=" in item:
+            host, rate = item.rsplit("=", 1)
+            rates[host.strip().lower()] = float(rate)
+    return rates
+
+class HostThrottle:
+    """
+    A token bucket for one host whose rate adapts (AIMD): it grows slowly
+    while pages load fine and is cut when the host shows signs of blocking,
+    so it settles near the highest rate that is not blocked.
+
+    :param host: The host name, used for the metrics
+    :type host: str
+    :param rate: The initial rate in requests per second
+    :type rate: float
+    :param share: The part of the rates (and of their bounds and increase) used by this process
+    :type share: float
+    """
+
+    def __init__(self, host: str, rate: float, share: float = 1.0):
+        self.host = host
+        self.min_rate = SCRAPE_MIN_RATE * share
+        self.max_rate = SCRAPE_MAX_RATE * share
+        self.increase = SCRAPE_RATE_INCREASE * share
+        self.rate = min(self.max_rate, max(self.min_rate, rate * share))
+        self.capacity = max(1, SCRAPE_BURST)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+        HOST_RATE.set(self.rate, host=host)
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self) -> float:
+        """
+        Waits for a token. Callers are served in the order they take the lock,
+        a token is reserved before sleeping so concurrent callers are spaced out.
+
+        :return: The time waited in seconds
+        :rtype: float
+        """
+
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+        wait += random.uniform(0, SCRAPE_JITTER) if SCRAPE_JITTER else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+        HOST_RATE.set(self.rate, host=self.host)
+
+    def on_block(self, reason: str):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.min_rate, self.rate * SCRAPE_RATE_DECREASE)
+            ## no burst right after a block
+            self.tokens = min(self.tokens, 0.0)
+        HOST_RATE.set(self.rate, host=self.host)
+        THROTTLE_EVENTS.inc(host=self.host, reason=reason)
+        logging.warning(f"Block signal from {self.host} ({reason}), rate lowered to {self.rate:.3f} requests/s")
+
+class PolitenessScheduler:
+    """
+    Paces the page fetches per host. Every fetch calls `wait` before loading
+    the page and reports the outcome with `report_success` or `report_block`.
+    The pacing is per process: with `processes` processes scraping the same
+    hosts, each one gets that fraction of the rates.
+    """
+
+    def __init__(self, rates: dict[str, float] = None, default_rate: float = SCRAPE_DEFAULT_RATE,
+                 processes: int = SCRAPE_RATE_PROCESSES):
+        self.rates = rates if rates is not None else _parse_rates(SCRAPE_RATE_LIMITS)
+        self.default_rate = default_rate
+        self.share = 1 / max(1, processes)
+        self._throttles: dict[str, HostThrottle] = {}
+        self._lock = threading.Lock()
+
+    def throttle(self, url: str) -> HostThrottle:
+        host = (urlparse(url).hostname or "").lower()
+        with self._lock:
+            throttle = self._throttles.get(host)
+            if throttle is None:
+                throttle = HostThrottle(host, self.rates.get(host, self.default_rate), self.share)
+                self._throttles[host] = throttle
+            return throttle
+
+    def wait(self, url: str) -> float:
+        return self.throttle(url).acquire()
+
+    def report_success(self, url: str):
+        self.throttle(url).on_success()
+
+    def report_block(self, url: str, reason: str):
+        self.throttle(url).on_block(reason)
+
+politeness = PolitenessScheduler()
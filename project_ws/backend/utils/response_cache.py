@@ -0,0 +1,263 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from .logger import logger_setup
+import logging
+
+## Cache configuration (can be overridden from the .env file)
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "300"))  # seconds
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL")  # e.g. redis://redis:6379/0
+
+## Seconds a data version read from the version store is reused: a write done by another
+## process (worker, enrichment, other API process) is seen after at most this delay
+CATALOG_VERSION_MAX_AGE = float(os.getenv("CATALOG_VERSION_MAX_AGE", "1"))
+
+DATA_VERSION_KEY = "data_version"
+
+class LocalCacheBackend:
+    """
+    In-process cache backend with a TTL and an LRU size bound.
+
+    Used when no shared backend is configured and as the stand-in for
+    tests. Every uvicorn worker holds its own copy, so a write done
+    in one worker is not seen by the others.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._counters: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: int):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_counter(self, key: str) -> int:
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def init_counter(self, key: str, value: int):
+        with self._lock:
+            self._counters.setdefault(key, value)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class RedisCacheBackend:
+    """
+    Shared cache backend so that several uvicorn workers
+    see the same entries and the same data version.
+
+    The size bound is enforced by the redis ``maxmemory`` policy
+    (e.g. ``allkeys-lru``), the TTL by ``SET ... EX``.
+    """
+
+    def __init__(self, url: str, namespace: str = "response_cache"):
+        import redis  ## optional dependency, only needed for the shared backend
+
+        self.client = redis.Redis.from_url(url)
+        self.namespace = namespace
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self._key(key))
+
+    def set(self, key: str, value: bytes, ttl: int):
+        self.client.set(self._key(key), value, ex=ttl)
+
+    def get_counter(self, key: str) -> int:
+        value = self.client.get(self._key(key))
+        return int(value) if value is not None else 0
+
+    def init_counter(self, key: str, value: int):
+        self.client.set(self._key(key), value, nx=True)
+
+    def incr(self, key: str) -> int:
+        return int(self.client.incr(self._key(key)))
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self._key("*")):
+            self.client.delete(key)
+
+class ResponseCache:
+    """
+    Read-through cache for serialized API responses.
+
+    Keys contain the current data version, so bumping the version
+    (after an insert or a delete) makes every older entry unreachable.
+    Stale entries are then dropped by the TTL or the size bound.
+
+    The data version comes from the version store when one is set (the
+    catalog_version table, bumped by the writes of every process), otherwise
+    from a counter of the backend, which only follows the writes of the
+    processes sharing the backend.
+    """
+
+    def __init__(self, backend, ttl: int, version_max_age: float = CATALOG_VERSION_MAX_AGE):
+        self.backend = backend
+        self.ttl = ttl
+        self.version_store = None
+        self.version_max_age = version_max_age
+        self._version: Optional[int] = None
+        self._version_read_at = 0.0
+        self._seen_version: Optional[int] = None
+        self._version_listeners = []
+        ## Start from a timestamp, not from 0, so that a version (and the ETags built
+        ## from it) is never reused after a restart or after the shared backend is flushed
+        try:
+            self.backend.init_counter(DATA_VERSION_KEY, int(time.time() * 1000))
+        except Exception as e:
+            logging.warning(f"Response cache data version could not be initialized: {e}")
+
+    def use_version_store(self, store):
+        """
+        Takes the data version from a store instead of the backend counter.
+
+        :param store: An object with `read()` and `bump()` returning the version
+        """
+
+        self.version_store = store
+        self._version = None
+
+    def on_version_change(self, listener):
+        """
+        Calls `listener()` whenever a new data version is read from the version
+        store, whichever process did the write (a scrape worker only commits,
+        the API process reading the version does the follow-up work).
+
+        :param listener: A function without arguments, that must not block
+        """
+
+        self._version_listeners.append(listener)
+
+    def data_version(self) -> int:
+        """
+        :return: The current data version of the catalog
+        :rtype: int
+        """
+
+        if self.version_store is None:
+            return self.backend.get_counter(DATA_VERSION_KEY)
+
+        if self._version is None or time.monotonic() - self._version_read_at >= self.version_max_age:
+            version = self._version = self.version_store.read()
+            self._version_read_at = time.monotonic()
+            if self._seen_version is not None and version != self._seen_version:
+                for listener in self._version_listeners:
+                    try:
+                        listener()
+                    except Exception as e:
+                        logging.warning(f"Data version listener failed: {e}")
+            self._seen_version = version
+        return self._version
+
+    def bump_data_version(self) -> int:
+        """
+        Invalidates all cached responses, e.g. for a cold benchmark.
+
+        :return: The new data version
+        :rtype: int
+        """
+
+        if self.version_store is None:
+            version = self.backend.incr(DATA_VERSION_KEY)
+        else:
+            version = self._version = self.version_store.bump()
+            self._version_read_at = time.monotonic()
+        logging.info(f"Catalog data version bumped to {version}")
+        return version
+
+    def data_changed(self) -> int:
+        """
+        Must be called after every committed write to the catalog. With a
+        version store the write has already bumped the version, which is
+        read again right away; otherwise the backend counter is bumped.
+
+        :return: The new data version
+        :rtype: int
+        """
+
+        if self.version_store is None:
+            return self.bump_data_version()
+        self._version = None
+        return self.data_version()
+
+    def make_key(self, endpoint: str, **params) -> str:
+        """
+        Builds a cache key from the endpoint name and the normalized
+        query parameters. Parameters that are not set are left out, strings
+        are lower-cased (all text filters are case-insensitive) and numbers
+        are converted to floats, so equivalent queries share an entry.
+
+        :param endpoint: The name of the endpoint
+        :type endpoint: str
+        :return: The cache key
+        :rtype: str
+        """
+
+        normalized = {}
+        for name, value in params.items():
+            if value is None:
+                continue
+            if isinstance(value, str):
+                value = value.lower()
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                value = float(value)
+            normalized[name] = value
+
+        digest = hashlib.sha1(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+        return f"v{self.data_version()}:{endpoint}:{digest}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self.backend.get(key)
+        except Exception as e:
+            logging.warning(f"Response cache read failed: {e}")
+            return None
+
+    def set(self, key: str, value: bytes):
+        try:
+            self.backend.set(key, value, self.ttl)
+        except Exception as e:
+            logging.warning(f"Response cache write failed: {e}")
+
+def build_backend():
+    """
+    Returns the shared redis backend if it is configured,
+    otherwise the in-process one.
+    """
+
+    if RESPONSE_CACHE_REDIS_URL:
+        return RedisCacheBackend(RESPONSE_CACHE_REDIS_URL)
+    return LocalCacheBackend(RESPONSE_CACHE_MAX_ENTRIES)
+
+response_cache = ResponseCache(build_backend(), RESPONSE_CACHE_TTL)
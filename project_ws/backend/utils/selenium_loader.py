@@ -1,15 +1,24 @@
+import queue
+import threading
 import undetected_chromedriver as uc
+from contextlib import contextmanager
 from typing import Callable, Any
 from selenium.webdriver.remote.webdriver import WebDriver
 from .logger import logger_setup
+from .metrics import time_stage
+from .politeness import politeness
+from .browser_supervisor import supervisor, BrowserRecycled
 import logging
 
 
-def setup_driver():
+def setup_driver(user_data_dir: str = None):
     """
     Setup the Chrome driver with necessary options using undetected_chromedriver.
     The setup is essential to simulate human-like behaviour in order to 
     prevent anti-bot detection.
+
+    :param user_data_dir: The profile directory of the browser (a temporary one if None)
+    :type user_data_dir: str
     """
 
     options = uc.ChromeOptions()
@@ -23,7 +32,7 @@ def setup_driver():
     options.add_argument('--window-size=1920,1080')
     options.add_argument('start-maximized')
 
-    driver = uc.Chrome(options=options, headless=True)
+    driver = uc.Chrome(options=options, headless=True, user_data_dir=user_data_dir)
     return driver
 
 def scrape_with_browser(func: Callable[WebDriver, Any]) -> Callable[[str], Any]:
@@ -31,9 +40,10 @@ def scrape_with_browser(func: Callable[WebDriver, Any]) -> Callable[[str], Any]:
     Decorator to wrap a scraping function with a Selenium WebDriver.
 
     This decorator handles the setup and teardown of a Selenium WebDriver
-    instance. It opens a browser, navigates to a specified URL, passes the
-    driver to the decorated function for scraping, and then gracefully
-    closes the browser regardless of whether an error occurred.
+    instance. It opens a browser through the browser supervisor, navigates
+    to a specified URL, passes the driver to the decorated function for
+    scraping, and then releases the browser (quits it once and kills what
+    is left of its processes) regardless of whether an error occurred.
 
     :param func: The inner function that is wrapped inside the wraper
     :type func: Callable[[WebDriver], Any]
@@ -43,15 +53,126 @@ def scrape_with_browser(func: Callable[WebDriver, Any]) -> Callable[[str], Any]:
     """
 
     def wrapper(url: str) -> Any:
-        driver = setup_driver()
+        with time_stage("setup_driver"):
+            browser = supervisor.acquire(setup_driver)
+        driver = browser.driver
         try:
-            driver.get(url) ## gets the URL to open the page
+            with time_stage("politeness_wait"):
+                politeness.wait(url) ## paces the requests to the host
+            with time_stage("page_load"):
+                driver.get(url) ## gets the URL to open the page
             result = func(driver) ## calls the function, for example, retrieve_courses_info
+            supervisor.check(browser) ## a browser killed for its memory may have returned a partial page
+        except BrowserRecycled:
+            logging.info(f"Browser recycled while loading {url}")
+            raise
         except Exception as e:
+            ## a browser killed by the supervisor (memory cap, age) fails too, but the host did not
+            ## block it: BrowserRecycled is raised instead and the rate of the host is left as it is
+            supervisor.check(browser)
             logging.info(f"Error loading URL {url}: {e}")
-            driver.quit()
+            ## timeouts and pages whose course cards never load are how blocking shows up
+            politeness.report_block(url, type(e).__name__)
             raise
         else:
-            driver.quit()
+            if isinstance(result, list) and not result:
+                politeness.report_block(url, "empty_page")
+            else:
+                politeness.report_success(url)
             return result
+        finally:
+            supervisor.release(browser)
     return wrapper
+
+class BrowserPool:
+    """
+    A pool of browsers shared by threads that load many pages (e.g. course
+    detail pages), instead of a new browser per page. At most `size` browsers
+    run at once; a browser is replaced after `max_pages` pages, after an error
+    and when the supervisor recycled it.
+
+    :param size: The maximum number of browsers
+    :type size: int
+    :param max_pages: Pages loaded by a browser before it is replaced
+    :type max_pages: int
+    """
+
+    def __init__(self, size: int, max_pages: int = 50):
+        ## idle browsers hold their slot of the supervisor: a larger pool could wait for itself
+        size = min(size, supervisor.max_browsers)
+        self.size = size
+        self.max_pages = max_pages
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._pages = {}
+
+    @contextmanager
+    def browser(self):
+        """
+        Lends an idle browser (or starts one) to the caller until the block ends.
+
+        :yield: The handle of the browser (its driver is `handle.driver`)
+        :rtype: BrowserHandle
+        """
+
+        self._slots.acquire()
+        try:
+            try:
+                handle = self._idle.get_nowait()
+            except queue.Empty:
+                with time_stage("setup_driver"):
+                    handle = supervisor.acquire(setup_driver)
+                self._pages[handle.profile_dir] = 0
+
+            try:
+                yield handle
+                supervisor.check(handle)
+            except Exception:
+                self._discard(handle)
+                raise
+
+            self._pages[handle.profile_dir] += 1
+            if self._pages[handle.profile_dir] >= self.max_pages:
+                self._discard(handle)
+            else:
+                self._idle.put(handle)
+        finally:
+            self._slots.release()
+
+    def fetch(self, url: str, func: Callable[[WebDriver], Any]) -> Any:
+        """
+        Loads `url` in a pooled browser, paced by the politeness scheduler,
+        and returns what `func` extracts from it.
+        """
+
+        with self.browser() as handle:
+            try:
+                with time_stage("politeness_wait"):
+                    politeness.wait(url)
+                with time_stage("page_load"):
+                    handle.driver.get(url)
+                result = func(handle.driver)
+                supervisor.check(handle)
+            except BrowserRecycled:
+                raise
+            except Exception as e:
+                supervisor.check(handle) ## a recycle is not a block, like in `scrape_with_browser`
+                politeness.report_block(url, type(e).__name__)
+                raise
+            politeness.report_success(url)
+            return result
+
+    def _discard(self, handle):
+        self._pages.pop(handle.profile_dir, None)
+        supervisor.release(handle)
+
+    def close(self):
+        """
+        Releases the idle browsers.
+        """
+
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
@@ -0,0 +1,58 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator
+from .platforms import platform_of_url
+from ..logger import logger_setup
+from ..metrics import scrape_context
+from ..selenium_loader import BrowserPool
+import logging
+
+## Detail pages loaded by a browser of the pool before it is replaced (bounds its memory)
+ENRICH_BROWSER_MAX_PAGES = int(os.getenv("ENRICH_BROWSER_MAX_PAGES", "50"))
+
+def scrape_course_details(pool: BrowserPool, url: str) -> dict:
+    """
+    Scrapes the detail page of one course in a browser of the pool.
+
+    :raises ValueError: If the url is not a course of a platform with a detail page scraper
+    :return: The fields found on the page (see `extract_course_details`)
+    :rtype: dict
+    """
+
+    platform = platform_of_url(url)
+    if platform is None or platform.extract_details is None:
+        raise ValueError(f"No detail page scraper for {url}")
+    with scrape_context(platform.name, "details"):
+        return pool.fetch(url, platform.extract_details)
+
+def scrape_courses_details(courses: list[dict], concurrency: int) -> Iterator[tuple[dict, dict | None, Exception | None]]:
+    """
+    Scrapes the detail pages of courses with at most `concurrency` pages
+    (and browsers) at once, and yields every course as soon as its page
+    is done, in completion order.
+
+    :param courses: The courses to enrich, with their id and url
+    :type courses: list[dict]
+    :param concurrency: The maximum number of pages loaded at once
+    :type concurrency: int
+    :return: (course, details, None) for a scraped page, (course, None, error) for a failed one
+    :rtype: Iterator[tuple[dict, dict | None, Exception | None]]
+    """
+
+    pool = BrowserPool(concurrency, ENRICH_BROWSER_MAX_PAGES)
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="enrich")
+    try:
+        futures = {executor.submit(scrape_course_details, pool, course["url"]): course for course in courses}
+        for future in as_completed(futures):
+            course = futures[future]
+            try:
+                details = future.result()
+            except Exception as e:
+                logging.warning(f"Detail page of course {course['id']} failed: {e}")
+                yield course, None, e
+            else:
+                yield course, details, None
+    finally:
+        ## the caller may stop early: the pages that did not start are cancelled
+        executor.shutdown(wait=True, cancel_futures=True)
+        pool.close()
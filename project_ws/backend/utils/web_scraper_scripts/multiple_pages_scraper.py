@@ -1,23 +1,104 @@
-from . import udemy_web_scraper
-from . import pluralsight_web_scraper
-from enum import Enum
+import os
+import random
+import time
+from .platforms import PlatformAdapter, get_platform
 from ..logger import logger_setup
+from ..metrics import scrape_context
 import logging
 
-BASE_URL_UDEMY = "https://www.udemy.com/courses/it-and-software/other-it-and-software/?p={}&sort=most-reviewed"
-BASE_URL_PLURALSIGHT = "https://www.pluralsight.com/browse?=&sort=newest&course-category=Software%20Development&page={}&ratings=3.0%20and%20up&categories=course"
+## Per-page retries: a page is scraped up to 1 + SCRAPE_PAGE_RETRIES times, waiting
+## SCRAPE_RETRY_BASE_DELAY * 2^attempt seconds (with jitter, at most SCRAPE_RETRY_MAX_DELAY) in between
+SCRAPE_PAGE_RETRIES = int(os.getenv("SCRAPE_PAGE_RETRIES", "3"))
+SCRAPE_RETRY_BASE_DELAY = float(os.getenv("SCRAPE_RETRY_BASE_DELAY", "2"))
+SCRAPE_RETRY_MAX_DELAY = float(os.getenv("SCRAPE_RETRY_MAX_DELAY", "60"))
 
-class WebPlatform(str, Enum):
+class PageScrapeError(Exception):
     """
-    Enum used to not accidentaly change the data.
+    Raised when a page could not be scraped after all retries.
     """
 
-    udemy = "udemy"
-    pluralsight = "pluralsight"
+    def __init__(self, web_platform: str, page, attempts: int, cause: Exception):
+        super().__init__(f"Page {page} of {web_platform} failed after {attempts} attempts: {cause}")
+        self.page = page
+        self.attempts = attempts
+        self.cause = cause
+
+def get_platform_config(web_platform: str) -> PlatformAdapter | None:
+    """
+    :param web_platform: The platform, e.g. udemy or pluralsight
+    :return: The adapter of the platform (listing urls, page scraper and last page function), None if unknown
+    :rtype: PlatformAdapter | None
+    """
+
+    return get_platform(web_platform)
+
+def _with_retries(web_platform: str, page, scrape) -> tuple:
+    """
+    Calls `scrape` until it succeeds, with exponential backoff between the attempts.
+
+    :return: The result of `scrape` and the number of attempts
+    :rtype: tuple
+    """
+
+    for attempt in range(SCRAPE_PAGE_RETRIES + 1):
+        try:
+            return scrape(), attempt + 1
+        except Exception as e:
+            if attempt == SCRAPE_PAGE_RETRIES:
+                raise PageScrapeError(web_platform, page, attempt + 1, e) from e
+            delay = min(SCRAPE_RETRY_MAX_DELAY, SCRAPE_RETRY_BASE_DELAY * 2 ** attempt) * random.uniform(0.5, 1.0)
+            logging.warning(f"Page {page} of {web_platform} failed (attempt {attempt + 1}): {e}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+def get_last_page(web_platform: str, category: str = None) -> int:
+    """
+    :param web_platform: The platform, e.g. udemy or pluralsight
+    :param category: The category of the listing, the default one of the platform if None
+    :raises PageScrapeError: If the pagination could not be read after all retries
+    :return: The last page of the listing of the platform
+    :rtype: int
+    """
+
+    config = get_platform_config(web_platform)
+    with scrape_context(web_platform, "pagination"):
+        last_page, _ = _with_retries(web_platform, "pagination",
+                                     lambda: config.last_page(config.listing_url(1, category)))
+    return last_page
+
+def scrape_page(web_platform: str, page: int, category: str = None) -> tuple[list[dict], int]:
+    """
+    Scrapes one page of a platform, retrying with exponential backoff when
+    the page fails to load or has no course cards.
+
+    :param web_platform: The platform, e.g. udemy or pluralsight
+    :type web_platform: str
+    :param page: The page number
+    :type page: int
+    :param category: The category of the listing, the default one of the platform if None
+    :type category: str
+    :raises PageScrapeError: If every attempt failed
+    :return: The courses of the page and the number of attempts it took
+    :rtype: tuple[list[dict], int]
+    """
+
+    config = get_platform_config(web_platform)
+    url = config.listing_url(page, category)
+
+    def scrape():
+        courses = config.retrieve_courses(url)
+        if not courses:
+            raise ValueError("no course cards on the page")
+        return courses
+
+    logging.info(f"Scraping page {page} of {web_platform}{f' ({category})' if category else ''}")
+    with scrape_context(web_platform, page):
+        return _with_retries(web_platform, page, scrape)
 
 def retrive_mulitiple_courses(web_platform:str, start_page: int=1, end_page:int=1) -> list[dict]:
     """
     Retrieves multiple pages of courses from a specified web platform.
+    Every page is retried on its own, a page that still fails is
+    skipped instead of aborting the whole range.
 
     :param web_platform: The platform to scrape from.
     :param start_page: The starting page number for scraping (inclusive).
@@ -28,32 +109,21 @@ def retrive_mulitiple_courses(web_platform:str, start_page: int=1, end_page:int=
     all_courses = []
     logging.info(f"function retrive_mulitiple_courses invoked.")
 
-    platform_map = {
-        WebPlatform.udemy: {
-            "base_url": BASE_URL_UDEMY,
-            "scraper": udemy_web_scraper.retrieve_courses_info,
-            "last_page": udemy_web_scraper.last_page
-        },
-        WebPlatform.pluralsight: {
-            "base_url": BASE_URL_PLURALSIGHT,
-            "scraper": pluralsight_web_scraper.retrieve_courses_info,
-            "last_page": pluralsight_web_scraper.last_page
-        }
-    }
-    config = platform_map.get(web_platform.lower().strip())
-    if not config:
+    if not get_platform_config(web_platform):
         logging.error(f"Error: Invalid web platform '{web_platform}' specified.")
         return []
 
-    last_page = config["last_page"](config["base_url"].format(1))
+    last_page = get_last_page(web_platform)
 
     if end_page > last_page:
         end_page = last_page
 
     for page in range(start_page, end_page + 1):
-        logging.info(f"Scraping page {page} of {web_platform}")
-        url = config["base_url"].format(page)
-        page_of_courses = config["scraper"](url)
+        try:
+            page_of_courses, _ = scrape_page(web_platform, page)
+        except PageScrapeError as e:
+            logging.error(str(e))
+            continue
         all_courses.extend(page_of_courses)
 
-    return all_courses
\ No newline at end of file
+    return all_courses
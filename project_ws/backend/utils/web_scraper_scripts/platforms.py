@@ -0,0 +1,132 @@
+import importlib
+import os
+import pkgutil
+import threading
+from typing import Callable, Optional
+from urllib.parse import urlparse
+from ..logger import logger_setup
+import logging
+
+## Registry of the platforms the scrapers know. Every platform module registers its adapter
+## when it is imported; the modules of this package named *_web_scraper are imported on the
+## first lookup, and so are the modules listed in SCRAPER_PLATFORM_MODULES (comma separated,
+## e.g. "my_scrapers.coursera_web_scraper"), so a new platform plugs in without any change
+## to the dispatchers (multiple_pages_scraper, detail_pages_scraper, the crawl jobs).
+SCRAPER_PLATFORM_MODULES = os.getenv("SCRAPER_PLATFORM_MODULES", "")
+
+class PlatformAdapter:
+    """
+    What the dispatchers need to know about a platform: the listing url of
+    every category, how to read the pagination and how to scrape a listing
+    page (and optionally a course detail page).
+
+    :param name: The name of the platform, e.g. udemy
+    :type name: str
+    :param categories: The listing url of every category, with {} for the page number.
+        The first one is the default category.
+    :type categories: dict[str, str]
+    :param retrieve_courses: Scrapes the course cards of a listing url (`scrape_with_browser` function)
+    :type retrieve_courses: Callable[[str], list[dict]]
+    :param last_page: Reads the last page of a listing url (`scrape_with_browser` function)
+    :type last_page: Callable[[str], int]
+    :param extract_details: Extracts the fields of a course detail page from a loaded driver
+    :type extract_details: Callable[[WebDriver], dict] | None
+    :param hosts: The domains of the course urls, e.g. ("udemy.com",)
+    :type hosts: tuple
+    """
+
+    def __init__(self, name: str, categories: dict[str, str], retrieve_courses: Callable[[str], list[dict]],
+                 last_page: Callable[[str], int], extract_details: Optional[Callable] = None, hosts: tuple = ()):
+        if not categories:
+            raise ValueError(f"Platform {name} has no category")
+        self.name = name
+        self.categories = categories
+        self.default_category = next(iter(categories))
+        self.retrieve_courses = retrieve_courses
+        self.last_page = last_page
+        self.extract_details = extract_details
+        self.hosts = hosts
+
+    def listing_url(self, page: int, category: str = None) -> str:
+        """
+        :param page: The page number
+        :param category: The category, the default one if None
+        :raises KeyError: If the platform has no such category
+        :return: The url of the listing page
+        :rtype: str
+        """
+
+        return self.categories[category or self.default_category].format(page)
+
+    def serves(self, url: str) -> bool:
+        """
+        :return: True if the url is on one of the hosts of the platform
+        :rtype: bool
+        """
+
+        host = (urlparse(url).hostname or "").lower()
+        return any(host == domain or host.endswith(f".{domain}") for domain in self.hosts)
+
+_platforms: dict[str, PlatformAdapter] = {}
+_loaded = False
+_lock = threading.RLock()  ## a platform module may look up the registry while it is loaded
+
+def register_platform(adapter: PlatformAdapter) -> PlatformAdapter:
+    """
+    Adds a platform to the registry (a platform registered again replaces the previous one).
+
+    :return: The adapter
+    :rtype: PlatformAdapter
+    """
+
+    _platforms[adapter.name] = adapter
+    return adapter
+
+def load_platforms():
+    """
+    Imports the platform modules once: the *_web_scraper modules of this
+    package and the modules of SCRAPER_PLATFORM_MODULES.
+    """
+
+    global _loaded
+    with _lock:
+        if _loaded:
+            return
+        modules = [f"{__package__}.{module.name}" for module in pkgutil.iter_modules([os.path.dirname(__file__)])
+                   if module.name.endswith("_web_scraper")]
+        modules += [module.strip() for module in SCRAPER_PLATFORM_MODULES.split(",") if module.strip()]
+        for module in modules:
+            try:
+                importlib.import_module(module)
+            except Exception as e:
+                logging.error(f"Platform module {module} could not be loaded: {e}")
+        _loaded = True
+
+def get_platform(name: str) -> Optional[PlatformAdapter]:
+    """
+    :param name: The name of the platform (case and surrounding spaces are ignored)
+    :return: The adapter of the platform, None if it is unknown
+    :rtype: Optional[PlatformAdapter]
+    """
+
+    load_platforms()
+    return _platforms.get((name or "").lower().strip())
+
+def platform_names() -> list[str]:
+    """
+    :return: The names of the registered platforms
+    :rtype: list[str]
+    """
+
+    load_platforms()
+    return sorted(_platforms)
+
+def platform_of_url(url: str) -> Optional[PlatformAdapter]:
+    """
+    :param url: The url of a course
+    :return: The platform whose hosts serve the url, None if there is none
+    :rtype: Optional[PlatformAdapter]
+    """
+
+    load_platforms()
+    return next((adapter for adapter in _platforms.values() if adapter.serves(url)), None)
@@ -1,6 +1,9 @@
+import os
 import re
 import time
+from datetime import date, datetime
 from ..logger import logger_setup
+from ..logger.logger_setup import log_event
 import logging
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.remote.webdriver import WebDriver
@@ -11,7 +14,19 @@ from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.common.keys import Keys
 from fastapi import HTTPException
 from .. import selenium_loader
+from ..metrics import time_stage, count_extraction_failure
 from .exceptions import *
+from .platforms import PlatformAdapter, register_platform
+
+## Listing urls of the categories, {} is replaced by the page number. BASE_URL_PLURALSIGHT overrides
+## the default category (e.g. the benchmarks point it to a local fixture site)
+BASE_URL_PLURALSIGHT = os.getenv("BASE_URL_PLURALSIGHT", "https://www.pluralsight.com/browse?=&sort=newest&course-category=Software%20Development&page={}&ratings=3.0%20and%20up&categories=course")
+PLURALSIGHT_CATEGORIES = {
+    "software-development": BASE_URL_PLURALSIGHT,
+    "it-ops": "https://www.pluralsight.com/browse?=&sort=newest&course-category=IT%20Ops&page={}&ratings=3.0%20and%20up&categories=course",
+    "data-professional": "https://www.pluralsight.com/browse?=&sort=newest&course-category=Data%20Professional&page={}&ratings=3.0%20and%20up&categories=course",
+    "information-and-cyber-security": "https://www.pluralsight.com/browse?=&sort=newest&course-category=Information%20%26%20Cyber%20Security&page={}&ratings=3.0%20and%20up&categories=course",
+}
 
 @selenium_loader.scrape_with_browser
 def last_page(driver: WebDriver) -> int:
@@ -70,18 +85,19 @@ def retrieve_courses_info(driver: WebDriver) -> list[dict]:
     # actions.perform()
     # time.sleep(3)
     try:
-        WebDriverWait(driver, 40).until(
-            EC.presence_of_all_elements_located((By.XPATH, '//li[contains(@class,"browse-search-results-item")]'))
-        )
+        with time_stage("wait_for_cards"):
+            WebDriverWait(driver, 40).until(
+                EC.presence_of_all_elements_located((By.XPATH, '//li[contains(@class,"browse-search-results-item")]'))
+            )
     except Exception as e:
         logging.error(f"Courses did not load properly: {e}")
-        driver.quit()
         raise HTTPException(status_code=500, detail="Courses did not load properly")
     logging.info("Course cards loaded successfully.")
     
     course_cards = driver.find_elements(By.XPATH, '//li[contains(@class,"browse-search-results-item")]')
     logging.info(f"Found {len(course_cards)} course cards.")
-    time.sleep(5)
+    with time_stage("fixed_sleep"):
+        time.sleep(5)
 
     list_courses = []
     for card in course_cards:
@@ -110,63 +126,71 @@ def extract_course_data(card: WebElement) -> dict:
 
     try:
         try:
-            link_element = card.find_element(By.XPATH, './/a')
-            target_url = link_element.get_attribute("href")
+            with time_stage("extract_url"):
+                link_element = card.find_element(By.XPATH, './/a')
+                target_url = link_element.get_attribute("href")
         except Exception as e:
             raise URLExtractionError(f"Failed to extract course URL: {e}")
 
         try:
-            title = card.find_element(By.XPATH, './/div[@class="course-details__title"]').text
+            with time_stage("extract_title"):
+                title = card.find_element(By.XPATH, './/div[@class="course-details__title"]').text
         except Exception as e:
             raise TitleExtractionError(f"Failed to extract course title: {e}")
 
         try:
-            author = card.find_element(By.XPATH, './/div[@class="course-details__author"]').text.replace("by ", "")
-            authors_list = [author]
+            with time_stage("extract_authors"):
+                author = card.find_element(By.XPATH, './/div[@class="course-details__author"]').text.replace("by ", "")
+                authors_list = [author]
         except Exception as e:
             raise AuthorExtractionError(f"Failed to extract authors: {e}")
 
         try:
-            difficulty = card.find_element(By.XPATH, './/span[@id="courseLevel"]').text
+            with time_stage("extract_difficulty"):
+                difficulty = card.find_element(By.XPATH, './/span[@id="courseLevel"]').text
         except Exception as e:
             difficulty = None
             raise DetailsExtractionError("Failed to extract difficulty")
         try:
-            duration_text = card.find_element(By.XPATH, './/span[@class="duration course-details__level"]').text
-            # convert "2h 36m" to float
-            hours = re.findall(r'(\d+(?:\.\d+)?)h', duration_text)
-            mins = re.findall(r'(\d+)m', duration_text)
-            total_hours = float(hours[0]) if hours else (
-                float(mins[0]) / 60 if mins else None
-            )
-            total_hours = str(total_hours)
+            with time_stage("extract_duration"):
+                duration_text = card.find_element(By.XPATH, './/span[@class="duration course-details__level"]').text
+                # convert "2h 36m" to float
+                hours = re.findall(r'(\d+(?:\.\d+)?)h', duration_text)
+                mins = re.findall(r'(\d+)m', duration_text)
+                total_hours = float(hours[0]) if hours else (
+                    float(mins[0]) / 60 if mins else None
+                )
+                total_hours = str(total_hours)
         except Exception as e:
             total_hours = None
             raise DetailsExtractionError("Failed to extract total hours")
 
         try:
-            full_stars = card.find_elements(By.XPATH, './/i[contains(@class, "fa-star") and not(contains(@class, "half"))]')
-            half_stars = card.find_elements(By.XPATH, './/i[contains(@class, "fa-star-half-o")]')
+            with time_stage("extract_rating"):
+                full_stars = card.find_elements(By.XPATH, './/i[contains(@class, "fa-star") and not(contains(@class, "half"))]')
+                half_stars = card.find_elements(By.XPATH, './/i[contains(@class, "fa-star-half-o")]')
 
-            rating = len(full_stars) + 0.5 * len(half_stars)
-            rating = str(rating)
+                rating = len(full_stars) + 0.5 * len(half_stars)
+                rating = str(rating)
         except Exception as e:
             rating = None
             raise DetailsExtractionError("Failed to extract total hours")
 
         try:
-            students_span = card.find_element(By.XPATH, './/div[@class="course-details__rating"]/span')
-            students_text = students_span.text
-            total_students = (
-                int(re.sub(r"[^\d]", "", students_text)) if students_text else None
-            )
-            total_students = str(total_students)
+            with time_stage("extract_total_students"):
+                students_span = card.find_element(By.XPATH, './/div[@class="course-details__rating"]/span')
+                students_text = students_span.text
+                total_students = (
+                    int(re.sub(r"[^\d]", "", students_text)) if students_text else None
+                )
+                total_students = str(total_students)
         except Exception as e:
             total_students = None
             raise TotalStudentsExtractionError("Failed to extract total students")
 
     except CourseExtractionError as e:
         logging.error(f"{str(e)}")
+        count_extraction_failure(e)
 
     finally:
         card_batch = {
@@ -181,6 +205,79 @@ def extract_course_data(card: WebElement) -> dict:
             "lectures_count": number_of_lectures,
             "difficulty": difficulty,
         }
-        logging.info(card_batch)
+        ## once per card: DEBUG and lazily formatted, so large scrapes are not slowed down by logging
+        log_event(logging.DEBUG, "card_extracted", "Course card extracted: %s", target_url, card=card_batch)
 
         return card_batch
+
+
+def parse_last_updated(text: str) -> date | None:
+    """
+    Parses the update date of a course page, e.g. "Updated Jan 15, 2024".
+
+    :param text: The text of the update element
+    :type text: str
+    :return: The date, None if it cannot be parsed
+    :rtype: date | None
+    """
+
+    match = re.search(r'([A-Z][a-z]{2})[a-z]*\.? (\d{1,2}), (\d{4})', text or "")
+    if not match:
+        return None
+    try:
+        return datetime.strptime(" ".join(match.groups()), "%b %d %Y").date()
+    except ValueError:
+        return None
+
+def extract_course_details(driver: WebDriver) -> dict:
+    """
+    Extract the fields of a course detail page that the search results do not have:
+    the description, the last update and the number of clips (stored as lectures).
+    Pluralsight sells subscriptions, so its course pages have no price either.
+
+    Every field is optional: a field that is not on the page is None.
+
+    :param driver: Selenium WebDriver instance with the course page loaded.
+    :type driver: WebDriver
+    :raises TimeoutException: If the course page does not load.
+    :return: The fields found on the page.
+    :rtype: dict
+    """
+
+    with time_stage("wait_for_details"):
+        WebDriverWait(driver, 40).until(
+            EC.presence_of_element_located((By.XPATH, '//h1'))
+        )
+
+    def text_of(xpath: str) -> str | None:
+        elements = driver.find_elements(By.XPATH, xpath)
+        return elements[0].text.strip() if elements and elements[0].text.strip() else None
+
+    details = {
+        "description": None,
+        "last_updated_at": None,
+        "total_lectures": None,
+        "total_students": None,
+        "current_price": None,
+        "original_price": None,
+    }
+
+    with time_stage("extract_details_page"):
+        details["description"] = text_of('//div[contains(@class, "course-description")]')
+        details["last_updated_at"] = parse_last_updated(
+            text_of('//*[contains(@class, "course-info") and contains(., "Updated")]')
+        )
+        clips = driver.find_elements(By.XPATH, '//*[contains(@class, "table-of-contents__clip")]')
+        if clips:
+            details["total_lectures"] = len(clips)
+
+    return details
+
+register_platform(PlatformAdapter(
+    name="pluralsight",
+    categories=PLURALSIGHT_CATEGORIES,
+    retrieve_courses=retrieve_courses_info,
+    last_page=last_page,
+    extract_details=extract_course_details,
+    hosts=("pluralsight.com",)
+))
@@ -1,6 +1,9 @@
+import os
 import re
 import time
+from datetime import date
 from ..logger import logger_setup
+from ..logger.logger_setup import log_event
 import logging
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.remote.webdriver import WebDriver
@@ -9,7 +12,21 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
 from fastapi import HTTPException
 from .. import selenium_loader
+from ..metrics import time_stage, count_extraction_failure
 from .exceptions import *
+from .platforms import PlatformAdapter, register_platform
+
+## Listing urls of the categories, {} is replaced by the page number. BASE_URL_UDEMY overrides
+## the default category (e.g. the benchmarks point it to a local fixture site)
+BASE_URL_UDEMY = os.getenv("BASE_URL_UDEMY", "https://www.udemy.com/courses/it-and-software/other-it-and-software/?p={}&sort=most-reviewed")
+UDEMY_CATEGORIES = {
+    "other-it-and-software": BASE_URL_UDEMY,
+    "it-certifications": "https://www.udemy.com/courses/it-and-software/it-certification/?p={}&sort=most-reviewed",
+    "network-and-security": "https://www.udemy.com/courses/it-and-software/network-and-security/?p={}&sort=most-reviewed",
+    "web-development": "https://www.udemy.com/courses/development/web-development/?p={}&sort=most-reviewed",
+    "data-science": "https://www.udemy.com/courses/development/data-science/?p={}&sort=most-reviewed",
+    "programming-languages": "https://www.udemy.com/courses/development/programming-languages/?p={}&sort=most-reviewed",
+}
 
 @selenium_loader.scrape_with_browser
 def last_page(driver: WebDriver) -> int:
@@ -56,13 +73,13 @@ def retrieve_courses_info(driver: WebDriver) -> list[dict]:
     """
 
     try:
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_all_elements_located((By.XPATH, '//*[contains(@class, "course-list_card__")]'))
+        with time_stage("wait_for_cards"):
+            WebDriverWait(driver, 20).until(
+                EC.presence_of_all_elements_located((By.XPATH, '//*[contains(@class, "course-list_card__")]'))
 
-        )
+            )
     except Exception as e:
         logging.error(f"Courses did not load properly: {e}")
-        driver.quit()
         raise HTTPException(status_code=500, detail="Courses did not load properly")
 
     logging.info("Course cards loaded successfully.")
@@ -71,7 +88,8 @@ def retrieve_courses_info(driver: WebDriver) -> list[dict]:
     course_cards = driver.find_elements(By.XPATH, '//*[contains(@class, "course-list_card__")]')
     logging.info(f"Found {len(course_cards)} course cards.")
     ##Delay to load
-    time.sleep(2)
+    with time_stage("fixed_sleep"):
+        time.sleep(2)
 
     # Extract title from each card
     list_courses = []
@@ -109,61 +127,70 @@ def extract_course_data(card: WebElement) -> dict:
 
     try:
         try:
-            link_element = card.find_element(By.XPATH, './/a')
-            target_url = link_element.get_attribute("href")
+            with time_stage("extract_url"):
+                link_element = card.find_element(By.XPATH, './/a')
+                target_url = link_element.get_attribute("href")
         except Exception as e:
             raise URLExtractionError(f"Failed to extract course URL: {e}")
 
         try:
-            title = card.find_element(By.XPATH, './/a').text
+            with time_stage("extract_title"):
+                title = card.find_element(By.XPATH, './/a').text
         except Exception as e:
             raise TitleExtractionError(f"Failed to extract course title: {e}")
 
         try:
-            authors = card.find_element(By.XPATH, './/div[@class="course-card-instructors_instructor-list__helor"]').text
-            authors_list = authors.split(", ")
+            with time_stage("extract_authors"):
+                authors = card.find_element(By.XPATH, './/div[@class="course-card-instructors_instructor-list__helor"]').text
+                authors_list = authors.split(", ")
         except Exception as e:
             raise AuthorExtractionError(f"Failed to extract authors: {e}")
 
         try:
-            rating = card.find_element(By.XPATH, './/span[contains(@class, "ud-heading-sm star-rating_rating-number")]').text
+            with time_stage("extract_rating"):
+                rating = card.find_element(By.XPATH, './/span[contains(@class, "ud-heading-sm star-rating_rating-number")]').text
         except Exception as e:
             raise RatingExtractionError(f"Failed to extract rating: {e}")
 
         try:
-            total_students = card.find_element(By.XPATH, './/span[contains(@aria-label, "reviews")]').text
-            total_students = total_students[1:-1]
+            with time_stage("extract_total_students"):
+                total_students = card.find_element(By.XPATH, './/span[contains(@aria-label, "reviews")]').text
+                total_students = total_students[1:-1]
         except Exception as e:
             raise TotalStudentsExtractionError(f"Failed to extract number of students {e}")
 
         try:
-            details = card.find_elements(By.XPATH, './/div[contains(@class, "course-meta-info")]')
-            lines = details[0].text.split("\n")
-            total_hours = re.search(r'\d+(\.\d+)?', lines[0]).group()
-            number_of_lectures = re.search(r'\d+(\.\d+)?', lines[1]).group()
-            difficulty = lines[2]
+            with time_stage("extract_details"):
+                details = card.find_elements(By.XPATH, './/div[contains(@class, "course-meta-info")]')
+                lines = details[0].text.split("\n")
+                total_hours = re.search(r'\d+(\.\d+)?', lines[0]).group()
+                number_of_lectures = re.search(r'\d+(\.\d+)?', lines[1]).group()
+                difficulty = lines[2]
         except Exception as e:
             raise DetailsExtractionError(f"Failed to extract details (hours, lectures, difficulty): {e}")
 
         try:
-            current_price_text = card.find_element(By.XPATH, './/div[@data-purpose="course-price-text"]').text
-            current_price = current_price_text.split("\n")[-1]
-            if current_price == "Free":
-                current_price = "0"
+            with time_stage("extract_current_price"):
+                current_price_text = card.find_element(By.XPATH, './/div[@data-purpose="course-price-text"]').text
+                current_price = current_price_text.split("\n")[-1]
+                if current_price == "Free":
+                    current_price = "0"
         except Exception as e:
             raise PriceExtractionError(f"Failed to extract current price: {e}")
 
         try:
-            original_price_text = card.find_element(By.XPATH, './/div[@data-purpose="course-old-price-text"]').text
-            original_price = original_price_text.split("\n")[-1]
-            if original_price == "Free":
-                original_price = "0"
+            with time_stage("extract_original_price"):
+                original_price_text = card.find_element(By.XPATH, './/div[@data-purpose="course-old-price-text"]').text
+                original_price = original_price_text.split("\n")[-1]
+                if original_price == "Free":
+                    original_price = "0"
         except Exception as e:
             original_price = current_price
             raise OriginalPriceExtractionError(f"Failed to extract original price: {e}")
 
     except CourseExtractionError as e:
         logging.error(f"{str(e)}")
+        count_extraction_failure(e)
         
     finally:
         card_batch = {
@@ -178,6 +205,87 @@ def extract_course_data(card: WebElement) -> dict:
             "lectures_count": number_of_lectures,
             "difficulty": difficulty
         }
-        logging.info(card_batch)
+        ## once per card: DEBUG and lazily formatted, so large scrapes are not slowed down by logging
+        log_event(logging.DEBUG, "card_extracted", "Course card extracted: %s", target_url, card=card_batch)
+
+        return card_batch
+
+def parse_last_updated(text: str) -> date | None:
+    """
+    Parses the "Last updated 3/2024" line of a course page (month/year)
+    as the first day of that month.
+
+    :param text: The text of the last update element
+    :type text: str
+    :return: The date, None if it cannot be parsed
+    :rtype: date | None
+    """
+
+    match = re.search(r'(\d{1,2})/(\d{4})', text or "")
+    if not match:
+        return None
+    return date(int(match.group(2)), int(match.group(1)), 1)
+
+def extract_course_details(driver: WebDriver) -> dict:
+    """
+    Extract the fields of a course detail page that the course cards do not have
+    (description and last update), plus the price, number of lectures and number
+    of students, used when the card did not have them.
+
+    Every field is optional: a field that is not on the page is None.
+
+    :param driver: Selenium WebDriver instance with the course page loaded.
+    :type driver: WebDriver
+    :raises TimeoutException: If the course page does not load.
+    :return: The fields found on the page.
+    :rtype: dict
+    """
+
+    with time_stage("wait_for_details"):
+        WebDriverWait(driver, 20).until(
+            EC.presence_of_element_located((By.XPATH, '//*[@data-purpose="lead-title"]'))
+        )
+
+    def text_of(xpath: str) -> str | None:
+        elements = driver.find_elements(By.XPATH, xpath)
+        return elements[0].text.strip() if elements and elements[0].text.strip() else None
+
+    details = {
+        "description": None,
+        "last_updated_at": None,
+        "total_lectures": None,
+        "total_students": None,
+        "current_price": None,
+        "original_price": None,
+    }
+
+    with time_stage("extract_details_page"):
+        details["description"] = text_of('//div[@data-purpose="safely-set-inner-html:description:description"]')
+        details["last_updated_at"] = parse_last_updated(text_of('//div[@data-purpose="last-update-date"]'))
+
+        stats = text_of('//*[@data-purpose="curriculum-stats"]')  ## "24 sections • 300 lectures • 40h 12m total length"
+        lectures = re.search(r'([\d,]+)\s+lectures', stats or "")
+        if lectures:
+            details["total_lectures"] = int(lectures.group(1).replace(",", ""))
+
+        students = re.search(r'([\d,]+)', text_of('//div[@data-purpose="enrollment"]') or "")
+        if students:
+            details["total_students"] = int(students.group(1).replace(",", ""))
+
+        for field, xpath in (("current_price", '//div[@data-purpose="course-price-text"]'),
+                             ("original_price", '//div[@data-purpose="course-old-price-text"]')):
+            price = text_of(xpath)
+            if price:
+                price = price.split("\n")[-1]
+                details[field] = "0" if price == "Free" else price
+
+    return details
 
-        return card_batch
\ No newline at end of file
+register_platform(PlatformAdapter(
+    name="udemy",
+    categories=UDEMY_CATEGORIES,
+    retrieve_courses=retrieve_courses_info,
+    last_page=last_page,
+    extract_details=extract_course_details,
+    hosts=("udemy.com",)
+))